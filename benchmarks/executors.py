@@ -0,0 +1,142 @@
+"""
+Compares wall time and memory usage of running task on simulated hosts
+by Fabric's parallel mode (process per host) and by thread pool of
+`fabricio.executors.ThreadExecutor`
+
+Usage:
+
+    python benchmarks/executors.py [number of hosts ...]
+
+Hosts are simulated by replacing `fab.run` with function which sleeps
+for LATENCY seconds per command. Memory usage is the peak sum of PSS
+(or RSS if not available) of the current process and all its children
+sampled from /proc, therefore Linux only.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import threading
+import time
+
+from fabric import api as fab
+from fabric.operations import _AttributeString
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import fabricio  # noqa
+
+from fabricio import executors, utils  # noqa
+
+LATENCY = 0.05
+
+COMMANDS = 5  # commands per host
+
+
+def fake_run(command, **kwargs):
+    time.sleep(LATENCY)
+    result = _AttributeString()
+    result.succeeded, result.failed, result.return_code = True, False, 0
+    return result
+
+
+fake_run.__name__ = 'run'
+
+
+def task():
+    for number in range(COMMANDS):
+        fabricio.run('command {0}'.format(number))
+
+
+def children(pid, tree):
+    for child in tree.get(pid, ()):
+        yield child
+        for descendant in children(child, tree):
+            yield descendant
+
+
+def memory(pid):
+    for path, field in (
+        ('/proc/{0}/smaps_rollup', 'Pss:'),
+        ('/proc/{0}/status', 'VmRSS:'),
+    ):
+        try:
+            with open(path.format(pid)) as status:
+                for line in status:
+                    if line.startswith(field):
+                        return int(line.split()[1])  # kB
+        except (IOError, OSError):
+            continue
+    return 0
+
+
+def total_memory(pid):
+    tree = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/{0}/stat'.format(entry)) as stat:
+                # ppid goes after process name which may contain spaces
+                ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (IOError, OSError, IndexError, ValueError):
+            continue
+        tree.setdefault(ppid, []).append(int(entry))
+    return sum(map(memory, [pid] + list(children(pid, tree))))
+
+
+class MemorySampler(threading.Thread):
+
+    def __init__(self, interval=0.05):
+        super(MemorySampler, self).__init__()
+        self.daemon = True
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        pid = os.getpid()
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, total_memory(pid))
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def fork_execute(task, hosts):
+    return fab.execute(fab.parallel(task), hosts=hosts)
+
+
+def measure(execute, hosts):
+    sampler = MemorySampler()
+    sampler.start()
+    started = time.time()
+    execute(task, hosts=hosts)
+    wall_time = time.time() - started
+    sampler.stop()
+    return wall_time, sampler.peak
+
+
+def main(hosts_numbers):
+    modes = (
+        ('fork', fork_execute),
+        ('threads', executors.ThreadExecutor()),
+    )
+    print('{0:>6} {1:>8} {2:>10} {3:>12}'.format(
+        'hosts', 'mode', 'time, s', 'memory, MB',
+    ))
+    with utils.patch(fab, 'run', fake_run):
+        with fab.settings(fab.hide('everything', 'aborts'), pool_size=0):
+            for hosts_number in hosts_numbers:
+                hosts = ['host{0}'.format(n) for n in range(hosts_number)]
+                for mode, execute in modes:
+                    wall_time, peak = measure(execute, hosts)
+                    print('{0:>6} {1:>8} {2:>10.2f} {3:>12.1f}'.format(
+                        hosts_number, mode, wall_time, peak / 1024.0,
+                    ))
+
+
+if __name__ == '__main__':
+    main(list(map(int, sys.argv[1:])) or [50, 200, 500])
@@ -0,0 +1,76 @@
+"""
+Compares time of parsing image references by `docker.Image.parse_image_name()`
+and by docker-py (`docker.utils.parse_repository_tag()` followed by
+`docker.auth.resolve_repository_name()`)
+
+Usage:
+
+    python benchmarks/image_names.py [reference ...]
+
+If no references provided, the set of references of different forms
+(with registry, port, namespace, tag and/or digest) is used. docker-py
+must be installed (pip install docker).
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+import docker.auth as docker_auth
+import docker.utils as docker_utils
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fabricio import docker  # noqa
+
+NUMBER = 200
+
+REFERENCES = (
+    'image',
+    'image:tag',
+    'namespace/image',
+    'namespace/image:tag',
+    'org/namespace/image:tag',
+    'localhost/image',
+    'localhost:5000/image:tag',
+    'registry/image',
+    'registry.com/image',
+    'registry.com:5000/namespace/image:tag',
+    'registry:5000/image',
+    'docker.io/library/image:tag',
+    'index.docker.io/image',
+    'image@sha256:digest',
+    'registry:5000/image@sha256:digest',
+    'image:tag@sha256:digest',
+    '192.168.0.1:5000/image:1.0.0',
+)
+
+
+def parse_by_docker_py(references):
+    for reference in references:
+        repository, _ = docker_utils.parse_repository_tag(reference)
+        docker_auth.resolve_repository_name(repository)
+
+
+def parse(references):
+    for reference in references:
+        docker.Image.parse_image_name(reference)
+
+
+def measure(parse_references, references):
+    timer = timeit.Timer(lambda: parse_references(references))
+    return min(timer.repeat(number=NUMBER)) / NUMBER / len(references)
+
+
+def main(references):
+    references = references or REFERENCES
+    print('{0:>14} {1:>14}'.format('docker-py, us', 'fabricio, us'))
+    print('{0:>14.2f} {1:>14.2f}'.format(
+        measure(parse_by_docker_py, references) * 1000000,
+        measure(parse, references) * 1000000,
+    ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
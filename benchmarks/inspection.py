@@ -0,0 +1,83 @@
+"""
+Compares time of parsing full result of `docker service inspect` and its
+projection (only fields needed to check if service update is necessary,
+see `fabricio.docker.inspection.project()`)
+
+Usage:
+
+    python benchmarks/inspection.py [inspect.json ...]
+
+Each file must contain output of `docker service inspect` command. If no
+files provided, synthetic payloads of different size are used.
+"""
+from __future__ import print_function
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fabricio import docker  # noqa
+
+NUMBER = 100
+
+FIELDS = ['Spec.Labels']
+
+
+def make_payload(size):
+    spec = {
+        'Name': 'service',
+        'Labels': {'fabricio.service.options': 'options'},
+        'TaskTemplate': {'ContainerSpec': {
+            'Image': 'image@sha256:' + '0' * 64,
+            'Env': ['VARIABLE_{0}=value'.format(n) for n in range(size)],
+            'Mounts': [
+                {'Type': 'volume', 'Source': 'volume', 'Target': '/%d' % n}
+                for n in range(size)
+            ],
+        }},
+    }
+    return {
+        'ID': 'id',
+        'Spec': spec,
+        'PreviousSpec': spec,
+        'Endpoint': {'Ports': [
+            {'TargetPort': n, 'PublishedPort': n} for n in range(size)
+        ]},
+    }
+
+
+def measure(output):
+    timer = timeit.Timer(lambda: json.loads(output))
+    return min(timer.repeat(number=NUMBER)) / NUMBER
+
+
+def main(paths):
+    if paths:
+        payloads = []
+        for path in paths:
+            with open(path) as inspect_file:
+                payloads.append((path, json.load(inspect_file)[0]))
+    else:
+        payloads = [
+            ('{0} items'.format(size), make_payload(size))
+            for size in (10, 100, 1000)
+        ]
+    print('{0:>20} {1:>10} {2:>10} {3:>16}'.format(
+        'payload', 'size, KB', 'full, ms', 'projection, ms',
+    ))
+    for name, info in payloads:
+        output = json.dumps([info])
+        projection = json.dumps([docker.inspection.prune(info, FIELDS)])
+        print('{0:>20} {1:>10.1f} {2:>10.3f} {3:>16.3f}'.format(
+            name,
+            len(output) / 1024.0,
+            measure(output) * 1000,
+            measure(projection) * 1000,
+        ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,100 @@
+"""
+Compares time of getting current values of `docker.Service` removable
+options (done for every option on each service update) by `dpath` and by
+paths compiled by `fabricio.docker.service.compile_path()`
+
+Usage:
+
+    python benchmarks/service_options.py [inspect.json ...]
+
+Each file must contain output of `docker service inspect` command. If no
+files provided, synthetic payloads of different size are used. `dpath`
+must be installed (pip install 'dpath<2').
+"""
+from __future__ import print_function
+
+import json
+import os
+import sys
+import timeit
+
+import dpath.util
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fabricio import docker  # noqa
+
+NUMBER = 10
+
+OPTIONS = [
+    option for option in vars(docker.Service).values()
+    if isinstance(option, docker.service.RemovableOption)
+]
+
+
+def make_payload(size):
+    spec = {
+        'Labels': dict(('label_%d' % n, 'value') for n in range(size)),
+        'TaskTemplate': {
+            'ContainerSpec': {
+                'Image': 'image@sha256:' + '0' * 64,
+                'Env': ['VARIABLE_{0}=value'.format(n) for n in range(size)],
+                'Mounts': [
+                    {'Type': 'volume', 'Source': 'v', 'Target': '/%d' % n}
+                    for n in range(size)
+                ],
+            },
+            'Networks': [{'Target': 'network_%d' % n} for n in range(10)],
+        },
+        'EndpointSpec': {'Ports': [
+            {'TargetPort': n, 'PublishedPort': n} for n in range(size)
+        ]},
+    }
+    return {'ID': 'id', 'Spec': spec, 'PreviousSpec': spec}
+
+
+def get_by_dpath(info):
+    for option in OPTIONS:
+        if '*' in option.path:
+            dpath.util.values(info, option.path)
+        else:
+            try:
+                dpath.util.get(info, option.path)
+            except KeyError:
+                pass
+
+
+def get_compiled(info):
+    for option in OPTIONS:
+        option.get_current_values(info)
+
+
+def measure(get, info):
+    return min(timeit.repeat(lambda: get(info), number=NUMBER)) / NUMBER
+
+
+def main(paths):
+    if paths:
+        payloads = []
+        for path in paths:
+            with open(path) as inspect_file:
+                payloads.append((path, json.load(inspect_file)[0]))
+    else:
+        payloads = [
+            ('{0} items'.format(size), make_payload(size))
+            for size in (10, 100, 1000)
+        ]
+    print('{0:>20} {1:>10} {2:>14} {3:>12}'.format(
+        'payload', 'size, KB', 'dpath, ms', 'compiled, ms',
+    ))
+    for name, info in payloads:
+        print('{0:>20} {1:>10.1f} {2:>14.3f} {3:>12.3f}'.format(
+            name,
+            len(json.dumps(info)) / 1024.0,
+            measure(get_by_dpath, info) * 1000,
+            measure(get_compiled, info) * 1000,
+        ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,67 @@
+"""
+Measures import time of Fabricio (Fabric itself, which is imported anyway
+by fabfile, is excluded) and of its subsystems loaded on first use
+
+Usage:
+
+    python benchmarks/startup.py [number of runs]
+
+Each import is done by the new interpreter started with `-X importtime`
+(Python 3.7+), the best of runs is reported.
+"""
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+STATEMENTS = (
+    ('fabricio', 'import fabric.api; import fabricio'),
+    ('fabricio.tasks', 'import fabric.api; import fabricio.tasks'),
+    ('fabricio.docker', 'import fabric.api; import fabricio.docker'),
+)
+
+
+def get_import_times(statement):
+    """
+    returns cumulative import time (in seconds) of each module imported
+    by the statement executed by the new interpreter
+    """
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.PIPE,
+        cwd=ROOT,
+    )
+    _, output = process.communicate()
+    import_times = {}
+    for line in output.decode('utf-8').splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, module = line.split('|')
+        if cumulative.strip().isdigit():
+            import_times[module.strip()] = int(cumulative) / 1000000.0
+    return import_times
+
+
+def get_total_time(import_times, module):
+    # package is imported before its submodule and reported separately
+    total_time = import_times.get('fabricio', 0)
+    if module != 'fabricio':
+        total_time += import_times.get(module, 0)
+    return total_time
+
+
+def main(runs=5):
+    print('{0:>20} {1:>10}'.format('module', 'time, ms'))
+    for module, statement in STATEMENTS:
+        import_time = min(
+            get_total_time(get_import_times(statement), module)
+            for _ in range(runs)
+        )
+        print('{0:>20} {1:>10.1f}'.format(module, import_time * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
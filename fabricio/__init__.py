@@ -1,7 +1,23 @@
-from fabricio.operations import local, log, move_file, remove_file, run
+import sys
+
+from fabricio.operations import local, log, move_file, remove_file, run, batch
+from fabricio.operations import put, get, exists
 from fabricio.operations import Error, host_errors
 from fabricio.decorators import skip_unknown_host, once_per_task
-from fabricio.tasks import infrastructure
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        # `fabricio.tasks` (which loads Docker related modules)
+        # is imported on first use of `fabricio.infrastructure` only
+        if name == 'infrastructure':
+            from fabricio.tasks import infrastructure
+            globals()['infrastructure'] = infrastructure
+            return infrastructure
+        raise AttributeError(
+            "module 'fabricio' has no attribute '{0}'".format(name),
+        )
+else:  # pragma: no cover
+    from fabricio.tasks import infrastructure
 
 VERSION = (0, 5, 8)
 
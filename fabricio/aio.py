@@ -0,0 +1,376 @@
+"""
+asyncio counterparts of fabricio operations (Python 3.5+)
+
+Remote commands are executed by `ssh` subprocesses sharing master
+connections of `fabricio.ssh.ConnectionPool`, so single process can serve
+hundreds of hosts concurrently without Fabric's process per host.
+"""
+import asyncio
+import concurrent.futures
+import tempfile
+import time
+import weakref
+
+from fabric import api as fab
+from fabric.exceptions import CommandTimeout
+from fabric.network import normalize, to_dict
+from fabric.operations import _prefix_commands, _prefix_env_vars
+
+import fabricio
+
+from fabricio import executors, operations, ssh, utils
+from fabricio.cache import make_key
+
+# default number of hosts served simultaneously by `execute()`, each of
+# them occupies worker thread while its task is running
+max_concurrency = 32
+
+# master connections being established, by event loop
+_connecting = weakref.WeakKeyDictionary()
+
+
+async def _execute(args, timeout=None, shell=False):
+    if shell:
+        create_process = asyncio.create_subprocess_shell
+    else:
+        create_process = asyncio.create_subprocess_exec
+    process = await create_process(
+        *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise CommandTimeout(timeout=timeout)
+    return process.returncode, stdout, stderr
+
+
+async def _stream(args, buffer_size, stream=None, prefix='', timeout=None):
+    """
+    executes process writing its output (stdout and stderr together)
+    line by line to the stream, only last `buffer_size` characters of
+    output are kept (see `utils.stream_output()`)
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT
+    )
+    buffer = utils.TailBuffer(buffer_size)
+
+    def write(line):
+        line = line.decode('utf-8', 'replace')
+        buffer.write(line)
+        if stream is not None:
+            stream.write(prefix + line)
+            stream.flush()
+
+    async def read():
+        pending = b''
+        while True:
+            chunk = await process.stdout.read(8192)
+            lines = (pending + chunk).splitlines(True)
+            pending = b''
+            if chunk and lines and not lines[-1].endswith(b'\n'):
+                if len(lines[-1]) < 8192:
+                    pending = lines.pop()  # waiting for the rest of line
+            for line in lines:
+                write(line)
+            if not chunk:
+                return await process.wait()
+
+    try:
+        status = await asyncio.wait_for(read(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise CommandTimeout(timeout=timeout)
+    return status, buffer.getvalue()
+
+
+async def _start_master(pool, host_string):
+    # stderr is written to the file because background master
+    # may keep it open (see `ssh.ConnectionPool._start_master()`)
+    with tempfile.TemporaryFile() as stderr:
+        process = await asyncio.create_subprocess_exec(
+            *pool.master(host_string),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=stderr
+        )
+        status = await process.wait()
+        stderr.seek(0)
+        pool.check_master(host_string, status, stderr.read())
+
+
+async def _connect(pool, host_string):
+    started = time.time()
+    status, _, _ = await _execute(pool.control(host_string, 'check'))
+    if status != 0:
+        await _start_master(pool, host_string)
+    pool.connect_times[host_string] = connect_time = time.time() - started
+    fabricio.log(
+        'connection established in {time:.2f}s'.format(time=connect_time),
+        host_string=host_string,
+    )
+    return connect_time
+
+
+async def connect(host_string):
+    """
+    starts master connection to the host unless it is already running,
+    concurrent calls for the same host wait for the single connection
+    """
+    pool = ssh.get_pool(force=True)
+    if host_string in pool.connect_times:
+        return pool.connect_times[host_string]
+    connecting = _connecting.setdefault(asyncio.get_event_loop(), {})
+    if host_string not in connecting:
+        connecting[host_string] = asyncio.ensure_future(
+            _connect(pool, host_string),
+        )
+    try:
+        return await connecting[host_string]
+    finally:
+        connecting.pop(host_string, None)
+
+
+async def run(
+    command,
+    sudo=False,
+    ignore_errors=False,
+    quiet=True,
+    abort_exception=operations.Error,
+    use_cache=False,
+    cache_salt='',
+    host_string=None,
+):
+    host_string = host_string or fab.env.host_string
+    if use_cache:
+        host = normalize(host_string)[1]
+        cache_key = make_key(command, host=host, salt=cache_salt)
+        result = operations.run.cache.get(cache_key, utils.DEFAULT)
+        if result is not utils.DEFAULT:
+            return result
+    fabricio.log(
+        '{method}: {command}'.format(
+            method='sudo' if sudo else 'run',
+            command=command,
+        ),
+        host_string=host_string,
+    )
+    pool = ssh.get_pool(force=True)
+    await connect(host_string)
+    args, wrapped_command = pool.command(host_string, command, sudo=sudo)
+    status, stdout, stderr = await _execute(
+        args,
+        timeout=fab.env.command_timeout,
+    )
+    result = ssh.make_result(command, wrapped_command, status, stdout, stderr)
+    ssh.print_result(
+        result,
+        host_string=host_string,
+        show_stdout=not quiet,
+        show_stderr=not quiet,
+    )
+    if result.failed and not ignore_errors:
+        raise abort_exception(
+            "{method}() received nonzero return code {status} while "
+            "executing '{command}'!".format(
+                method='sudo' if sudo else 'run',
+                status=status,
+                command=command,
+            )
+        )
+    if use_cache:
+        operations.run.cache.set(cache_key, result, host=host, command=command)
+    return result
+
+
+async def local(
+    command,
+    ignore_errors=False,
+    quiet=True,
+    abort_exception=operations.Error,
+    use_cache=False,
+    cache_salt='',
+):
+    if use_cache:
+        cache_key = make_key(command, salt=cache_salt)
+        result = operations.local.cache.get(cache_key, utils.DEFAULT)
+        if result is not utils.DEFAULT:
+            return result
+    fabricio.log('local: {command}'.format(command=command))
+    wrapped_command = _prefix_commands(
+        _prefix_env_vars(command, local=True),
+        'local',
+    )
+    status, stdout, stderr = await _execute([wrapped_command], shell=True)
+    result = ssh.make_result(command, wrapped_command, status, stdout, stderr)
+    ssh.print_result(result, show_stdout=not quiet, show_stderr=not quiet)
+    if result.failed and not ignore_errors:
+        raise abort_exception(
+            "local() encountered an error (return code {status}) while "
+            "executing '{command}'".format(status=status, command=command)
+        )
+    if use_cache:
+        operations.local.cache.set(cache_key, result, command=command)
+    return result
+
+
+class ThreadRunner(ssh.ConnectionPool):
+    """
+    executes `fabricio.run` commands made by the sync code running in the
+    worker thread (see `run_sync`) by the event loop
+    """
+
+    def __init__(self, loop, pool):
+        super(ThreadRunner, self).__init__(
+            control_dir=pool.control_dir,
+            persist=pool.persist,
+            executable=pool.executable,
+        )
+        self.connect_times = pool.connect_times
+        self.loop = loop
+
+    def _wait(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def connect(self, host_string):
+        return self._wait(connect(host_string))
+
+    def execute(self, args, timeout=None):
+        return self._wait(_execute(args, timeout=timeout))
+
+    def stream(self, args, buffer_size, **kwargs):
+        return self._wait(_stream(args, buffer_size, **kwargs))
+
+    def sudo(self, command, **kwargs):
+        # password can't be entered, passwordless sudo is expected
+        return self._run(command, sudo=True, **kwargs)
+
+
+async def run_sync(
+    func,
+    *args,
+    host_string=None,
+    env=None,
+    executor=None,
+    **kwargs
+):
+    """
+    calls sync function (e.g. `service.update`) in the worker thread
+    with its own `fab.env` for the host, `fabricio.run` calls made by
+    the function are executed by the event loop
+    """
+    loop = asyncio.get_event_loop()
+    runner = ThreadRunner(loop, ssh.get_pool(force=True))
+    values = to_dict(host_string) if host_string else {}
+    values.update(env or {})
+
+    def call():
+        with utils.isolated_env(**values):
+            with utils.patch(operations._local, 'runner', runner):
+                return func(*args, **kwargs)
+
+    return await loop.run_in_executor(executor, call)
+
+
+async def pull_image(
+    image,
+    use_cache=False,
+    ignore_errors=False,
+    host_string=None,
+):
+    """
+    async version of `Image.pull`
+    """
+    return await run_sync(
+        image.pull,
+        use_cache=use_cache,
+        ignore_errors=ignore_errors,
+        host_string=host_string,
+    )
+
+
+async def update(
+    service,
+    tag=None,
+    registry=None,
+    account=None,
+    force=False,
+    host_string=None,
+):
+    """
+    async version of `update` of `Container`, `Service` and `Stack`
+    """
+    return await run_sync(
+        service.update,
+        tag=tag,
+        registry=registry,
+        account=account,
+        force=force,
+        host_string=host_string,
+    )
+
+
+async def execute(task, *args, concurrency=None, **kwargs):
+    """
+    asyncio version of `fab.execute` running task on all its hosts
+    at once (but no more than `concurrency` hosts simultaneously,
+    `env.pool_size` or `max_concurrency` by default)
+    """
+    task = executors.HostsTask(task, args=args, kwargs=kwargs)
+    if not task.hosts:
+        return {'<local-only>': task.run()}
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(
+            concurrency or fab.env.pool_size or max_concurrency,
+            len(task.hosts),
+        ),
+    )
+    try:
+        results = await asyncio.gather(
+            *[
+                run_sync(
+                    task.run,
+                    host_string=host,
+                    env=task.env(host),
+                    executor=executor,
+                )
+                for host in task.hosts
+            ],
+            return_exceptions=True
+        )
+    finally:
+        executor.shutdown(wait=False)
+    results = dict(zip(task.hosts, results))
+    task.check_results(results)
+    return results
+
+
+class Executor(object):
+    """
+    replacement of `fab.execute` running task on all hosts from single
+    event loop (see `executor` option of `DockerTasks`)
+    """
+
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency
+
+    def __call__(self, task, *args, **kwargs):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(execute(
+                task,
+                *args,
+                concurrency=self.concurrency,
+                **kwargs
+            ))
+        finally:
+            loop.close()
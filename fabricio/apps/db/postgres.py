@@ -1,12 +1,12 @@
-import multiprocessing
 import os
+import threading
+import time
 
 from datetime import datetime
 
 import six
 
 from fabric import api as fab
-from fabric.contrib import files
 
 import fabricio
 
@@ -82,6 +82,7 @@ class PostgresqlBackupMixin(docker.BaseService):
             command=command,
             quiet=False,
             options=self.safe_options,
+            buffer_size=fabricio.run.buffer_size,
         )
 
     @property
@@ -119,6 +120,7 @@ class PostgresqlBackupMixin(docker.BaseService):
             command=command,
             quiet=False,
             options=self.safe_options,
+            buffer_size=fabricio.run.buffer_size,
         )
 
 
@@ -138,8 +140,12 @@ class PostgresqlContainer(docker.Container):
 
     def update_config(self, content, path):
         old_file = six.BytesIO()
-        if files.exists(path, use_sudo=self.sudo):
-            fab.get(remote_path=path, local_path=old_file, use_sudo=self.sudo)
+        if fabricio.exists(path, sudo=self.sudo):
+            fabricio.get(
+                remote_path=path,
+                local_path=old_file,
+                use_sudo=self.sudo,
+            )
         old_content = old_file.getvalue()
         need_update = content != old_content
         if need_update:
@@ -149,16 +155,21 @@ class PostgresqlContainer(docker.Container):
                 sudo=self.sudo,
                 ignore_errors=True,
             )
-            fab.put(six.BytesIO(content), path, use_sudo=self.sudo, mode='0644')
+            fabricio.put(
+                six.BytesIO(content),
+                path,
+                use_sudo=self.sudo,
+                mode='0644',
+            )
             fabricio.log('{path} updated'.format(path=path))
         else:
             fabricio.log('{path} not changed'.format(path=path))
         return need_update
 
     def db_exists(self):
-        return files.exists(
+        return fabricio.exists(
             os.path.join(self.pg_data, 'PG_VERSION'),
-            use_sudo=self.sudo,
+            sudo=self.sudo,
         )
 
     def create_db(self, tag=None, registry=None, account=None):
@@ -214,22 +225,24 @@ class PostgresqlContainer(docker.Container):
                 self.get_backup_version().delete(delete_image=True)
             except docker.ContainerNotFoundError:
                 pass
-        if not main_config_updated:
-            # remove main config backup to prevent reverting to old version
-            main_conf_backup = main_conf + '.backup'
-            fabricio.remove_file(
-                main_conf_backup,
-                ignore_errors=True,
-                sudo=self.sudo,
-            )
-        if not hba_config_updated:
-            # remove pg_hba config backup to prevent reverting to old version
-            hba_conf_backup = hba_conf + '.backup'
-            fabricio.remove_file(
-                hba_conf_backup,
-                ignore_errors=True,
-                sudo=self.sudo,
-            )
+        with fabricio.batch():
+            if not main_config_updated:
+                # remove main config backup to prevent reverting to old version
+                main_conf_backup = main_conf + '.backup'
+                fabricio.remove_file(
+                    main_conf_backup,
+                    ignore_errors=True,
+                    sudo=self.sudo,
+                )
+            if not hba_config_updated:
+                # remove pg_hba config backup to prevent reverting
+                # to old version
+                hba_conf_backup = hba_conf + '.backup'
+                fabricio.remove_file(
+                    hba_conf_backup,
+                    ignore_errors=True,
+                    sudo=self.sudo,
+                )
         return True
 
     def revert(self):
@@ -288,15 +301,24 @@ class StreamingReplicatedPostgresqlContainer(PostgresqlContainer):
 
     pg_recovery_wait_for_master_seconds = Attribute(default=30)
 
+    _shared_attributes = PostgresqlContainer._shared_attributes + (
+        'master_obtained',
+        'master_lock',
+        'multiprocessing_data',
+        'instances',
+    )
+
     def __init__(self, *args, **kwargs):
         super(StreamingReplicatedPostgresqlContainer, self).__init__(
             *args, **kwargs)
-        self.master_obtained = multiprocessing.Event()
-        self.master_lock = multiprocessing.Lock()
-        self.multiprocessing_data = data = multiprocessing.Manager().Namespace()
-        data.db_exists = False
-        data.exception = None
-        self.instances = multiprocessing.JoinableQueue()
+        self.master_obtained = utils.SharedEvent()
+        self.master_lock = utils.SharedLock()
+        self.multiprocessing_data = utils.SharedNamespace(
+            db_exists=False,
+            exception=None,
+        )
+        # workers which are updating their instances at the moment
+        self.instances = utils.SharedDict()
 
     def copy_data_from_master(self, tag=None, registry=None, account=None):
         pg_basebackup_command = (
@@ -321,6 +343,7 @@ class StreamingReplicatedPostgresqlContainer(PostgresqlContainer):
             command=command,
             options=self.options,
             quiet=False,
+            buffer_size=fabricio.run.buffer_size,
         )
 
     def get_recovery_config(self):
@@ -350,7 +373,7 @@ class StreamingReplicatedPostgresqlContainer(PostgresqlContainer):
         recovery_conf_file = os.path.join(self.pg_data, 'recovery.conf')
         if db_exists:
             self.multiprocessing_data.db_exists = True
-            if not files.exists(recovery_conf_file, use_sudo=self.sudo):
+            if not fabricio.exists(recovery_conf_file, sudo=self.sudo):
                 # master founded
                 self.set_master_info()
                 return False
@@ -400,7 +423,11 @@ class StreamingReplicatedPostgresqlContainer(PostgresqlContainer):
                 'for a current session.'
             )
 
-        self.instances.put(None)
+        worker = '{pid}-{thread}'.format(
+            pid=os.getpid(),
+            thread=threading.current_thread().ident,
+        )
+        self.instances[worker] = fab.env.host
 
         try:
             recovery_config_updated = self.update_recovery_config(
@@ -426,9 +453,9 @@ class StreamingReplicatedPostgresqlContainer(PostgresqlContainer):
                 self.master_lock.release()
             except ValueError:  # ignore "released too many times" error
                 pass
-            self.instances.get()
-            self.instances.task_done()
-            self.instances.join()  # wait until all instances will be updated
+            del self.instances[worker]
+            while self.instances:  # wait until all instances will be updated
+                time.sleep(self.master_obtained.poll_interval)
 
             # reset state at the end to prevent fail of the next Fabric command
             self.master_obtained.clear()
@@ -88,31 +88,31 @@ class DjangoMixin(docker.BaseService):
         image = self.image
         options = self.safe_options
 
-        with utils.patch(self, 'info', self.info, force_delete=True):
-            current_migrations = image.run(
-                migrations_command,
-                options=options,
+        # backup version of service needs its full info, getting it first
+        # makes unnecessary separate request of the current image
+        backup = self.get_backup_version()
+        current_migrations = image.run(
+            migrations_command,
+            options=options,
+        )
+        backup_migrations = backup.image.run(
+            migrations_command,
+            options=options,
+        )
+
+        for migration in self.get_revert_migrations(
+            current_migrations,
+            backup_migrations,
+        ):
+            command = (
+                'python manage.py migrate --no-input {app} {migration}'
+            ).format(
+                app=migration.app,
+                migration=migration.name,
             )
-            backup = self.get_backup_version()
-            with utils.patch(backup, 'info', backup.info, force_delete=True):
-                backup_migrations = backup.image.run(
-                    migrations_command,
-                    options=options,
-                )
+            image.run(command, quiet=False, options=options)
 
-                for migration in self.get_revert_migrations(
-                    current_migrations,
-                    backup_migrations,
-                ):
-                    command = (
-                        'python manage.py migrate --no-input {app} {migration}'
-                    ).format(
-                        app=migration.app,
-                        migration=migration.name,
-                    )
-                    image.run(command, quiet=False, options=options)
-
-                self._migrate(backup.image, options)
+        self._migrate(backup.image, options)
 
 
 class DjangoContainer(docker.Container, DjangoMixin):
@@ -0,0 +1,356 @@
+import binascii
+import collections
+import hashlib
+import json
+import os
+import re
+import time
+
+import six
+
+from fabric.operations import _AttributeString
+
+from fabricio.utils import DEFAULT
+
+CacheEntry = collections.namedtuple(
+    'CacheEntry',
+    ['value', 'host', 'command', 'timestamp', 'ttl'],
+)
+CacheEntry.__new__.__defaults__ = (None, )  # ttl of the cache is used
+
+
+def make_key(command, host=None, salt=''):
+    md5 = hashlib.md5()
+    md5.update(command.encode())
+    if host is not None:
+        md5.update(host.encode())
+    md5.update(salt.encode())
+    return md5.digest()
+
+
+def make_image_regex(image):
+    """
+    returns regex matching the image reference as a whole word of the
+    command, with any tag and digest unless one of them is provided
+    """
+    name = image.rsplit('/', 1)[-1]
+    suffix = '' if ':' in name or '@' in name else r'(?:[:@][^\s\'"]*)?'
+    return r'(?:^|(?<=[\s\'"=])){image}{suffix}(?=$|[\s\'"])'.format(
+        image=re.escape(image),
+        suffix=suffix,
+    )
+
+
+class Cache(object):
+    """
+    LRU cache of commands results bounded by size and age of entries
+
+    Entry may have its own `ttl` which is applied along with the cache's
+    one (entry expires when any of them is over).
+
+    Each entry remembers host and command it was made for, which makes
+    possible to invalidate all entries of particular host and/or command
+    prefix, e.g. all 'docker inspect' results after 'docker service update'.
+    """
+
+    def __init__(self, max_size=None, ttl=None, timer=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.timer = timer
+        self.entries = collections.OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        entry = self.entries.get(key)
+        return entry is not None and not self._is_expired(entry)
+
+    def _is_expired(self, entry):
+        ttl = min(
+            ttl for ttl in (self.ttl, entry.ttl, float('inf'))
+            if ttl is not None
+        )
+        return self.timer() - entry.timestamp > ttl
+
+    def get(self, key, default=None):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return default
+        if self._is_expired(entry):
+            self.evictions += 1
+            self.misses += 1
+            return default
+        self.entries[key] = entry  # mark as recently used
+        self.hits += 1
+        return entry.value
+
+    def set(self, key, value, host=None, command=None, ttl=None):
+        self.entries.pop(key, None)
+        self.entries[key] = CacheEntry(
+            value=value,
+            host=host,
+            command=command,
+            timestamp=self.timer(),
+            ttl=ttl,
+        )
+        self.evict()
+
+    def evict(self):
+        if self.ttl is not None:
+            for key, entry in list(self.entries.items()):
+                if self._is_expired(entry):
+                    del self.entries[key]
+                    self.evictions += 1
+        if self.max_size is not None:
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(
+        self,
+        host=DEFAULT,
+        prefix=None,
+        contains=None,
+        command=None,
+        image=None,
+    ):
+        """
+        remove entries of the host (if provided) which command starts with
+        the prefix and/or contains the substring and/or is equal to the
+        command and/or refers to the image (see `make_image_regex()`),
+        returns number of removed entries
+        """
+        image_regex = image is not None and re.compile(make_image_regex(image))
+        keys = [
+            key for key, entry in self.entries.items()
+            if (host is DEFAULT or entry.host == host)
+            and (prefix is None or (entry.command or '').startswith(prefix))
+            and (contains is None or contains in (entry.command or ''))
+            and (command is None or entry.command == command)
+            and (not image_regex or image_regex.search(entry.command or ''))
+        ]
+        for key in keys:
+            del self.entries[key]
+        return len(keys)
+
+    def clear(self):
+        self.entries.clear()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def stats(self):
+        return collections.OrderedDict([
+            ('hits', self.hits),
+            ('misses', self.misses),
+            ('evictions', self.evictions),
+            ('size', len(self)),
+        ])
+
+    def __str__(self):
+        return ', '.join(
+            '{0}: {1}'.format(name, value)
+            for name, value in self.stats.items()
+        )
+
+
+def dump_result(result):
+    attrs = ('stderr', 'return_code', 'succeeded', 'failed')
+    return json.dumps(dict(
+        value=six.text_type(result),
+        attrs=dict(
+            (attr, getattr(result, attr))
+            for attr in attrs
+            if hasattr(result, attr)
+        ),
+    ))
+
+
+def load_result(data):
+    data = json.loads(data)
+    result = _AttributeString(data['value'])
+    for attr, value in data['attrs'].items():
+        setattr(result, attr, value)
+    return result
+
+
+class PersistentCache(Cache):
+    """
+    Cache which keeps its entries in the SQLite database file, so they
+    can be reused by subsequent Fabric invocations until expired (see `ttl`)
+
+    Entries are also kept in memory, therefore `max_size` limits only
+    number of in-memory entries.
+    """
+
+    def __init__(self, path, namespace='', **kwargs):
+        super(PersistentCache, self).__init__(**kwargs)
+        self.path = path
+        self.namespace = namespace
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self):
+        # SQLite connection can't be shared with forked processes
+        pid = os.getpid()
+        if self._connection is None or self._pid != pid:
+            import sqlite3  # loading on demand
+            connection = sqlite3.connect(
+                self.path,
+                timeout=30,
+                isolation_level=None,  # autocommit
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'namespace TEXT, key TEXT, host TEXT, command TEXT, '
+                'timestamp REAL, value TEXT, ttl REAL, '
+                'PRIMARY KEY (namespace, key))'
+            )
+            connection.create_function('REGEXP', 2, _regexp)
+            try:
+                # database created by previous version
+                connection.execute('ALTER TABLE cache ADD COLUMN ttl REAL')
+            except sqlite3.OperationalError:
+                pass  # column already exists
+            self._connection, self._pid = connection, pid
+        return self._connection
+
+    def _fetch(self, key):
+        row = self.connection.execute(
+            'SELECT host, command, timestamp, value, ttl FROM cache '
+            'WHERE namespace = ? AND key = ?',
+            (self.namespace, _hex(key)),
+        ).fetchone()
+        if row is None:
+            return None
+        host, command, timestamp, value, ttl = row
+        return CacheEntry(
+            value=load_result(value),
+            host=host,
+            command=command,
+            timestamp=timestamp,
+            ttl=ttl,
+        )
+
+    def __contains__(self, key):
+        if key not in self.entries:
+            entry = self._fetch(key)
+            if entry is not None:
+                self.entries[key] = entry
+        return super(PersistentCache, self).__contains__(key)
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            entry = self._fetch(key)
+            if entry is not None:
+                self.entries[key] = entry
+        return super(PersistentCache, self).get(key, default)
+
+    def set(self, key, value, host=None, command=None, ttl=None):
+        super(PersistentCache, self).set(
+            key, value, host=host, command=command, ttl=ttl)
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        self.connection.execute(
+            'INSERT OR REPLACE INTO cache '
+            '(namespace, key, host, command, timestamp, value, ttl) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                self.namespace,
+                _hex(key),
+                host,
+                command,
+                entry.timestamp,
+                dump_result(value),
+                ttl,
+            ),
+        )
+
+    def evict(self):
+        super(PersistentCache, self).evict()
+        now = self.timer()
+        self.connection.execute(
+            'DELETE FROM cache WHERE namespace = ? AND timestamp + ttl < ?',
+            (self.namespace, now),
+        )
+        if self.ttl is not None:
+            self.connection.execute(
+                'DELETE FROM cache WHERE namespace = ? AND timestamp < ?',
+                (self.namespace, now - self.ttl),
+            )
+
+    def invalidate(
+        self,
+        host=DEFAULT,
+        prefix=None,
+        contains=None,
+        command=None,
+        image=None,
+    ):
+        removed = super(PersistentCache, self).invalidate(
+            host=host,
+            prefix=prefix,
+            contains=contains,
+            command=command,
+            image=image,
+        )
+        query = 'DELETE FROM cache WHERE namespace = ?'
+        params = [self.namespace]
+        if host is not DEFAULT:
+            query += ' AND host IS ?'
+            params.append(host)
+        if prefix is not None:
+            query += ' AND substr(command, 1, ?) = ?'
+            params += [len(prefix), prefix]
+        if contains is not None:
+            query += ' AND instr(command, ?) > 0'
+            params.append(contains)
+        if command is not None:
+            query += ' AND command = ?'
+            params.append(command)
+        if image is not None:
+            query += ' AND command REGEXP ?'
+            params.append(make_image_regex(image))
+        cursor = self.connection.execute(query, params)
+        return max(removed, cursor.rowcount)
+
+    def clear(self):
+        super(PersistentCache, self).clear()
+        self.connection.execute(
+            'DELETE FROM cache WHERE namespace = ?',
+            (self.namespace, ),
+        )
+
+
+def _regexp(pattern, value):
+    return value is not None and re.search(pattern, value) is not None
+
+
+def _hex(key):
+    if isinstance(key, six.binary_type):
+        return binascii.hexlify(key).decode()
+    return six.text_type(key)
+
+
+def persist(path, ttl=None):
+    """
+    make results of `fabricio.run` and `fabricio.local` called with
+    `use_cache=True` persistent between Fabric invocations
+    """
+    from fabricio import operations
+    for namespace, command in (
+        ('run', operations.run),
+        ('local', operations.local),
+    ):
+        command.cache = PersistentCache(
+            path=path,
+            namespace=namespace,
+            max_size=command.cache.max_size,
+            ttl=ttl,
+        )
@@ -1,14 +1,26 @@
-import ctypes
+import collections
+import contextlib
 import functools
 import hashlib
-import multiprocessing
+import itertools
+import os
+import threading
+import time
+
+from six.moves import cPickle as pickle
 
 from fabric import api as fab
 
 import fabricio
 
+from fabricio import utils
 from fabricio.utils import DEFAULT
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
 
 def skip_unknown_host(func):
     @functools.wraps(func)
@@ -28,62 +40,208 @@ def skip_unknown_host(func):
     return _task
 
 
+class TaskCoordinator(object):
+    """
+    state of functions decorated by `once_per_task` shared by all workers
+    of the task (threads and processes forked by Fabric's parallel mode)
+
+    State is kept in the files of the session directory (see
+    `utils.get_session_dir()`) instead of starting `multiprocessing.Manager`
+    server process per function.
+    """
+
+    poll_interval = 0.05
+
+    def __init__(self):
+        self.counter = itertools.count()
+        self.thread_locks = collections.defaultdict(threading.Lock)
+        self.thread_locks_lock = threading.Lock()
+        self.local = threading.local()
+        self.pid = os.getpid()
+
+    def register(self):
+        """
+        returns key of the new function, keys are assigned when functions
+        are decorated (at import time), so they are the same for all workers
+        """
+        return next(self.counter)
+
+    def get_path(self, key, name):
+        return os.path.join(
+            utils.get_session_dir(),
+            'once-per-task-{key}.{name}'.format(key=key, name=name),
+        )
+
+    @contextlib.contextmanager
+    def lock(self, key, block=False):
+        """
+        yields True if lock of the function was acquired, False otherwise
+        """
+        held_locks = self.local.__dict__.setdefault('held_locks', set())
+        if key in held_locks:  # lock is reentrant
+            yield True
+            return
+        thread_lock = self.get_thread_lock(key)
+        if not thread_lock.acquire(block):
+            yield False
+            return
+        try:
+            if fcntl is None:  # pragma: no cover
+                held_locks.add(key)
+                try:
+                    yield True
+                finally:
+                    held_locks.discard(key)
+                return
+            with open(self.get_path(key, 'lock'), 'a') as lock_file:
+                # POSIX locks (unlike `flock`) are not inherited by child
+                # processes which may be forked while lock is held
+                flags = fcntl.LOCK_EX
+                if not block:
+                    flags |= fcntl.LOCK_NB
+                try:
+                    fcntl.lockf(lock_file, flags)
+                except (IOError, OSError):
+                    yield False
+                    return
+                held_locks.add(key)
+                try:
+                    yield True
+                finally:
+                    held_locks.discard(key)
+        finally:
+            thread_lock.release()
+
+    def get_thread_lock(self, key):
+        """
+        returns lock of the function shared by threads of the process
+        (POSIX locks don't exclude threads of the same process)
+        """
+        with self.thread_locks_lock:
+            if self.pid != os.getpid():
+                # locks of the parent could be held at the moment of fork
+                self.thread_locks.clear()
+                self.pid = os.getpid()
+            return self.thread_locks[key]
+
+    def read(self, key, name, default=None):
+        try:
+            with open(self.get_path(key, name), 'rb') as state_file:
+                return pickle.load(state_file)
+        except (IOError, OSError, EOFError):
+            return default
+
+    def write(self, key, name, value):
+        path = self.get_path(key, name)
+        temp_path = '{path}.{pid}.{thread}'.format(
+            path=path,
+            pid=os.getpid(),
+            thread=threading.current_thread().ident,
+        )
+        with open(temp_path, 'wb') as state_file:
+            pickle.dump(value, state_file, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, path)  # readers never see partial state
+
+    def remove(self, key, name):
+        try:
+            os.remove(self.get_path(key, name))
+        except OSError:
+            pass
+
+    def exists(self, key, name):
+        return os.path.exists(self.get_path(key, name))
+
+    def wait(self, key, name, timeout=None):
+        """
+        waits until state with the name appears
+        """
+        deadline = timeout is not None and time.time() + timeout
+        while not self.exists(key, name):
+            if deadline is not False and time.time() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+
+_coordinator = TaskCoordinator()
+
+_task_id = None, None, None, None  # command, infrastructure, all_hosts, id
+
+
+def get_task_id():
+    """
+    returns id of the current task which is calculated once per task
+    """
+    global _task_id
+    command = fab.env.command or ''
+    infrastructure = fab.env.get('infrastructure') or ''
+    all_hosts = fab.env.all_hosts
+    cached_command, cached_infrastructure, cached_hosts, task_id = _task_id
+    if (
+        cached_hosts is all_hosts
+        and cached_command == command
+        and cached_infrastructure == infrastructure
+    ):
+        return task_id
+    session = hashlib.md5()
+    session.update(command.encode('utf-16be'))
+    session.update(infrastructure.encode('utf-16be'))
+    for host in all_hosts:
+        session.update(host.encode('utf-16be'))
+    task_id = session.hexdigest()
+    _task_id = command, infrastructure, all_hosts, task_id
+    return task_id
+
+
 def once_per_task(func=None, block=False, default=None):
     if func is None:
         return functools.partial(once_per_task, block=block, default=default)
 
+    key = _coordinator.register()
+
     def wait(timeout=None):
-        executed.wait(timeout)
+        return _coordinator.wait(key, 'executed', timeout)
 
     def set_result(value=DEFAULT):
         if value is not DEFAULT:
-            results[get_current_task_id()] = value
-        executed.set()
+            _coordinator.write(key, 'result', (get_task_id(), value))
+        _coordinator.write(key, 'executed', True)
 
     def reset(block=False):
-        lock = last_task.get_lock()
-        if lock.acquire(block):
-            try:
-                if not executed.is_set():
-                    return
-                current_task = get_current_task_id()
-                if current_task != last_task.raw:
-                    results.pop(current_task, None)
-                    executed.clear()
-            finally:
-                lock.release()
+        with _coordinator.lock(key, block=block) as locked:
+            if not locked or not _coordinator.exists(key, 'executed'):
+                return
+            if get_task_id() != _coordinator.read(key, 'last_task'):
+                if has_result():
+                    _coordinator.remove(key, 'result')
+                _coordinator.remove(key, 'executed')
 
     def has_result():
-        return get_current_task_id() in results
-
-    def get_current_task_id():
-        task = fab.env.command or ''
-        infrastructure = fab.env.infrastructure or ''
-        session = hashlib.md5()
-        session.update(task.encode('utf-16be'))
-        session.update(infrastructure.encode('utf-16be'))
-        for host in fab.env.all_hosts:
-            session.update(host.encode('utf-16be'))
-        return session.digest()
+        task_id, _ = _coordinator.read(key, 'result', (None, None))
+        return task_id == get_task_id()
 
     @functools.wraps(func)
     def _func(*args, **kwargs):
-        lock = last_task.get_lock()
-        if lock.acquire(block):
+        with _coordinator.lock(key, block=block) as locked:
+            if not locked:
+                return None
             try:
-                current_task = get_current_task_id()
-                if current_task != last_task.raw:
-                    last_task.raw = current_task
-                    results[current_task] = result = func(*args, **kwargs)
+                current_task = get_task_id()
+                if current_task != _coordinator.read(key, 'last_task'):
+                    _coordinator.write(key, 'last_task', current_task)
+                    # only result of the last task is kept
+                    _coordinator.remove(key, 'result')
+                    result = func(*args, **kwargs)
+                    _coordinator.write(key, 'result', (current_task, result))
                     return result
-                return results.get(current_task, default)
+                task_id, result = _coordinator.read(
+                    key,
+                    'result',
+                    (None, default),
+                )
+                return result if task_id == current_task else default
             finally:
-                executed.set()
-                lock.release()
-
-    last_task = multiprocessing.Array(ctypes.c_char, hashlib.md5().digest_size)
-    results = multiprocessing.Manager().dict()
-    executed = multiprocessing.Event()
+                _coordinator.write(key, 'executed', True)
 
     _func.has_result = has_result
     _func.reset = reset
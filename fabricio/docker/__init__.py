@@ -4,3 +4,4 @@ from .image import Image, ImageNotFoundError, ImageError, Registry
 from .container import Container, ContainerNotFoundError, ContainerError
 from .service import Service, ServiceNotFoundError
 from .stack import Stack
+from .rollout import RolloutError, RolloutTimeoutError
@@ -1,17 +1,19 @@
 import itertools
-import multiprocessing
 import sys
 
 import six
 
 from cached_property import cached_property
 from fabric import api as fab, colors
+from fabric.network import normalize
 from frozendict import frozendict
 
 import fabricio
 
-from fabricio import utils
+from fabricio import operations, utils
+from fabricio.cache import make_key
 
+from . import inspection
 from .image import Image
 
 
@@ -47,6 +49,9 @@ class BaseService(object):
 
     image = Image()
 
+    # attributes with state of workers shared by service and its forks
+    _shared_attributes = ()
+
     @Attribute
     def name(self):
         raise ValueError('must provide service name')
@@ -94,6 +99,28 @@ class BaseService(object):
     def image_id(self):
         raise NotImplementedError
 
+    def _project_info(self, fields, abort_exception):
+        """
+        returns `info` containing only the fields, only these fields are
+        requested from docker unless `info` is redefined by subclass or
+        instance (see `inspection.project()`)
+        """
+        info = next(
+            namespace['info']
+            for namespace in itertools.chain(
+                [vars(self)],
+                map(vars, type(self).__mro__),
+            )
+            if 'info' in namespace
+        )
+        if not isinstance(info, utils.default_property):
+            return self.info
+        return inspection.project(
+            self.inspect_command,
+            fields=fields,
+            abort_exception=abort_exception,
+        )
+
     @cached_property
     def _attributes(self):
         return set(
@@ -170,7 +197,10 @@ class BaseService(object):
                 ),
                 **attrs
             )
-        return self.__class__(image=image, options=fork_options, **attrs)
+        fork = self.__class__(image=image, options=fork_options, **attrs)
+        for attr in self._shared_attributes:
+            setattr(fork, attr, getattr(self, attr))
+        return fork
 
     def __str__(self):
         return six.text_type(self.name)
@@ -204,6 +234,9 @@ class BaseService(object):
     def restore(self, backup_name=None):
         pass
 
+    def wait_rollout(self, timeout=None):
+        pass
+
     def destroy(self):
         raise NotImplementedError
 
@@ -214,18 +247,114 @@ class BaseService(object):
 
 class ManagedService(BaseService):
 
+    _shared_attributes = BaseService._shared_attributes + (
+        'managers',
+        'managers_lock',
+    )
+
+    # seconds to wait for rollout of the new version by `wait_rollout()`
+    rollout_timeout = Attribute(default=600)
+
+    # seconds between checks of the rollout progress
+    rollout_interval = Attribute(default=2)
+
+    # lists swarm nodes by lines of hostname, role and addresses,
+    # None disables discovery of managers
+    nodes_command = (
+        "docker node inspect --format '{{.Description.Hostname}} "
+        "{{.Spec.Role}} {{.Status.Addr}}{{with .ManagerStatus}} "
+        "{{.Addr}}{{end}}' $(docker node ls --quiet)"
+    )
+
+    # seconds the discovered list of swarm nodes is valid for (also when
+    # cache is persisted without expiration, see `fabricio.cache.persist`)
+    nodes_ttl = 600
+
     def __init__(self, *args, **kwargs):
         super(ManagedService, self).__init__(*args, **kwargs)
-        self.managers = multiprocessing.Manager().dict()
+        self.managers = utils.SharedDict()
+        self.managers_lock = utils.SharedLock()
 
     def _is_manager(self):
         command = 'docker info 2>&1 | grep "Is Manager:"'
         return fabricio.run(command).endswith('true')
 
+    def _can_discover_managers(self):
+        # nothing to discover if there is the only host
+        return bool(self.nodes_command) and len(fab.env.all_hosts) > 1
+
+    @property
+    def _nodes_cache_key(self):
+        # nodes list is cached for particular set of hosts
+        hosts = ' '.join(sorted(fab.env.all_hosts))
+        return make_key(self.nodes_command, host='', salt=hosts)
+
+    def _discover_managers(self):
+        """
+        gets list of swarm nodes from the current host (which must be
+        manager) unless it is cached already
+        """
+        cache = operations.run.cache
+        key = self._nodes_cache_key
+        if key in cache:
+            return
+        try:
+            nodes = fabricio.run(self.nodes_command)
+        except fabricio.host_errors as error:
+            fabricio.log(
+                'WARNING: {error}'.format(error=error),
+                output=sys.stderr,
+                color=colors.red,
+            )
+            return
+        cache.set(key, nodes, command=self.nodes_command, ttl=self.nodes_ttl)
+        self._load_managers()
+
+    def _load_managers(self):
+        """
+        sets role of each host found in the cached list of swarm nodes,
+        so workers are known without connecting to them
+        """
+        nodes = operations.run.cache.get(self._nodes_cache_key)
+        if not nodes:
+            return
+        roles = {}
+        for node in nodes.splitlines():
+            fields = node.split()
+            if len(fields) < 2:
+                continue
+            names = fields[:1] + fields[2:3] + [
+                # manager address includes port
+                address.rsplit(':', 1)[0].strip('[]')
+                for address in fields[3:]
+            ]
+            for name in names:
+                roles[name] = fields[1] == 'manager'
+        for host_string in fab.env.all_hosts:
+            _, host, _ = normalize(host_string)
+            if host in roles and self.managers.get(host) is None:
+                self.managers[host] = roles[host]
+
+    def _get_manager_status(self):
+        is_manager = self.managers.get(fab.env.host)
+        if is_manager is None:
+            self._load_managers()
+            is_manager = self.managers.get(fab.env.host)
+        if is_manager is None:
+            is_manager = self.managers[fab.env.host] = self._is_manager()
+            if is_manager:
+                self._discover_managers()
+        return is_manager
+
     def is_manager(self, raise_manager_error=True):
         is_manager = self.managers.get(fab.env.host)
         try:
-            if is_manager is None:
+            if is_manager is None and self._can_discover_managers():
+                # parallel workers wait while one of them probes its host
+                # and discovers roles of others, so they are not probed
+                with self.managers_lock:
+                    is_manager = self._get_manager_status()
+            elif is_manager is None:
                 is_manager = self.managers[fab.env.host] = self._is_manager()
         except fabricio.host_errors as error:
             is_manager = self.managers[fab.env.host] = False
@@ -270,3 +399,17 @@ class ManagedService(BaseService):
     def restore(self, backup_name=None):
         if self.is_manager():
             super(ManagedService, self).restore(backup_name=backup_name)
+
+    def wait_rollout(self, timeout=None):
+        """
+        waits until every replica runs the current version (see
+        `fabricio.docker.rollout.Watcher`), `rollout_timeout` is used
+        if timeout is not provided
+        """
+        if self.is_manager():
+            if timeout is None:
+                timeout = self.rollout_timeout
+            self._wait_rollout(timeout=timeout)
+
+    def _wait_rollout(self, timeout):
+        raise NotImplementedError
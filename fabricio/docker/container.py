@@ -1,10 +1,10 @@
-import json
 import warnings
 
 import fabricio
 
 from fabricio import utils
 
+from . import inspection
 from .base import BaseService, Option, Attribute, ServiceError
 
 
@@ -33,14 +33,18 @@ class Container(BaseService):
     restart = Option()
     stop_signal = Option(name='stop-signal', safe=True)
 
+    @property
+    def inspect_command(self):
+        return 'docker inspect --type container {container}'.format(
+            container=self,
+        )
+
     @utils.default_property
     def info(self):
-        command = 'docker inspect --type container {container}'
-        info = fabricio.run(
-            command.format(container=self),
+        return inspection.inspect(
+            self.inspect_command,
             abort_exception=ContainerNotFoundError,
         )
-        return json.loads(info)[0]
 
     def delete(
         self,
@@ -61,21 +65,27 @@ class Container(BaseService):
         delete_image_callback = delete_image and self.image.get_delete_callback()
 
         options.setdefault('volumes', True)  # default option
-        fabricio.run('docker rm {options} {container}'.format(
-            container=self,
-            options=options,
-        ))
+        inspection.run(
+            'docker rm {options} {container}'.format(
+                container=self,
+                options=options,
+            ),
+            target=self,
+        )
 
         if delete_image_callback:
             delete_image_callback()
 
     def run(self, tag=None, registry=None, account=None):
-        self.image[registry:tag:account].run(
-            command=self.command,
-            temporary=False,
-            name=self,
-            options=self.options,
-        )
+        try:
+            self.image[registry:tag:account].run(
+                command=self.command,
+                temporary=False,
+                name=self,
+                options=self.options,
+            )
+        finally:
+            inspection.invalidate(target=self)
 
     def execute(
         self,
@@ -104,66 +114,89 @@ class Container(BaseService):
 
     def start(self):
         command = 'docker start {container}'
-        fabricio.run(command.format(container=self))
+        inspection.run(command.format(container=self), target=self)
 
     def stop(self, timeout=None):
         if timeout is None:
             timeout = self.stop_timeout
         command = 'docker stop --time {timeout} {container}'
-        fabricio.run(command.format(container=self, timeout=timeout))
+        inspection.run(
+            command.format(container=self, timeout=timeout),
+            target=self,
+        )
 
     def reload(self, timeout=None):
         if timeout is None:
             timeout = self.stop_timeout
         command = 'docker restart --time {timeout} {container}'
-        fabricio.run(command.format(container=self, timeout=timeout))
+        inspection.run(
+            command.format(container=self, timeout=timeout),
+            target=self,
+        )
 
     def rename(self, new_name):
         command = 'docker rename {container} {new_name}'
-        fabricio.run(command.format(container=self, new_name=new_name))
+        inspection.run(
+            command.format(container=self, new_name=new_name),
+            target=self,
+        )
         self.name = new_name
+        inspection.invalidate(target=self)
 
     def signal(self, signal):
         command = 'docker kill --signal {signal} {container}'
-        fabricio.run(command.format(container=self, signal=signal))
+        inspection.run(
+            command.format(container=self, signal=signal),
+            target=self,
+        )
 
     @property
     def image_id(self):
-        return self.info['Image']
+        info = self._project_info(['Image'], ContainerNotFoundError)
+        return info['Image']
 
     def update(self, tag=None, registry=None, account=None, force=False):
+        obsolete_container = self.get_backup_version()
         if not force:
+            new_image = self.image[registry:tag:account]
+            inspection.inspect_all([self, new_image, obsolete_container])
             try:
-                if self.image_id == self.image[registry:tag:account].info['Id']:
+                if self.image_id == new_image.info['Id']:
                     self.start()  # force starting container
                     return False
             except ContainerNotFoundError:
                 pass
-        obsolete_container = self.get_backup_version()
         try:
-            obsolete_container.delete(delete_image=True)
+            with fabricio.batch():
+                obsolete_container.delete(delete_image=True)
         except fabricio.Error:
             pass
         try:
             backup_container = self.fork()
             backup_container.rename(obsolete_container.name)
         except fabricio.Error:
-            pass  # current container not found
-        else:
-            backup_container.stop()
-        self.run(tag=tag, registry=registry, account=account)
+            backup_container = None  # current container not found
+        with fabricio.batch():
+            if backup_container is not None:
+                backup_container.stop()
+            self.run(tag=tag, registry=registry, account=account)
         return True
 
     def revert(self):
         backup_container = self.get_backup_version()
+        inspection.inspect_all([backup_container, self])
         try:
             backup_container.info
         except ContainerNotFoundError:
             raise ContainerError('backup container not found')
-        self.stop()
-        backup_container.start()
-        self.delete(delete_image=True)
-        backup_container.rename(self.name)
+        delete_image_callback = self.image.get_delete_callback()
+        with fabricio.batch():
+            self.stop()
+            backup_container.start()
+        with fabricio.batch():
+            self.delete()
+            delete_image_callback()
+            backup_container.rename(self.name)
 
     def get_backup_version(self):
         return self.fork(name='{container}_backup'.format(container=self))
@@ -1,15 +1,16 @@
-import json
+import threading
 import warnings
+import weakref
 
-import docker.auth
-import docker.utils
 import six
 
 from functools import partial
 
 import fabricio
 
-from fabricio import utils
+from fabricio import retry, utils
+
+from . import inspection
 
 
 class ImageError(fabricio.Error):
@@ -20,6 +21,49 @@ class ImageNotFoundError(ImageError):
     pass
 
 
+INDEX_NAME = 'docker.io'
+
+
+@utils.memoize(maxsize=1024)
+def parse_image_name(image):
+    """
+    splits image reference into registry, name and tag (or digest)
+    following Docker distribution grammar:
+
+        [domain[:port]/][namespace/...]name[:tag][@digest]
+
+    The first component of the name is a domain only if it contains '.'
+    or ':' or is 'localhost', Docker Hub registry is returned as None
+    (result is the same as `docker-py` one)
+    """
+    if not image:
+        return None, None, None
+    if '://' in image:
+        raise ImageError(
+            'Repository name cannot contain a scheme ({image})'.format(
+                image=image,
+            )
+        )
+    repository, separator, tag = image.rpartition('@')
+    if not separator:
+        repository, separator, tag = image.rpartition(':')
+        if not separator or '/' in tag:
+            repository, tag = image, None
+    domain, separator, name = repository.partition('/')
+    if not separator or (
+        '.' not in domain and ':' not in domain and domain != 'localhost'
+    ):
+        domain, name = INDEX_NAME, repository
+    if domain.startswith('-') or domain.endswith('-'):
+        raise ImageError(
+            'Invalid index name ({domain}). Cannot begin or end with a '
+            'hyphen.'.format(domain=domain)
+        )
+    if domain in (INDEX_NAME, 'index.' + INDEX_NAME):
+        domain = None
+    return domain, name, tag
+
+
 class Registry(six.text_type):
 
     def __new__(cls, value=None, *args, **kwargs):
@@ -33,15 +77,161 @@ class Registry(six.text_type):
         self.port = port and int(port)
 
 
+class ImageReference(object):
+    """
+    immutable reference to the image interned by its value (registry,
+    name, tag and digest mode), so all `Image` objects pointing to the
+    same image share the same reference
+    """
+
+    __slots__ = (
+        'registry',
+        'name',
+        'tag',
+        'use_digest',
+        'string',
+        'slices',
+        '__weakref__',
+    )
+
+    _references = weakref.WeakValueDictionary()
+
+    _lock = threading.Lock()
+
+    def __new__(cls, registry=None, name=None, tag=None, use_digest=False):
+        key = registry, name, tag, use_digest
+        with cls._lock:
+            reference = cls._references.get(key)
+            if reference is None:
+                reference = super(ImageReference, cls).__new__(cls)
+                reference._init(*key)
+                cls._references[key] = reference
+        return reference
+
+    def _init(self, registry, name, tag, use_digest):
+        init = partial(object.__setattr__, self)
+        init('registry', Registry(registry))
+        init('name', name)
+        init('tag', tag)
+        init('use_digest', use_digest)
+        # slices are kept while anything refers to them
+        init('slices', weakref.WeakValueDictionary())
+        string = None
+        if name:
+            string = '{registry}{name}{tag}'.format(
+                registry=registry and '{0}/'.format(registry) or '',
+                name=name,
+                tag=tag and '{0}{1}'.format('@' if use_digest else ':', tag),
+            )
+        init('string', string)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError('image reference is immutable')
+
+    def __reduce__(self):
+        return ImageReference, (
+            self.registry,
+            self.name,
+            self.tag,
+            self.use_digest,
+        )
+
+    @staticmethod
+    @utils.memoize(maxsize=1024)
+    def parse(name, tag=None, registry=None):
+        if name is None:
+            return ImageReference()
+        _registry, _name, _tag = parse_image_name(name)
+        return ImageReference(
+            registry=registry or _registry,
+            name=_name,
+            tag=tag or _tag or 'latest',  # TODO 'latest' is unnecessary
+            use_digest=bool(not tag and '@' in name),
+        )
+
+    def replace(self, **fields):
+        """
+        returns reference with the fields replaced
+        """
+        values = dict(
+            registry=self.registry,
+            name=self.name,
+            tag=self.tag,
+            use_digest=self.use_digest,
+        )
+        values.update(fields)
+        return ImageReference(**values)
+
+    def slice(self, registry=None, tag=None, account=None):
+        key = registry, tag, account
+        reference = self.slices.get(key)
+        if reference is None:
+            reference = self._slice(registry, tag, account)
+            self.slices[key] = reference
+        return reference
+
+    def _slice(self, registry, tag, account):
+        use_digest = self.use_digest
+
+        # tag can override image registry, name and/or digest
+        _registry, _name, _tag = parse_image_name(tag)
+        if not _tag:
+            if _registry:
+                _tag = 'latest'
+            else:
+                _tag, _name = _name, None
+        if _tag:
+            use_digest = _name and tag and '@' in tag
+
+        registry = _registry or registry or self.registry
+        name = _name or account and self.name and '{account}/{name}'.format(
+            account=account,
+            name=self.name.split('/')[-1],
+        ) or self.name
+        tag = _tag or tag or self.tag
+
+        if use_digest:
+            name = '{name}@{digest}'.format(name=name, digest=tag)
+            tag = None
+
+        return self.parse(name, tag, registry)
+
+
 class Image(object):
 
-    name = None
+    reference = ImageReference()
 
-    tag = None
+    @property
+    def name(self):
+        return self.reference.name
 
-    registry = None
+    @name.setter
+    def name(self, name):
+        self.reference = self.reference.replace(name=name)
 
-    use_digest = False
+    @property
+    def tag(self):
+        return self.reference.tag
+
+    @tag.setter
+    def tag(self, tag):
+        self.reference = self.reference.replace(tag=tag)
+
+    @property
+    def registry(self):
+        return self.reference.registry
+
+    @registry.setter
+    def registry(self, registry):
+        self.reference = self.reference.replace(registry=registry)
+
+    @property
+    def use_digest(self):
+        return self.reference.use_digest
+
+    @use_digest.setter
+    def use_digest(self, use_digest):
+        self.reference = self.reference.replace(use_digest=use_digest)
 
     @property
     def temp_tag(self):
@@ -54,14 +244,18 @@ class Image(object):
 
     def __init__(self, name=None, tag=None, registry=None):
         if name is not None and not isinstance(name, Image):
-            _registry, _name, _tag = self.parse_image_name(name)
-            self.name = _name
-            self.tag = tag or _tag or 'latest'  # TODO 'latest' is unnecessary
-            self.registry = Registry(registry or _registry)
-            self.use_digest = not tag and '@' in name
+            self.reference = ImageReference.parse(name, tag, registry)
         self.field_names = {}  # descriptor's cache
         self.service = None
 
+    @classmethod
+    def _bind(cls, reference):
+        image = super(Image, cls).__new__(cls)
+        image.reference = reference
+        image.field_names = {}
+        image.service = None
+        return image
+
     def __str__(self):
         if self.service is not None:
             image_id = getattr(self.service, 'image_id', None)
@@ -70,22 +264,13 @@ class Image(object):
         return super(Image, self).__str__()
 
     def __repr__(self):
-        if not self.name:
+        string = self.reference.string
+        if not string:
             raise ImageError('image name is not set or empty')
-        tag_separator = '@' if self.use_digest else ':'
-        registry = self.registry and '{0}/'.format(self.registry) or ''
-        tag = self.tag and '{0}{1}'.format(tag_separator, self.tag) or ''
-        return '{registry}{name}{tag}'.format(
-            registry=registry,
-            name=self.name,
-            tag=tag,
-        )
+        return string
 
     def __bool__(self):
-        try:
-            return bool(repr(self))
-        except ImageError:
-            return False
+        return bool(self.reference.string)
 
     def __nonzero__(self):
         return self.__bool__()
@@ -110,31 +295,15 @@ class Image(object):
             registry, tag, account = item.start, item.stop, item.step
         else:
             registry, tag, account = None, item, None
-
-        use_digest = self.use_digest
-
-        # tag can override image registry, name and/or digest
-        _registry, _name, _tag = self.parse_image_name(tag)
-        if not _tag:
-            if _registry:
-                _tag = 'latest'
-            else:
-                _tag, _name = _name, None
-        if _tag:
-            use_digest = _name and tag and '@' in tag
-
-        registry = _registry or registry or self.registry
-        name = _name or account and self.name and '{account}/{name}'.format(
-            account=account,
-            name=self.name.split('/')[-1],
-        ) or self.name
-        tag = _tag or tag or self.tag
-
-        if use_digest:
-            name = '{name}@{digest}'.format(name=name, digest=tag)
-            tag = None
-
-        return self.__class__(name=name, tag=tag, registry=registry)
+        reference = self.reference.slice(registry, tag, account)
+        cls = type(self)
+        if cls.__init__ is Image.__init__:
+            return cls._bind(reference)
+        # subclass may need its own initialization
+        name, tag = reference.name, reference.tag
+        if reference.use_digest:
+            name, tag = '{0}@{1}'.format(name, tag), None
+        return cls(name=name, tag=tag, registry=reference.registry)
 
     def get_field_name(self, owner_cls):
         field_name = self.field_names.get(owner_cls)
@@ -151,15 +320,7 @@ class Image(object):
                     self.field_names[owner_cls] = field_name = attr
         return field_name
 
-    @staticmethod
-    def parse_image_name(image):
-        if not image:
-            return None, None, None
-        repository, tag = docker.utils.parse_repository_tag(image)
-        registry, name = docker.auth.resolve_repository_name(repository)
-        if registry == docker.auth.INDEX_NAME:
-            registry = None
-        return registry, name, tag
+    parse_image_name = staticmethod(parse_image_name)
 
     @property
     def digest(self):
@@ -171,18 +332,24 @@ class Image(object):
 
     @utils.default_property
     def info(self):
-        command = 'docker inspect --type image {image}'
-        info = fabricio.run(
-            command.format(image=self),
+        return self._get_info()
+
+    @property
+    def inspect_command(self):
+        return 'docker inspect --type image {image}'.format(image=self)
+
+    def _get_info(self, run=None):
+        return inspection.inspect(
+            self.inspect_command,
             abort_exception=ImageNotFoundError,
+            run=run,
         )
-        return json.loads(info)[0]
 
     def get_delete_callback(self, force=False):
         command = 'docker rmi {force}{image}'
         force = force and '--force ' or ''
         return partial(
-            fabricio.run,
+            inspection.run,
             command.format(image=self, force=force),
             ignore_errors=True,
         )
@@ -214,8 +381,15 @@ class Image(object):
         temporary=True,
         options=(),
         quiet=True,
+        buffer_size=None,
     ):
+        """
+        `buffer_size` limits output kept in memory (see `fabricio.run`)
+        """
         run_command = 'docker run {options} {image} {command}'
+        kwargs = {}
+        if buffer_size is not None:
+            kwargs.update(buffer_size=buffer_size)
         return fabricio.run(
             run_command.format(
                 image=self,
@@ -227,6 +401,7 @@ class Image(object):
                 ),
             ),
             quiet=quiet,
+            **kwargs
         )
 
     def create(self, command=None, name=None, options=()):  # pragma: no cover
@@ -246,6 +421,8 @@ class Image(object):
 
     def pull(self, local=False, use_cache=False, ignore_errors=False):
         run = fabricio.local if local else fabricio.run
+        # output is printed while being received, only its tail is kept
+        buffer_size = run.buffer_size
         run = partial(run, use_cache=use_cache, ignore_errors=ignore_errors)
         run_ignore_errors = partial(run, ignore_errors=True)
 
@@ -255,9 +432,16 @@ class Image(object):
             'docker tag {image} {tag} '
             '&& docker rmi {image}'.format(image=image, tag=self.temp_tag)
         )
-        pull_result = run('docker pull ' + image, quiet=False)
+        with retry.attached('pull'):
+            pull_result = run(
+                'docker pull ' + image,
+                quiet=False,
+                buffer_size=buffer_size,
+            )
         if pull_result.succeeded:
             run_ignore_errors('docker rmi {tag}'.format(tag=self.temp_tag))
+        if not local:
+            inspection.invalidate()
 
     def build(self, local=False, build_path='.', options=None, use_cache=False):
         if local:
@@ -265,6 +449,8 @@ class Image(object):
             run_capture_output = partial(run, capture=True)
         else:
             run = run_capture_output = fabricio.run
+        # output is printed while being received, only its tail is kept
+        buffer_size = run.buffer_size
         run = partial(run, use_cache=use_cache)
         run_capture_output = partial(run_capture_output, use_cache=use_cache)
         run_ignore_errors = partial(run, ignore_errors=True)
@@ -277,11 +463,10 @@ class Image(object):
         options.setdefault('pull', 1)
         options.setdefault('force-rm', 1)
 
-        with utils.patch(fabricio, 'run', run_capture_output):
-            try:
-                old_parent_id = self.info['Parent']
-            except ImageNotFoundError:
-                old_parent_id = ''
+        try:
+            old_parent_id = self._get_info(run=run_capture_output)['Parent']
+        except ImageNotFoundError:
+            old_parent_id = ''
 
         run_ignore_errors(
             'docker tag {image} {tag} '
@@ -293,8 +478,11 @@ class Image(object):
                 build_path=build_path,
             ),
             quiet=False,
+            buffer_size=buffer_size,
         )
         run_ignore_errors('docker rmi {tag} {old_parent}'.format(
             tag=self.temp_tag,
             old_parent=old_parent_id,
         ))
+        if not local:
+            inspection.invalidate()
@@ -0,0 +1,232 @@
+"""
+cache of `docker inspect` results shared by `Container`, `Image` and
+`Service` (and their forks)
+
+Results are kept per host for the current task only. Commands which
+change inspected objects (`docker rm`, `docker rename`, `docker service
+update`, `docker stack deploy`, etc.) invalidate results of the host
+(or only the result of the changed object if it is known).
+
+Several objects can be inspected at once by `inspect_all()`.
+
+When only few fields are needed `project()` asks docker for these fields
+only (using Go template) instead of the whole object description, which
+may be large, e.g. `PreviousSpec` of swarm services.
+"""
+import collections
+import json
+import threading
+
+from fabric import api as fab
+from six.moves import shlex_quote
+
+import fabricio
+
+from fabricio import decorators, operations, retry, utils
+from fabricio.cache import Cache, make_key
+
+_cache = Cache(max_size=1024)
+
+_lock = threading.Lock()
+
+_task = [None]  # task which cached results belong to
+
+
+def inspect(command, abort_exception=fabricio.Error, run=None):
+    """
+    returns parsed result of the inspect command cached for the current
+    task and host, result is not cached if custom `run` is provided
+    """
+    if run is not None:
+        return json.loads(_inspect(command, abort_exception, run))[0]
+    # results are parsed every time, so callers can't spoil cached ones
+    return json.loads(_get(command, abort_exception))[0]
+
+
+def project(command, fields, abort_exception=fabricio.Error):
+    """
+    returns result of the inspect command containing only the fields
+    (dot separated paths, e.g. 'Config.Labels'), missing fields are None
+
+    Full result is used if it is cached already, otherwise only the fields
+    are requested.
+    """
+    with _lock:
+        result = _cache.get(_make_key(command), utils.DEFAULT)
+    if result is utils.DEFAULT:
+        template = make_template(fields)
+        return json.loads(_get(command, abort_exception, template))[0]
+    _check(result, command, abort_exception)
+    return prune(json.loads(result)[0], fields)
+
+
+def make_template(fields):
+    """
+    returns Go template which renders the fields of the inspected object
+    in the same structure `docker inspect` does
+    """
+    def render(tree, path=''):
+        return '{%s}' % ','.join(
+            '"{name}":{value}'.format(
+                name=name,
+                value=(
+                    render(subtree, path + '.' + name) if subtree else
+                    '{{json %s.%s}}' % (path, name)
+                ),
+            )
+            for name, subtree in tree.items()
+        )
+    return '[%s]' % render(_make_tree(fields))
+
+
+def prune(info, fields):
+    """
+    returns copy of the inspected object description with the fields only
+    """
+    def copy(info, tree):
+        return dict(
+            (
+                name,
+                copy(info.get(name) or {}, subtree) if subtree
+                else info.get(name),
+            )
+            for name, subtree in tree.items()
+        )
+    return copy(info, _make_tree(fields))
+
+
+def _make_tree(fields):
+    tree = collections.OrderedDict()
+    for field in fields:
+        node = tree
+        for name in field.split('.'):
+            node = node.setdefault(name, collections.OrderedDict())
+    return tree
+
+
+def inspect_all(objects, fields=None):
+    """
+    inspects containers, images and services by single command, results
+    (including absence of objects) are cached, so the following access
+    to `info` of these objects (or to the fields by `project()` if
+    provided) needs no extra call
+
+    Objects already inspected are skipped. Single object is not
+    inspected at all, its `info` is inspected on demand as usual.
+    """
+    template = fields and make_template(fields)
+    host = fab.env.host_string
+    commands = collections.OrderedDict()
+    with _lock:
+        for obj in objects:
+            command = obj.inspect_command
+            real_command = _make_command(command, template)
+            if _make_key(real_command) not in _cache:
+                commands[real_command] = command
+    if len(commands) < 2:
+        return
+    batch = operations.Batch()
+    batch_commands = [
+        batch.add(real_command, ignore_errors=True)
+        for real_command in commands
+    ]
+    with operations.unbatched(), retry.attached('inspect'):
+        script = batch.make_script(batch_commands)
+        result = fabricio.run(script, ignore_errors=True)
+    try:
+        batch.set_results(batch_commands, result)
+    except fabricio.Error:
+        pass  # the rest objects will be inspected on demand
+    with _lock:
+        for batch_command in batch_commands:
+            result = batch_command.result
+            if result is None or result.succeeded and not result.strip():
+                # output of successful inspection can't be empty,
+                # such object will be inspected on demand
+                continue
+            _cache.set(
+                _make_key(batch_command.command),
+                result,
+                host=host,
+                command=commands[batch_command.command],
+            )
+
+
+def _get(command, abort_exception, template=None):
+    host = fab.env.host_string
+    real_command = _make_command(command, template)
+    with _lock:
+        key = _make_key(real_command)
+        result = _cache.get(key, utils.DEFAULT)
+    if result is utils.DEFAULT:
+        result = _inspect(real_command, abort_exception, fabricio.run)
+        with _lock:
+            # projections are stored along with the original command,
+            # this way they are invalidated together with full result
+            _cache.set(key, result, host=host, command=command)
+    _check(result, real_command, abort_exception)
+    return result
+
+
+def _check(result, command, abort_exception):
+    if getattr(result, 'failed', False):
+        # object was not found by `inspect_all()`
+        raise abort_exception(
+            "run() received nonzero return code {status} while "
+            "executing '{command}'!".format(
+                status=result.return_code,
+                command=command,
+            )
+        )
+
+
+def _make_command(command, template=None):
+    if not template:
+        return command
+    return '{command} --format {template}'.format(
+        command=command,
+        template=shlex_quote(template),
+    )
+
+
+def _make_key(command):
+    task = decorators.get_task_id()
+    if _task[0] != task:
+        _cache.clear()
+        _task[0] = task
+    return make_key(command, host=fab.env.host_string or '', salt=task)
+
+
+def _inspect(command, abort_exception, run):
+    with operations.unbatched(), retry.attached('inspect'):
+        return run(command, abort_exception=abort_exception)
+
+
+def run(command, target=None, **kwargs):
+    """
+    executes command which changes inspected objects of the current host
+    invalidating cached results (only result of the target if provided)
+    """
+    try:
+        return fabricio.run(command, **kwargs)
+    finally:
+        invalidate(target=target)
+
+
+def invalidate(name=None, target=None):
+    """
+    removes cached results of the current host (only those mentioning
+    the name or only result of the target object if provided)
+    """
+    command = target is not None and target.inspect_command or None
+    with _lock:
+        return _cache.invalidate(
+            host=fab.env.host_string,
+            contains=name,
+            command=command,
+        )
+
+
+def clear():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,320 @@
+"""
+watcher of swarm rollouts which waits until every replica of the updated
+services runs their current spec (see `Service.wait_rollout()` and
+`Stack.wait_rollout()`)
+
+All watched services are polled by single round trip per interval:
+`docker service ls` gives number of running and desired replicas,
+`docker service inspect` gives current image and state of the rolling
+update (if any) while `docker service ps` gives images of tasks, so
+replicas still running previous spec are not taken for updated ones
+(state of the update may remain 'completed' from previous update until
+docker starts the new one).
+
+`plan()` chooses parallelism, delay and failure action of the rolling
+update (see `Service.plan_rollout()`).
+"""
+import collections
+import json
+import math
+import re
+import time
+
+import six
+
+from six.moves import shlex_quote
+
+import fabricio
+
+from fabricio import operations, retry
+
+from .base import ServiceError
+
+# update states meaning that new spec was rejected
+failed_update_states = (
+    'paused',
+    'rollback_started',
+    'rollback_paused',
+    'rollback_completed',
+)
+
+replicas_regex = re.compile(r'^(\d+)/(\d+)')
+
+
+class RolloutError(ServiceError):
+    pass
+
+
+class RolloutTimeoutError(RolloutError):
+    pass
+
+
+class Status(collections.namedtuple(
+    'Status',
+    ['name', 'running', 'desired', 'update_state', 'message', 'outdated'],
+)):
+
+    __slots__ = ()
+
+    @property
+    def failed(self):
+        return (
+            self.desired is None
+            or self.update_state in failed_update_states
+        )
+
+    @property
+    def converged(self):
+        return (
+            not self.failed
+            and self.update_state in (None, 'completed')
+            and self.running >= self.desired
+            and not self.outdated
+        )
+
+    def __str__(self):
+        if self.desired is None:
+            return '{0}: not found'.format(self.name)
+        status = '{0}: {1}/{2} running'.format(
+            self.name,
+            self.running,
+            self.desired,
+        )
+        if self.outdated:
+            status += ', {0} outdated'.format(self.outdated)
+        if self.update_state:
+            status += ', update {0}'.format(self.update_state)
+        if self.message:
+            status += ' ({0})'.format(self.message)
+        return status
+
+
+class Watcher(object):
+    """
+    polls services each `interval` seconds until all of them converge,
+    raises `RolloutError` if update of any service was paused or rolled
+    back and `RolloutTimeoutError` if services have not converged within
+    `timeout` seconds
+    """
+
+    def __init__(
+        self,
+        services,
+        timeout=600,
+        interval=2,
+        timer=time.time,
+        sleep=time.sleep,
+    ):
+        self.services = list(map(six.text_type, services))
+        self.timeout = timeout
+        self.interval = interval
+        self.timer = timer
+        self.sleep = sleep
+
+    @property
+    def replicas_command(self):
+        filters = ' '.join(
+            '--filter name={0}'.format(shlex_quote(service))
+            for service in self.services
+        )
+        return "docker service ls {filters} --format '{format}'".format(
+            filters=filters,
+            format='{{.Name}} {{.Replicas}}',
+        )
+
+    @property
+    def update_status_command(self):
+        return "docker service inspect --format '{format}' {services}".format(
+            format=(
+                '{{.Spec.Name}} {{.Spec.TaskTemplate.ContainerSpec.Image}} '
+                '{{json .UpdateStatus}}'
+            ),
+            services=' '.join(map(shlex_quote, self.services)),
+        )
+
+    @property
+    def tasks_command(self):
+        return (
+            'docker service ps --filter desired-state=running --no-trunc '
+            "--format '{format}' {services}".format(
+                format='{{.Name}} {{.Image}}',
+                services=' '.join(map(shlex_quote, self.services)),
+            )
+        )
+
+    def poll(self):
+        """
+        returns current `Status` of each service
+        """
+        batch = operations.Batch()
+        replicas_command = batch.add(self.replicas_command)
+        update_status_command = batch.add(
+            self.update_status_command,
+            ignore_errors=True,  # removed services are reported by status
+        )
+        tasks_command = batch.add(self.tasks_command, ignore_errors=True)
+        commands = [replicas_command, update_status_command, tasks_command]
+        with operations.unbatched(), retry.attached('inspect'):
+            result = fabricio.run(
+                batch.make_script(commands),
+                ignore_errors=True,
+            )
+        batch.set_results(commands, result)
+
+        replicas = {}
+        for line in replicas_command.result.splitlines():
+            name, _, service_replicas = line.partition(' ')
+            match = replicas_regex.match(service_replicas.strip())
+            if match:
+                replicas[name] = tuple(map(int, match.groups()))
+        images = {}
+        update_statuses = {}
+        for line in update_status_command.result.splitlines():
+            try:
+                name, image, update_status = line.split(' ', 2)
+                update_statuses[name] = json.loads(update_status) or {}
+            except ValueError:
+                continue  # error message of the service not found
+            images[name] = image
+        outdated = collections.Counter()
+        for line in tasks_command.result.splitlines():
+            # names of several tasks of the same slot may be indented
+            fields = line.split()
+            if len(fields) < 2:
+                continue
+            task, image = fields[-2:]
+            # task name is made of service name and slot (or node ID)
+            name = task.rpartition('.')[0]
+            if name in images and image != images[name]:
+                outdated[name] += 1
+        return [
+            Status(
+                name=service,
+                running=replicas.get(service, (None, None))[0],
+                desired=replicas.get(service, (None, None))[1],
+                update_state=update_statuses.get(service, {}).get('State'),
+                message=update_statuses.get(service, {}).get('Message'),
+                outdated=outdated[service],
+            )
+            for service in self.services
+        ]
+
+    def wait(self):
+        """
+        returns final statuses of services, progress of services is logged
+        each time it changes
+        """
+        deadline = None
+        if self.timeout is not None:
+            deadline = self.timer() + self.timeout
+        reported = {}
+        while True:
+            # docker may need a moment to start the update just requested
+            self.sleep(self.interval)
+            statuses = self.poll()
+            for status in statuses:
+                if reported.get(status.name) != status:
+                    fabricio.log('rollout of {0}'.format(status))
+                    reported[status.name] = status
+            failed = [status for status in statuses if status.failed]
+            if failed:
+                raise RolloutError('rollout failed: {0}'.format(
+                    '; '.join(map(str, failed)),
+                ))
+            pending = [status for status in statuses if not status.converged]
+            if not pending:
+                return statuses
+            if deadline is not None and self.timer() >= deadline:
+                raise RolloutTimeoutError(
+                    'rollout has not finished in {timeout} seconds: '
+                    '{pending}'.format(
+                        timeout=self.timeout,
+                        pending='; '.join(map(str, pending)),
+                    )
+                )
+
+
+class Plan(collections.namedtuple(
+    'Plan',
+    ['replicas', 'parallelism', 'delay', 'failure_action', 'duration'],
+)):
+
+    __slots__ = ()
+
+    @property
+    def options(self):
+        """
+        options of `docker service update` implementing the plan
+        """
+        return collections.OrderedDict([
+            ('update-parallelism', self.parallelism),
+            ('update-delay', '{0}s'.format(self.delay)),
+            ('update-failure-action', self.failure_action),
+        ])
+
+    def __str__(self):
+        return (
+            '{replicas} replica(s) by {parallelism} with {delay}s delay, '
+            'failure action: {failure_action}, expected time: {duration}s'
+            ''.format(**self._asdict())
+        )
+
+
+def get_max_unavailable(replicas, max_unavailable):
+    """
+    returns number of replicas which can be updated at once, budget is
+    either number of replicas or their percentage (e.g. '25%' or 0.25)
+    """
+    if isinstance(max_unavailable, six.string_types):
+        if max_unavailable.endswith('%'):
+            max_unavailable = float(max_unavailable[:-1]) / 100
+        else:
+            max_unavailable = float(max_unavailable)
+    if max_unavailable < 1:
+        max_unavailable *= replicas
+    return max(1, int(max_unavailable))
+
+
+def plan(replicas, duration=None, max_unavailable=None, task_time=10):
+    """
+    returns `Plan` of the rolling update of the replicas which fits the
+    target duration (in seconds) and/or max unavailable budget, each
+    batch of replicas is expected to be replaced in `task_time` seconds
+
+    Replicas are updated by the smallest batches finishing in time (or
+    by the largest batches allowed by the budget if duration is not
+    provided), time left is spread between batches as delay. Update of
+    several replicas at once is rolled back on failure, while failed
+    update of one replica at a time is paused.
+    """
+    replicas = max(int(replicas), 0)
+    limit = replicas or 1
+    if max_unavailable is not None:
+        limit = min(limit, get_max_unavailable(replicas, max_unavailable))
+    if duration is None:
+        parallelism = limit
+    else:
+        batches_in_time = max(1, int(float(duration) // task_time))
+        parallelism = int(math.ceil(float(replicas) / batches_in_time))
+        parallelism = min(max(parallelism, 1), limit)
+    batches = int(math.ceil(float(replicas) / parallelism))
+    delay = 0
+    if duration is not None and batches > 1:
+        time_left = float(duration) - batches * task_time
+        delay = max(0, int(time_left // (batches - 1)))
+    return Plan(
+        replicas=replicas,
+        parallelism=parallelism,
+        delay=delay,
+        failure_action='rollback' if parallelism > 1 else 'pause',
+        duration=int(batches * task_time + max(batches - 1, 0) * delay),
+    )
+
+
+def wait(services, timeout=600, interval=2):
+    """
+    waits until all replicas of the services run their current spec
+    """
+    if not services:
+        return []
+    return Watcher(services, timeout=timeout, interval=interval).wait()
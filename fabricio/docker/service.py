@@ -1,3 +1,4 @@
+import collections
 import functools
 import hashlib
 import itertools
@@ -5,17 +6,18 @@ import json
 import re
 import shlex
 
-import dpath
 import six
 
 from cached_property import cached_property
+from fabric import api as fab
 from frozendict import frozendict
 from six.moves import map, shlex_quote, range
 
 import fabricio
 
-from fabricio import utils
+from fabricio import operations, retry, utils
 
+from . import inspection, rollout
 from .base import ManagedService, Option, Attribute, ServiceError
 
 
@@ -31,6 +33,51 @@ def get_option_value(string, option):
         return value and value[0] or None
 
 
+def compile_path(path):
+    """
+    compiles path such as '/Spec/TaskTemplate/ContainerSpec/Mounts/*/Target'
+    into function which returns list of values found by this path in the
+    inspected object (in the same way `dpath.util.values()` does), '*'
+    matches every item of list or dict
+    """
+    def found(value, values):
+        values.append(value)
+
+    def make_step(key, next_step):
+        if key == '*':
+            def step(value, values):
+                if isinstance(value, dict):
+                    value = value.values()
+                elif not isinstance(value, list):
+                    return
+                for item in value:
+                    next_step(item, values)
+        elif key.isdigit():
+            index = int(key)
+
+            def step(value, values):
+                if isinstance(value, dict):
+                    if key in value:
+                        next_step(value[key], values)
+                elif isinstance(value, list) and index < len(value):
+                    next_step(value[index], values)
+        else:
+            def step(value, values):
+                if isinstance(value, dict) and key in value:
+                    next_step(value[key], values)
+        return step
+
+    walk = found
+    for key in reversed(path.strip('/').split('/')):
+        walk = make_step(key, walk)
+
+    def get_values(obj):
+        values = []
+        walk(obj, values)
+        return values
+    return get_values
+
+
 class ServiceNotFoundError(ServiceError):
     pass
 
@@ -80,13 +127,16 @@ class RemovableOption(Option):
 
         return list(current_values) or None
 
+    @cached_property
+    def get_path_values(self):
+        # options are class attributes, so path is compiled once per class
+        return compile_path(self.path)
+
     def get_current_values(self, service_info):
+        values = self.get_path_values(service_info)
         if '*' in self.path:
-            return dpath.util.values(service_info, self.path)
-        try:
-            return dpath.util.get(service_info, self.path)
-        except KeyError:
-            return []
+            return values
+        return values[0] if values else []
 
     @staticmethod
     def get_new_values(service, attr):
@@ -178,10 +228,25 @@ class Service(ManagedService):
 
     options_label_name = 'fabricio.service.options'
 
+    # labels with hashes of particular options (option groups) are named
+    # by adding option name to this prefix
+    options_group_label_prefix = 'fabricio.service.options.'
+
     command = Attribute()
     args = Attribute()
     mode = Attribute()
 
+    # target duration (in seconds) of the rolling update and/or max number
+    # (or percentage, e.g. '25%') of replicas updated at once, if any of
+    # them is provided then `update-parallelism`, `update-delay` and
+    # `update-failure-action` are planned (see `plan_rollout()`) unless
+    # provided explicitly
+    rollout_duration = Attribute()
+    rollout_max_unavailable = Attribute()
+
+    # expected time (in seconds) of replacing single batch of tasks
+    rollout_task_time = Attribute(default=10)
+
     env = EnvOption(safe=True)
     label = LabelOption(path='/Spec/Labels')
     container_label = LabelOption(
@@ -241,7 +306,61 @@ class Service(ManagedService):
 
     @utils.default_property
     def image_id(self):
-        return self.info['Spec']['TaskTemplate']['ContainerSpec']['Image']
+        info = self._project_info(
+            ['Spec.TaskTemplate.ContainerSpec.Image'],
+            ServiceNotFoundError,
+        )
+        return info['Spec']['TaskTemplate']['ContainerSpec']['Image']
+
+    @property
+    def _rollout_settings(self):
+        # settings of the rollout plan (None if rollout isn't planned)
+        if (
+            self.rollout_duration is None
+            and self.rollout_max_unavailable is None
+        ):
+            return None
+        return dict(
+            duration=self.rollout_duration,
+            max_unavailable=self.rollout_max_unavailable,
+            task_time=float(self.rollout_task_time),
+        )
+
+    def plan_rollout(self):
+        """
+        returns `rollout.Plan` of the next update (or None if neither
+        `rollout_duration` nor `rollout_max_unavailable` is provided)
+        """
+        settings = self._rollout_settings
+        if settings is None:
+            return None
+        return rollout.plan(replicas=self._get_replicas(), **settings)
+
+    def _get_replicas(self):
+        if self.replicas is not None:
+            return int(self.replicas)
+        info = self._project_info(['Spec.Mode'], ServiceNotFoundError)
+        mode = info['Spec']['Mode'] or {}
+        if 'Replicated' in mode:
+            return mode['Replicated'].get('Replicas') or 0
+        # global service has task on each node (which number may change
+        # between deploys, therefore it is not cached)
+        nodes = fabricio.run('docker node ls --quiet')
+        return len(nodes.splitlines())
+
+    def _get_rollout_options(self):
+        plan = self.plan_rollout()
+        if plan is None:
+            return {}
+        fabricio.log('{service} rollout plan: {plan}'.format(
+            service=self,
+            plan=plan,
+        ))
+        return collections.OrderedDict(
+            (option, value)
+            for option, value in plan.options.items()
+            if option not in self._other_options  # provided explicitly
+        )
 
     def get_backup_version(self):
         current_info = self.info
@@ -257,46 +376,69 @@ class Service(ManagedService):
         options = {}
         for attr, option in self._options.items():
             name = option.name or attr
+            # each option belongs to the group named by the option
             if isinstance(option, RemovableOption):
-                options[name + '-rm'] = functools.partial(
+                options[name + '-rm'] = name, functools.partial(
                     option.get_values_to_remove,
                     attr=attr,
                 )
-                options[name + '-add'] = functools.partial(
+                options[name + '-add'] = name, functools.partial(
                     option.get_values_to_add,
                     attr=attr,
                 )
             else:
-                options[name] = getattr(self, attr)
+                options[name] = name, getattr(self, attr)
         return options
 
     @property
     def update_options(self):
+        return self._get_update_options()
+
+    def _get_update_options(self, groups=None):
+        """
+        returns options of `docker service update`, only options of the
+        groups are returned if provided
+        """
         options = itertools.chain(
+            self._update_options.items(),
             (
-                (option, value)
-                for option, value in self._update_options.items()
+                (option, (option, value))
+                for option, value in self._other_options.items()
             ),
-            self._other_options.items(),
+        )
+        selected_options = (
+            (option, value)
+            for option, (group, value) in options
+            if groups is None or group in groups
         )
         evaluated_options = (
             (option, value(self) if callable(value) else value)
-            for option, value in options
+            for option, value in selected_options
         )
-        return frozendict(
-            (
-                (option, value)
-                for option, value in evaluated_options
-                if value is not None
-            ),
-            args=self.cmd,
+        options = dict(
+            (option, value)
+            for option, value in evaluated_options
+            if value is not None
+        )
+        if groups is None or 'args' in groups:
+            options['args'] = self.cmd
+        return frozendict(options)
+
+    @staticmethod
+    def _invalidate_cache():
+        operations.run.cache.invalidate(
+            host=fab.env.host,
+            prefix='docker service',
         )
+        inspection.invalidate()
 
     def _update_service(self, options):
-        fabricio.run('docker service update {options} {service}'.format(
-            options=options,
-            service=self,
-        ))
+        with retry.attached('update'):
+            fabricio.run('docker service update {options} {service}'.format(
+                options=options,
+                service=self,
+            ))
+        self._invalidate_cache()
 
     def _create_service(self, image):
         command = 'docker service create {options} {image} {cmd}'
@@ -305,62 +447,133 @@ class Service(ManagedService):
             image=image,
             cmd=self.cmd,
         ))
+        self._invalidate_cache()
 
     @fabricio.once_per_task
     def _update(self, image, force=False):
         image = image.digest
         try:
-            service_info = self.info
+            # full info is requested later only if update is necessary
+            service_info = self._project_info(
+                ['Spec.Labels'],
+                ServiceNotFoundError,
+            )
         except ServiceNotFoundError:
             service_info = {}
 
-        with utils.patch(self, 'info', service_info, force_delete=True):
-            labels = service_info.get('Spec', {}).get('Labels', {})
-            current_options = labels.pop(self.options_label_name, None)
-            new_options = self._encode_options(dict(
-                self.options,
-                image=image,
-                args=self.cmd,
-            ))
-
-            if force or current_options != new_options:
-                label_with_new_options = {
-                    self.options_label_name: new_options,
-                }
-                self._update_labels(label_with_new_options)
-
-                if service_info:
-                    options = utils.Options(self.update_options, image=image)
-                    self._update_service(options)
-                else:
-                    self._create_service(image)
+        labels = service_info.get('Spec', {}).get('Labels') or {}
+        current_options = labels.get(self.options_label_name)
+        options = dict(self.options, image=image, args=self.cmd)
+        rollout_settings = self._rollout_settings
+        if rollout_settings is not None:
+            # service is updated with new rollout options if plan is changed
+            options['rollout'] = rollout_settings
+        new_options = self._encode_options(options)
+
+        if force or current_options != new_options:
+            groups_hashes = dict(
+                (group, self._encode_options(value))
+                for group, value in options.items()
+            )
+            changed_groups = None  # all groups
+            if not force:
+                changed_groups = self._get_changed_groups(
+                    labels,
+                    groups_hashes,
+                )
+            labels_with_new_options = collections.OrderedDict([
+                (self.options_label_name, new_options),
+            ])
+            for group, group_hash in sorted(groups_hashes.items()):
+                label = self.options_group_label_prefix + group
+                labels_with_new_options[label] = group_hash
+            self._update_labels(labels_with_new_options)
+
+            if service_info:
+                update_image = (
+                    changed_groups is None
+                    or 'image' in changed_groups
+                )
+                options = utils.Options(
+                    self._get_update_options(groups=changed_groups),
+                    image=image if update_image else None,
+                )
+                options.update(self._get_rollout_options())
+                self._update_service(options)
+            else:
+                self._create_service(image)
 
-                return True
+            return True
         return False
 
-    def update(self, tag=None, registry=None, account=None, force=False):
+    def update(
+        self,
+        tag=None,
+        registry=None,
+        account=None,
+        force=False,
+        wait=False,
+    ):
+        """
+        `wait=True` makes it wait until all replicas run the new version
+        """
         if not self.is_manager():
             return False
         result = self._update(self.image[registry:tag:account], force=force)
+        if result and wait:
+            self.wait_rollout()
         return result is None or result
 
+    @fabricio.once_per_task
+    def _wait_rollout(self, timeout):
+        rollout.wait(
+            [self.name],
+            timeout=timeout,
+            interval=self.rollout_interval,
+        )
+
     @fabricio.once_per_task
     def _revert(self):
         command = 'docker service rollback {service}'.format(service=self)
         fabricio.run(command)
+        self._invalidate_cache()
 
     def revert(self):
         if self.is_manager():
             self._revert()
 
+    @property
+    def inspect_command(self):
+        return 'docker service inspect {service}'.format(service=self)
+
     @utils.default_property
     def info(self):
-        command = 'docker service inspect {service}'
-        info = fabricio.run(
-            command.format(service=self),
+        return inspection.inspect(
+            self.inspect_command,
             abort_exception=ServiceNotFoundError,
         )
-        return json.loads(info)[0]
+
+    def _get_changed_groups(self, labels, groups_hashes):
+        """
+        returns names of option groups which hashes differ from ones kept
+        in the service labels (or None if service has no such labels),
+        labels are always changed because they keep these hashes
+        """
+        prefix = self.options_group_label_prefix
+        current_hashes = dict(
+            (label[len(prefix):], value)
+            for label, value in labels.items()
+            if label.startswith(prefix)
+        )
+        if not current_hashes:
+            return None
+        changed_groups = set(
+            group
+            for group in set(current_hashes).union(groups_hashes)
+            if current_hashes.get(group) != groups_hashes.get(group)
+        )
+        changed_groups.add('label')
+        return changed_groups
 
     @staticmethod
     def _encode_options(options):
@@ -395,3 +608,4 @@ class Service(ManagedService):
             options=utils.Options(options),
             name=self.name,
         ))
+        self._invalidate_cache()
@@ -14,8 +14,9 @@ from six.moves import map, shlex_quote, filter, zip_longest
 
 import fabricio
 
-from fabricio import utils
+from fabricio import operations, retry, utils
 
+from . import inspection, rollout
 from .base import ManagedService, Option, Attribute, ServiceError, \
     ManagerNotFoundError
 from .image import Image, ImageNotFoundError
@@ -43,6 +44,9 @@ class Stack(ManagedService):
 
     digests_label = 'fabricio.digests'
 
+    # fields of sentinel images which are used by Fabricio
+    sentinel_fields = ('Parent', 'Config.Labels')
+
     get_update_command = 'docker stack deploy {options} {name}'.format
 
     def __init__(self, *args, **kwargs):
@@ -76,7 +80,7 @@ class Stack(ManagedService):
                 try:
                     configuration = configuration or self.get_configuration()
                     self._current_configuration = configuration
-                    fab.put(six.BytesIO(configuration), config_file)
+                    fabricio.put(six.BytesIO(configuration), config_file)
                     yield configuration
                 finally:
                     fabricio.remove_file(config_file, ignore_errors=True)
@@ -93,12 +97,23 @@ class Stack(ManagedService):
             'use upload_configuration_file context manager instead',
             RuntimeWarning, stacklevel=2,
         )
-        fab.put(six.BytesIO(configuration), os.path.basename(self.config))
+        fabricio.put(six.BytesIO(configuration), os.path.basename(self.config))
 
     def get_configuration(self):
         return open(self.config, 'rb').read()
 
-    def update(self, tag=None, registry=None, account=None, force=False):
+    def update(
+        self,
+        tag=None,
+        registry=None,
+        account=None,
+        force=False,
+        wait=False,
+    ):
+        """
+        `wait=True` makes it wait until all replicas of the stack services
+        run the new version
+        """
         if not self.is_manager():
             return None
 
@@ -111,6 +126,9 @@ class Stack(ManagedService):
                     image=self.image[registry:tag:account],
                 )
 
+        if updated and wait:
+            self.wait_rollout()
+
         return updated
 
     @fabricio.once_per_task(block=True)
@@ -125,9 +143,25 @@ class Stack(ManagedService):
         options = utils.Options(self.options)
         command = self.get_update_command(options=options, name=self.name)
         fabricio.run(command)
+        self._invalidate_cache()
 
         return True
 
+    @staticmethod
+    def _invalidate_cache():
+        for prefix in ('docker stack', 'docker service'):
+            operations.run.cache.invalidate(host=fab.env.host, prefix=prefix)
+        inspection.invalidate()
+
+    @fabricio.once_per_task
+    def _wait_rollout(self, timeout):
+        # all services of the stack are watched by single poll per interval
+        rollout.wait(
+            sorted(self.__get_images()),
+            timeout=timeout,
+            interval=self.rollout_interval,
+        )
+
     def revert(self):
         if not self.is_manager():
             return
@@ -150,11 +184,12 @@ class Stack(ManagedService):
 
     def _revert_images(self, digests):
         images = self.__get_images()
-        for service, image in images.items():
-            digest = digests[image]
-            command = 'docker service update --image {digest} {service}'
-            command = command.format(digest=digest, service=service)
-            fabricio.run(command)
+        with fabricio.batch():
+            for service, image in images.items():
+                digest = digests[image]
+                command = 'docker service update --image {digest} {service}'
+                command = command.format(digest=digest, service=service)
+                fabricio.run(command)
 
     @property
     def current_settings(self):
@@ -166,7 +201,8 @@ class Stack(ManagedService):
 
     def _get_settings(self, image):
         try:
-            labels = image.info.get('Config', {}).get('Labels', {})
+            info = self._get_sentinel_info(image)
+            labels = info.get('Config', {}).get('Labels') or {}
             configuration = labels.get(self.configuration_label)
             configuration = configuration and b64decode(configuration)
             digests = labels.get(self.digests_label)
@@ -175,6 +211,13 @@ class Stack(ManagedService):
         except ImageNotFoundError:
             return None, None
 
+    def _get_sentinel_info(self, image):
+        return inspection.project(
+            image.inspect_command,
+            fields=self.sentinel_fields,
+            abort_exception=ImageNotFoundError,
+        )
+
     def rotate_sentinel_images(self, rollback=False):
         backup_tag = self.backup_settings_tag
         current_tag = self.current_settings_tag
@@ -183,7 +226,9 @@ class Stack(ManagedService):
 
         backup_images = [backup_tag]
         try:
-            backup_images.append(Image(backup_tag).info['Parent'])
+            backup_images.append(
+                self._get_sentinel_info(Image(backup_tag))['Parent'],
+            )
         except ImageNotFoundError:
             pass
 
@@ -254,12 +299,13 @@ class Stack(ManagedService):
             return {}
 
         for image in images:
-            Image(image).pull(use_cache=True, ignore_errors=True)
+            Image(image).pull(ignore_errors=True)
 
         command = (
             'docker inspect --type image --format "{{index .RepoDigests 0}}" %s'
         ) % ' '.join(images)
-        digests = fabricio.run(command, ignore_errors=True, use_cache=True)
+        with retry.attached('inspect'):
+            digests = fabricio.run(command, ignore_errors=True)
 
         return dict(zip_longest(images, filter(None, digests.splitlines())))
 
@@ -298,14 +344,18 @@ class Stack(ManagedService):
             options=options,
             name=self.name,
         ))
+        self._invalidate_cache()
 
     def _remove_images(self):
         images = [self.current_settings_tag, self.backup_settings_tag]
-        try:
-            images.append(Image(self.current_settings_tag).info['Parent'])
-            images.append(Image(self.backup_settings_tag).info['Parent'])
-        except ImageNotFoundError:
-            pass
+        sentinel_images = list(map(Image, images))
+        inspection.inspect_all(sentinel_images, fields=self.sentinel_fields)
+        for sentinel_image in sentinel_images:
+            try:
+                sentinel_info = self._get_sentinel_info(sentinel_image)
+            except ImageNotFoundError:
+                continue
+            images.append(sentinel_info['Parent'])
         images.extend(self.images)
         fabricio.run(
             'docker rmi {images}'.format(images=' '.join(images)),
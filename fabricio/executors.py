@@ -0,0 +1,132 @@
+import sys
+
+from multiprocessing.pool import ThreadPool
+
+import six
+
+from fabric import api as fab, colors
+from fabric.network import to_dict
+from fabric.task_utils import parse_kwargs
+from fabric.tasks import WrappedCallableTask, _is_task
+from fabric.utils import error
+
+import fabricio
+
+from fabricio import logger, utils
+
+# default number of threads of `ThreadExecutor`, each of them serves
+# single host at once
+max_pool_size = 32
+
+
+class HostsTask(object):
+    """
+    task to be executed on each of its hosts, resolves hosts the same
+    way as `fab.execute` does (decorators, `hosts`/`roles` kwargs, etc.)
+    """
+
+    def __init__(self, task, args=(), kwargs=None):
+        if not _is_task(task):
+            task = WrappedCallableTask(task)
+        self.task = task
+        self.name = getattr(task, 'name', None) or task.__name__
+        self.args = args
+        self.kwargs, hosts, roles, exclude_hosts = parse_kwargs(kwargs or {})
+        self.hosts, self.effective_roles = task.get_hosts_and_effective_roles(
+            hosts,
+            roles,
+            exclude_hosts,
+            fab.env,
+        )
+
+    def env(self, host_string):
+        env = to_dict(host_string)
+        env.update(
+            command=self.name,
+            all_hosts=self.hosts,
+            effective_roles=self.effective_roles,
+        )
+        return env
+
+    def run(self):
+        return self.task.run(*self.args, **self.kwargs)
+
+    def run_on_host(self, host_string):
+        """
+        runs task with thread's own `fab.env` for the host,
+        returns exception instead of raising it
+        """
+        with utils.isolated_env(**self.env(host_string)):
+            with logger.grouped(host_string):
+                try:
+                    return self.run()
+                except BaseException as exception:  # including SystemExit
+                    return exception
+
+    def check_results(self, results):
+        for host in results:
+            logger.flush(host)  # output of hosts which is still buffered
+        failed_hosts = [
+            host for host, result in results.items()
+            if isinstance(result, BaseException)
+        ]
+        for host in failed_hosts:
+            with logger.grouped(host):
+                fabricio.log(
+                    'ERROR: {error}'.format(error=results[host] or 'aborted'),
+                    output=sys.stderr,
+                    color=colors.red,
+                    host_string=host,
+                )
+        if failed_hosts:
+            error("One or more hosts failed while executing task '{task}'"
+                  "".format(task=self.name))
+
+
+class ThreadExecutor(object):
+    """
+    replacement of `fab.execute` (see `executor` option of `DockerTasks`)
+    running task on all hosts by the pool of threads (at most `pool_size`
+    hosts simultaneously, `env.pool_size` or `max_pool_size` by default)
+    of the current process instead of forking process per host
+    """
+
+    def __init__(self, pool_size=None):
+        self.pool_size = pool_size
+
+    def __call__(self, task, *args, **kwargs):
+        task = HostsTask(task, args=args, kwargs=kwargs)
+        if not task.hosts:
+            return {'<local-only>': task.run()}
+        pool = ThreadPool(
+            self.pool_size
+            or fab.env.pool_size
+            or min(len(task.hosts), max_pool_size),
+        )
+        try:
+            results = pool.map(task.run_on_host, task.hosts)
+        finally:
+            pool.close()
+            pool.join()
+        results = dict(zip(task.hosts, results))
+        task.check_results(results)
+        return results
+
+
+def get_executor(executor=None):
+    """
+    returns callable to run tasks on hosts: provided one, or chosen by name
+    given explicitly or by `env.executor` ('fork' (default), 'threads'
+    or 'asyncio'), e.g. `fab --set executor=threads ...`
+    """
+    executor = executor or fab.env.get('executor') or 'fork'
+    if not isinstance(executor, six.string_types):
+        return executor
+    if executor == 'fork':
+        return fab.execute
+    if executor == 'threads':
+        return ThreadExecutor()
+    if executor == 'asyncio':
+        from fabricio import aio
+        return aio.Executor()
+    raise ValueError('unknown executor: {0}'.format(executor))
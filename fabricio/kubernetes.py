@@ -1,4 +1,5 @@
 import os
+import time
 
 from six.moves import filter, reduce, map
 
@@ -6,11 +7,16 @@ import fabricio
 
 from fabricio import docker, utils
 
+# kinds of objects which rollout is watched by `kubectl rollout status`
+rollout_kinds = ('deployment', 'daemonset', 'statefulset')
+
 
 class Configuration(docker.Stack):
 
     get_update_command = 'kubectl apply {options}'.format
 
+    nodes_command = None
+
     @property
     def current_settings_tag(self):
         return 'fabricio-current-kubernetes:{0}'.format(self.name)
@@ -29,16 +35,39 @@ class Configuration(docker.Stack):
             ignore_errors=True,
         ).succeeded
 
+    @fabricio.once_per_task
+    def _wait_rollout(self, timeout):
+        with self.upload_configuration_file():
+            spec = self.__get_images_spec()
+        deadline = None if timeout is None else time.time() + timeout
+        for kind in sorted(spec):
+            if kind.split('/')[0].lower() not in rollout_kinds:
+                continue
+            options = utils.Options()
+            if deadline is not None:
+                # all objects share the same timeout
+                options['timeout'] = '{0}s'.format(
+                    max(1, int(deadline - time.time())),
+                )
+            fabricio.run(
+                'kubectl rollout status {options} {kind}'.format(
+                    options=options,
+                    kind=kind.lower(),
+                ),
+                abort_exception=docker.RolloutError,
+            )
+
     def _revert_images(self, digests):
         spec = self.__get_images_spec()
-        for kind, images in spec.items():
-            image_updates = ' '.join(
-                '{0}={1}'.format(name, digests[image])
-                for name, image in images.items()
-            )
-            command = 'kubectl set image {kind} {images}'
-            command = command.format(kind=kind, images=image_updates)
-            fabricio.run(command)
+        with fabricio.batch():
+            for kind, images in spec.items():
+                image_updates = ' '.join(
+                    '{0}={1}'.format(name, digests[image])
+                    for name, image in images.items()
+                )
+                command = 'kubectl set image {kind} {images}'
+                command = command.format(kind=kind, images=image_updates)
+                fabricio.run(command)
 
     @property
     @fabricio.once_per_task(block=True)
@@ -0,0 +1,121 @@
+"""
+writer of Fabricio's output (`fabricio.log`, output of commands executed
+by `fabricio.run` and `fabricio.local`) used by all workers of the process
+
+Lines are written as a whole under the lock, so lines of different hosts
+never mix up. With `output_grouping` setting enabled (e.g.
+`fab --set output_grouping=yes ...`) lines are buffered per host and
+printed together when the host's task ends. Only output passed through
+this module is grouped, lines Fabric prints by itself (e.g.
+"[host] run: command") and output of commands called by `fab.run`,
+`fab.local`, etc. directly still go to the terminal immediately.
+"""
+import contextlib
+import multiprocessing.util
+import os
+import sys
+import threading
+
+from fabric import api as fab
+
+from fabricio import utils
+
+_lock = threading.RLock()
+
+_buffers = {}  # host_string -> [(output, data), ...]
+
+_pid = None  # process which buffers belong to
+
+
+def is_grouping():
+    return utils.strtobool(fab.env.get('output_grouping', False))
+
+
+def write(data, output=None, host_string=None):
+    """
+    writes data (one or more complete lines) to the output,
+    data of the host is buffered if output grouping is enabled
+    """
+    output = output or sys.stdout
+    if isinstance(output, Writer):
+        output = output.output
+    host_string = host_string or fab.env.host_string
+    if host_string and is_grouping():
+        with _lock:
+            _get_buffers().setdefault(host_string, []).append((output, data))
+        return
+    with _lock:
+        output.write(data)
+        output.flush()
+
+
+def flush(host_string=None):
+    """
+    writes buffered lines of the host (of all hosts if not provided)
+    """
+    with _lock:
+        buffers = _get_buffers()
+        if host_string is None:
+            hosts = list(buffers)
+        else:
+            hosts = [host_string]
+        for host in hosts:
+            outputs = set()
+            for output, data in buffers.pop(host, ()):
+                output.write(data)
+                outputs.add(output)
+            for output in outputs:
+                output.flush()
+
+
+class Writer(object):
+    """
+    file-like object passing everything written to it to `write()`, e.g.
+    to Fabric's operations as `stdout`/`stderr` to group their output
+    """
+
+    def __init__(self, output, host_string):
+        self.output = output
+        self.host_string = host_string
+
+    def write(self, data):
+        write(data, output=self.output, host_string=self.host_string)
+
+    def flush(self):
+        pass  # output is flushed by `write()` or `flush()`
+
+    def __getattr__(self, attr):
+        return getattr(self.output, attr)
+
+
+def get_writer(output, host_string=None):
+    """
+    returns `Writer` of the host if output grouping is enabled,
+    output itself otherwise
+    """
+    host_string = host_string or fab.env.host_string
+    if host_string and is_grouping():
+        return Writer(output, host_string)
+    return output
+
+
+@contextlib.contextmanager
+def grouped(host_string):
+    """
+    prints output of the host made inside the context
+    """
+    try:
+        yield
+    finally:
+        flush(host_string)
+
+
+def _get_buffers():
+    global _pid
+    if _pid != os.getpid():
+        # new process (e.g. forked by Fabric's parallel mode) neither
+        # prints buffers of its parent nor runs its `atexit` handlers
+        _buffers.clear()
+        multiprocessing.util.Finalize(None, flush, exitpriority=100)
+        _pid = os.getpid()
+    return _buffers
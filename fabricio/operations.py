@@ -1,14 +1,35 @@
 from __future__ import print_function
 
-import hashlib
+import contextlib
+import functools
+import itertools
+import re
 import sys
+import threading
+import time
 
 import colorama
+import six
 
 from fabric import colors, api as fab
 from fabric.exceptions import CommandTimeout, NetworkError
+from fabric.operations import (
+    _AttributeString,
+    _prefix_commands,
+    _prefix_env_vars,
+)
+from fabric.utils import _encode, error
 
-from fabricio import utils
+from fabricio import (
+    logger,
+    retry,
+    singleflight,
+    ssh,
+    trace,
+    transcript,
+    utils,
+)
+from fabricio.cache import Cache, make_key
 
 colorama.init()
 
@@ -19,6 +40,8 @@ class Error(RuntimeError):
 
 host_errors = (Error, NetworkError, CommandTimeout)
 
+_local = threading.local()
+
 
 def _command(
     fabric_method,
@@ -28,6 +51,8 @@ def _command(
     hide=('running', 'aborts'),
     show=(),
     abort_exception=Error,
+    cache=None,
+    attempt=None,
     **kwargs
 ):
     if quiet:
@@ -42,7 +67,95 @@ def _command(
         abort_exception=abort_exception,
         warn_only=ignore_errors,
     ):
-        return fabric_method(command, **kwargs)
+        method = fabric_method.__name__
+        with trace.command(
+            method,
+            command,
+            cache=cache,
+            attempt=attempt,
+        ) as record:
+            with transcript.recording(method, command) as entry:
+                result = fabric_method(command, **kwargs)
+                record['result'] = entry['result'] = result
+                return result
+
+
+def _execute(fabric_method, command, policy=None, **kwargs):
+    """
+    executes command by `_command` retrying it according to the policy
+    """
+    if policy is None:
+        return _command(fabric_method, command, **kwargs)
+    ignore_errors = kwargs.pop('ignore_errors', False)
+    abort_exception = kwargs.pop('abort_exception', Error)
+    for attempt in itertools.count(1):
+        try:
+            result = _command(
+                fabric_method,
+                command,
+                ignore_errors=True,
+                abort_exception=abort_exception,
+                attempt=attempt,
+                **kwargs
+            )
+        except host_errors as exception:
+            if not policy.is_retryable(attempt, exception=exception):
+                raise
+            reason = exception
+        else:
+            if not result.failed:
+                return result
+            if not policy.is_retryable(attempt, result=result):
+                break
+            reason = 'exit code {0}'.format(result.return_code)
+        delay = policy.get_delay(attempt)
+        log('{command} failed ({reason}), retrying in {delay:.2f}s'.format(
+            command=command,
+            reason=reason,
+            delay=delay,
+        ))
+        time.sleep(delay)
+    if not ignore_errors:
+        raise abort_exception(
+            '{method}() received nonzero return code {status} while executing '
+            "'{command}' ({attempts} attempts): {stderr}".format(
+                method=fabric_method.__name__,
+                status=result.return_code,
+                command=command,
+                attempts=attempt,
+                stderr=result.stderr or result,
+            )
+        )
+    return result
+
+
+def _single_flight(method, command, cache_key, execute):
+    """
+    executes command unless the same one is being executed by another
+    worker at the moment, in which case result of the latter is used
+    """
+    result, executed = singleflight.call(cache_key, execute)
+    if not executed:
+        log('{method}: {command} (result of another worker)'.format(
+            method=method,
+            command=command,
+        ))
+        with trace.command(method, command, cache='shared') as record:
+            record['result'] = result
+    return result
+
+
+@contextlib.contextmanager
+def _open_stream(stream, host=None):
+    """
+    yields file-like object to write output to: provided one or log file
+    opened by path which may contain '{host}' placeholder
+    """
+    if not isinstance(stream, six.string_types):
+        yield stream
+        return
+    with open(stream.replace('{host}', host or 'localhost'), 'a') as log_file:
+        yield log_file
 
 
 def run(
@@ -52,28 +165,112 @@ def run(
     stderr=sys.stderr,
     use_cache=False,
     cache_salt='',
+    stream=None,
+    buffer_size=None,
     **kwargs
 ):
+    current_batch = getattr(_local, 'batch', None)
+    if current_batch is not None:
+        if (
+            not use_cache
+            and stream is None
+            and buffer_size is None
+            and stdout is sys.stdout
+            and stderr is sys.stderr
+            and retry.current() is None
+            and current_batch.accepts(**kwargs)
+        ):
+            return current_batch.add(command, sudo=sudo, **kwargs)
+        current_batch.execute()
     if use_cache:
-        md5 = hashlib.md5()
-        md5.update(command.encode())
-        md5.update((fab.env.host or '').encode())
-        md5.update(cache_salt.encode())
-        cache_key = md5.digest()
-        if cache_key in run.cache:
-            return run.cache[cache_key]
-    fabric_method = sudo and fab.sudo or fab.run
-    result = _command(
-        fabric_method=fabric_method,
-        command=command,
-        stdout=stdout,
-        stderr=stderr,
-        **kwargs
+        host = fab.env.host
+        cache_key = make_key(command, host=host or '', salt=cache_salt)
+        result = run.cache.get(cache_key, utils.DEFAULT)
+        if result is not utils.DEFAULT:
+            with trace.command('run', command, cache='hit') as record:
+                record['result'] = result
+            return result
+    if stream is not None or buffer_size is not None:
+        # output of the command is streamed, so there is no need
+        # to keep all of it in memory
+        kwargs['quiet'] = False
+        kwargs['capture_buffer_size'] = buffer_size or run.buffer_size
+    runner = (
+        getattr(_local, 'runner', None)
+        or transcript.get_player()
+        or ssh.get_pool()
+        or fab
     )
+    fabric_method = runner.sudo if sudo else runner.run
+    with _open_stream(stream or stdout, host=fab.env.host) as stdout_stream:
+        if stream is None:
+            # output printed to the terminal is grouped per host if needed
+            stdout_stream = logger.get_writer(stdout_stream)
+            stderr = logger.get_writer(stderr)
+        execute = functools.partial(
+            _execute,
+            fabric_method=fabric_method,
+            command=command,
+            policy=retry.current(),
+            stdout=stdout_stream,
+            stderr=stdout_stream if stream is not None else stderr,
+            cache='miss' if use_cache else None,
+            **kwargs
+        )
+        if use_cache:
+            result = _single_flight('run', command, cache_key, execute)
+        else:
+            result = execute()
     if use_cache:
-        run.cache[cache_key] = result
+        run.cache.set(cache_key, result, host=host, command=command)
+    return result
+run.cache = Cache(max_size=1024)
+run.buffer_size = 64 * 1024  # characters of output kept when it is streamed
+
+
+def _stream_local(
+    command,
+    capture=False,
+    shell=None,
+    stdout=None,
+    capture_buffer_size=None,
+):
+    """
+    `fab.local` which prints output while it is being received
+    and keeps only its last `capture_buffer_size` characters
+    """
+    wrapped_command = _prefix_env_vars(
+        _prefix_commands(command, 'local'),
+        local=True,
+    )
+    if fab.output.running:
+        logger.write('[localhost] local: ' + command + '\n')
+    status, output = utils.stream_output(
+        wrapped_command,
+        capture_buffer_size,
+        stream=(stdout or sys.stdout) if fab.output.stdout else None,
+        shell=True,
+        executable=shell,
+    )
+    result = _AttributeString(output.strip() if capture else '')
+    result.stderr = _AttributeString()
+    result.command = command
+    result.real_command = wrapped_command
+    result.return_code = status
+    result.failed = status not in fab.env.ok_ret_codes
+    result.succeeded = not result.failed
+    if result.failed:
+        error(
+            message="local() encountered an error (return code {status}) "
+                    "while executing '{command}'".format(
+                        status=status,
+                        command=command,
+                    ),
+            stdout=result,
+            stderr=result.stderr,
+        )
     return result
-run.cache = {}
+_stream_local.__name__ = 'local'
 
 
 def local(
@@ -84,36 +281,361 @@ def local(
     capture=False,
     use_cache=False,
     cache_salt='',
+    stream=None,
+    buffer_size=None,
     **kwargs
 ):
     if use_cache:
-        md5 = hashlib.md5()
-        md5.update(command.encode())
-        md5.update(cache_salt.encode())
-        cache_key = md5.digest()
-        if cache_key in local.cache:
-            return local.cache[cache_key]
-    result = _command(
-        fabric_method=fab.local,
-        command=command,
-        capture=capture,
-        quiet=quiet,
-        **kwargs
+        cache_key = make_key(command, salt=cache_salt)
+        result = local.cache.get(cache_key, utils.DEFAULT)
+        if result is not utils.DEFAULT:
+            with trace.command('local', command, cache='hit') as record:
+                record['result'] = result
+            return result
+    if stream is not None:
+        quiet = False
+    policy = retry.current()
+    streaming = stream is not None or buffer_size is not None or (
+        # not captured output is printed by Fabric without keeping it,
+        # but retry policy needs it to check if error is transient and
+        # grouped output has to be written by `logger`
+        (capture or policy is not None or logger.is_grouping())
+        and not quiet
     )
+    player = transcript.get_player()
+    with _open_stream(stream or stdout) as stdout_stream:
+        if stream is None:
+            stdout_stream = logger.get_writer(stdout_stream)
+        if player is not None:
+            fabric_method = player.local
+            kwargs.update(stdout=stdout, stderr=stderr)
+        elif streaming:
+            fabric_method = _stream_local
+            capture = capture or stream is not None or policy is not None
+            if stream is not None or not capture:
+                buffer_size = buffer_size or local.buffer_size
+            kwargs.update(
+                stdout=stdout_stream,
+                capture_buffer_size=buffer_size,  # whole output if None
+            )
+        else:
+            fabric_method = fab.local
+        execute = functools.partial(
+            _execute,
+            fabric_method=fabric_method,
+            command=command,
+            policy=policy,
+            capture=capture,
+            quiet=quiet,
+            cache='miss' if use_cache else None,
+            **kwargs
+        )
+        if use_cache:
+            result = _single_flight('local', command, cache_key, execute)
+        else:
+            result = execute()
     if use_cache:
-        local.cache[cache_key] = result
-    if capture and not quiet:
+        local.cache.set(cache_key, result, command=command)
+    if capture and not quiet and not streaming:
         if result:
             print(result, file=stdout)
         if result.stderr:
             print(result.stderr, file=stderr)
     return result
-local.cache = {}
+local.cache = Cache(max_size=1024)
+local.buffer_size = 64 * 1024  # characters of output kept when it is streamed
+
+
+class BatchCommand(object):
+    """
+    placeholder returned by `fabricio.run` inside `batch()` context which
+    `result` attribute is filled in after execution of the batch
+
+    Placeholder proxies attributes of the result once it is available,
+    using it before that (e.g. reading output) raises `RuntimeError`.
+    """
+
+    def __init__(self, command, ignore_errors=False, abort_exception=Error):
+        self.command = command
+        self.ignore_errors = ignore_errors
+        self.abort_exception = abort_exception
+        self.result = None
+
+    def _get_result(self):
+        if self.result is None:
+            raise RuntimeError(
+                "result of '{command}' is not available until the batch "
+                "is executed, use `fabricio.unbatched()` to get output "
+                "of the command immediately".format(command=self.command)
+            )
+        return self.result
+
+    def __getattr__(self, item):
+        if item.startswith('__') or item == 'result':
+            raise AttributeError(item)
+        return getattr(self._get_result(), item)
+
+    def __str__(self):
+        return str(self._get_result())
+
+    def __bool__(self):
+        return bool(self._get_result())
+
+    __nonzero__ = __bool__
+
+
+class Batch(object):
+    """
+    queue of commands which are executed on the remote host as single script
 
+    Each command gets its own result with output and return code. Failed
+    command stops execution of the rest ones unless it was added with
+    `ignore_errors=True`.
+    """
 
-def log(message, color=colors.yellow, output=sys.stdout):
-    with utils.patch(sys, 'stdout', output):
-        fab.puts(color(message))
+    marker = '__fabricio_batch__'
+
+    # stderr gets its own marker because it is merged into stdout
+    # when command is executed with pty or `combine_stderr` enabled
+    stderr_marker = '__fabricio_batch_stderr__'
+
+    marker_regex = re.compile(
+        r'^{marker} (\d+) (-?\d+)\r?$'.format(marker=marker),
+        re.MULTILINE,
+    )
+
+    stderr_marker_regex = re.compile(
+        r'^{marker} (\d+) (-?\d+)\r?$'.format(marker=stderr_marker),
+        re.MULTILINE,
+    )
+
+    def __init__(self):
+        self.commands = []
+        self.sudo = False
+
+    @staticmethod
+    def accepts(quiet=True, **kwargs):
+        return quiet and set(kwargs) <= {'ignore_errors', 'abort_exception'}
+
+    def add(
+        self,
+        command,
+        sudo=False,
+        ignore_errors=False,
+        abort_exception=Error,
+        quiet=True,
+    ):
+        if self.commands and sudo != self.sudo:
+            self.execute()
+        self.sudo = sudo
+        batch_command = BatchCommand(
+            command=command,
+            ignore_errors=ignore_errors,
+            abort_exception=abort_exception,
+        )
+        self.commands.append(batch_command)
+        return batch_command
+
+    def make_script(self, commands):
+        script = []
+        for number, command in enumerate(commands):
+            script.append('(\n{command}\n)'.format(command=command.command))
+            script.append(
+                "__fabricio_status=$?; "
+                "printf '\\n{marker} {number} %d\\n' $__fabricio_status; "
+                "printf '\\n{stderr_marker} {number} %d\\n' "
+                "$__fabricio_status >&2"
+                "".format(
+                    marker=self.marker,
+                    stderr_marker=self.stderr_marker,
+                    number=number,
+                )
+            )
+            if not command.ignore_errors:
+                script.append(
+                    '[ $__fabricio_status -eq 0 ] || exit $__fabricio_status'
+                )
+        return '\n'.join(script)
+
+    def split_output(self, output, marker_regex=None):
+        """
+        returns output and status of each command of the script by its number
+        """
+        if marker_regex is None:
+            marker_regex = self.marker_regex
+            # stderr markers are found in stdout if stderr was merged into it
+            output = self.stderr_marker_regex.sub('', output or '')
+        chunks = {}
+        position = 0
+        for match in marker_regex.finditer(output or ''):
+            number, status = map(int, match.groups())
+            chunks.setdefault(
+                number,
+                (output[position:match.start()].strip(), status),
+            )
+            position = match.end()
+        return chunks
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        if len(commands) == 1:
+            command, = commands
+            with utils.patch(_local, 'batch', None):
+                command.result = run(
+                    command.command,
+                    sudo=self.sudo,
+                    ignore_errors=command.ignore_errors,
+                    abort_exception=command.abort_exception,
+                )
+        elif commands:
+            with utils.patch(_local, 'batch', None):
+                result = run(
+                    self.make_script(commands),
+                    sudo=self.sudo,
+                    ignore_errors=True,
+                )
+            self.set_results(commands, result)
+        return [command.result for command in commands]
+
+    def set_results(self, commands, result):
+        """
+        fills in results of the commands from the result of their script
+        """
+        stdout_chunks = self.split_output(result)
+        stderr_chunks = self.split_output(
+            getattr(result, 'stderr', ''),
+            marker_regex=self.stderr_marker_regex,
+        )
+        for number, command in enumerate(commands):
+            if number not in stdout_chunks:
+                # script was interrupted by unexpected error
+                raise command.abort_exception(
+                    "batch interrupted while executing '{command}': "
+                    "{output}".format(command=command.command, output=result)
+                )
+            output, status = stdout_chunks[number]
+            command.result = _AttributeString(output)
+            command.result.command = command.command
+            command.result.return_code = status
+            command.result.failed = status != 0
+            command.result.succeeded = status == 0
+            command.result.stderr = _AttributeString(
+                stderr_chunks.get(number, ('', status))[0]
+            )
+            if command.result.failed and not command.ignore_errors:
+                raise command.abort_exception(
+                    "run() received nonzero return code {status} while "
+                    "executing '{command}'!".format(
+                        status=status,
+                        command=command.command,
+                    )
+                )
+        return [command.result for command in commands]
+
+
+@contextlib.contextmanager
+def batch():
+    """
+    `fabricio.run` calls made within this context are sent to the remote host
+    as single script on exit (nested contexts share the same batch)
+
+    Such calls return placeholder which `result` attribute is filled in after
+    execution, so use it only for commands which output is not used
+    immediately. Calls with `use_cache`, custom output streams or options
+    other than `ignore_errors`, `abort_exception` and `quiet=True` are
+    executed immediately (after all previously queued commands).
+    """
+    current_batch = getattr(_local, 'batch', None)
+    if current_batch is not None:
+        yield current_batch
+        return
+    _local.batch = current_batch = Batch()
+    try:
+        yield current_batch
+    finally:
+        _local.batch = None
+    current_batch.execute()
+
+
+@contextlib.contextmanager
+def unbatched():
+    """
+    `fabricio.run` calls made within this context are executed immediately
+    even inside `batch()` context (after all previously queued commands),
+    e.g. when their output is needed right away
+    """
+    current_batch = getattr(_local, 'batch', None)
+    if current_batch is None:
+        yield
+        return
+    current_batch.execute()
+    with utils.patch(_local, 'batch', None):
+        yield
+
+
+def log(message, color=colors.yellow, output=sys.stdout, host_string=None):
+    # same as fab.puts but without patching sys.stdout which isn't thread-safe
+    if not fab.output.user:
+        return
+    host_string = host_string or fab.env.host_string
+    prefix = ''
+    if host_string and fab.env.output_prefix:
+        prefix = '[{host}] '.format(host=host_string)
+    logger.write(
+        prefix + _encode(color(message), output) + '\n',
+        output=output,
+        host_string=host_string,
+    )
+
+
+def put(local_path=None, remote_path=None, **kwargs):
+    """
+    same as `fab.put` but is traced and recorded to the transcript
+    """
+    description = '{local} -> {remote}'.format(
+        local=getattr(local_path, 'name', '<file-like object>')
+        if hasattr(local_path, 'read') else local_path,
+        remote=remote_path,
+    )
+    player = transcript.get_player()
+    fabric_put = player.put if player is not None else fab.put
+    with trace.command('put', description) as record:
+        if record:  # tracing is enabled
+            record['bytes_out'] = trace.size(local_path)
+        with transcript.recording('put', remote_path) as entry:
+            result = fabric_put(local_path, remote_path, **kwargs)
+            entry['return_code'] = 0 if result.succeeded else 1
+        if record:
+            record['status'] = 0 if result.succeeded else 1
+        return result
+
+
+def get(remote_path, local_path=None, **kwargs):
+    """
+    same as `fab.get` but is traced and recorded to the transcript
+    """
+    description = '{remote} -> {local}'.format(
+        remote=remote_path,
+        local=getattr(local_path, 'name', '<file-like object>')
+        if hasattr(local_path, 'write') else local_path,
+    )
+    player = transcript.get_player()
+    fabric_get = player.get if player is not None else fab.get
+    with trace.command('get', description) as record:
+        with transcript.recording('get', remote_path) as entry:
+            result = fabric_get(remote_path, local_path, **kwargs)
+            if entry:  # recording is enabled
+                entry['return_code'] = 0 if result.succeeded else 1
+                entry['content'] = transcript.read_content(local_path, result)
+        if record:  # tracing is enabled
+            record['status'] = 0 if result.succeeded else 1
+            if hasattr(local_path, 'getvalue'):
+                record['bytes_in'] = trace.size(local_path)
+            else:
+                record['bytes_in'] = sum(
+                    trace.size(path) or 0 for path in result
+                )
+        return result
 
 
 def move_file(path_from, path_to, sudo=False, force=True, ignore_errors=False):
@@ -146,3 +668,17 @@ def remove_file(
         sudo=sudo,
         ignore_errors=ignore_errors,
     )
+
+
+def exists(path, sudo=False):
+    """
+    same as `fabric.contrib.files.exists` but is executed by `fabricio.run`
+    (therefore is traced, recorded to the transcript and replayed)
+    """
+    with unbatched():
+        result = run(
+            'stat "$(echo {path})"'.format(path=path),
+            sudo=sudo,
+            ignore_errors=True,
+        )
+    return result.succeeded
@@ -0,0 +1,130 @@
+"""
+retry policies of the operations which may fail because of transient
+errors (network failures, registry hiccups, etc.)
+
+Policy is attached to the operation by its name ('pull', 'push', 'inspect'
+or 'update') using `policies` dict:
+
+    from fabricio import retry
+    retry.policies['pull'] = retry.RetryPolicy(attempts=5)
+
+or to all of them at once by `retry_attempts` setting (e.g.
+`fab --set retry_attempts=3 ...`). Operations are not retried by default.
+"""
+import contextlib
+import random
+import re
+import threading
+
+from fabric import api as fab
+from fabric.exceptions import CommandTimeout, NetworkError
+
+# stderr of docker (and ssh) on errors which are worth to retry
+TRANSIENT_ERRORS = (
+    r'TLS handshake timeout',
+    r'i/o timeout',
+    r'connection reset by peer',
+    r'connection refused',
+    r'net/http: request canceled',
+    r'unexpected EOF',
+    r'toomanyrequests',
+    r'received unexpected HTTP status: 5\d\d',
+    r'Connection (timed out|closed)',
+    r'Timed out while waiting for handshake',
+)
+
+
+class RetryPolicy(object):
+    """
+    at most `attempts` attempts with exponential backoff: delay before
+    attempt N is `delay * backoff ** (N - 2)` (but not more than `max_delay`)
+    randomly changed by `jitter` fraction of it
+
+    Failed command is retried only if its exit code is one of `return_codes`
+    or its stderr matches one of `stderr_patterns`, exceptions are retried
+    if they are instances of `exceptions` or their message matches one of
+    `stderr_patterns`.
+    """
+
+    def __init__(
+        self,
+        attempts=3,
+        delay=1.0,
+        backoff=2.0,
+        max_delay=30.0,
+        jitter=0.5,
+        return_codes=(255, ),  # ssh failure
+        stderr_patterns=TRANSIENT_ERRORS,
+        exceptions=(NetworkError, CommandTimeout),
+    ):
+        self.attempts = attempts
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.return_codes = set(return_codes or ())
+        self.stderr_regex = stderr_patterns and re.compile(
+            '|'.join(stderr_patterns),
+            re.IGNORECASE,
+        )
+        self.exceptions = tuple(exceptions or ())
+
+    def matches(self, text):
+        return bool(self.stderr_regex and self.stderr_regex.search(text))
+
+    def is_retryable(self, attempt, result=None, exception=None):
+        if attempt >= self.attempts:
+            return False
+        if exception is not None:
+            return (
+                isinstance(exception, self.exceptions)
+                or self.matches(str(exception))
+            )
+        return (
+            getattr(result, 'return_code', None) in self.return_codes
+            or self.matches(getattr(result, 'stderr', None) or '')
+            # stderr is mixed with stdout when output is streamed
+            or self.matches(result or '')
+        )
+
+    def get_delay(self, attempt):
+        delay = min(self.delay * self.backoff ** (attempt - 1), self.max_delay)
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+policies = dict(
+    pull=None,
+    push=None,
+    inspect=None,
+    update=None,
+)
+
+_local = threading.local()
+
+
+def get_policy(operation):
+    policy = policies.get(operation)
+    if policy is None and fab.env.get('retry_attempts'):
+        policy = RetryPolicy(attempts=int(fab.env.retry_attempts))
+    return policy
+
+
+def current():
+    """
+    returns policy attached to the current thread's operation (if any)
+    """
+    return getattr(_local, 'policy', None)
+
+
+@contextlib.contextmanager
+def attached(operation):
+    """
+    attaches policy of the operation to commands executed by
+    `fabricio.run` and `fabricio.local` inside the context
+    """
+    previous = current()
+    _local.policy = get_policy(operation)
+    try:
+        yield _local.policy
+    finally:
+        _local.policy = previous
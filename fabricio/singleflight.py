@@ -0,0 +1,92 @@
+"""
+single-flight execution of identical commands (same cache key) across
+workers of the deploy (threads and forked processes): the first caller
+executes the command while other callers wait for it and get its result
+instead of executing the same command again
+
+Scope of merging is defined by the key: keys of `fabricio.local` are
+the same for all workers, so identical local commands (e.g. image build
+or push done by every worker of the parallel task) are executed once,
+while keys of `fabricio.run` include the host, so remote commands are
+merged only for workers of the same host (e.g. when one host is listed
+several times or is served by several tasks running at once) and never
+across different hosts.
+
+Workers are coordinated by file locks (`flock`) placed to the temporary
+directory of the Fabric session (see `utils.get_session_dir()`), lock
+and result files are removed along with that directory at exit of the
+main process. Single-flight is disabled on platforms without `fcntl`
+module.
+"""
+import hashlib
+import json
+import os
+
+import six
+
+from fabric.operations import _AttributeString
+
+from fabricio import utils
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+def dump_result(result):
+    return json.dumps(dict(
+        stdout=six.text_type(result),
+        stderr=six.text_type(getattr(result, 'stderr', '')),
+        return_code=getattr(result, 'return_code', None),
+        failed=getattr(result, 'failed', False),
+        command=getattr(result, 'command', None),
+        real_command=getattr(result, 'real_command', None),
+    ))
+
+
+def load_result(data):
+    data = json.loads(data)
+    result = _AttributeString(data['stdout'])
+    result.stderr = _AttributeString(data['stderr'])
+    result.return_code = data['return_code']
+    result.failed = data['failed']
+    result.succeeded = not result.failed
+    result.command = data['command']
+    result.real_command = data['real_command']
+    return result
+
+
+def call(key, execute):
+    """
+    returns result of `execute()` (which must not be called concurrently
+    with the same key) and flag showing if it was called by this worker
+    """
+    if fcntl is None:  # pragma: no cover
+        return execute(), True
+    if isinstance(key, six.text_type):
+        key = key.encode('utf-8')
+    base_path = os.path.join(
+        utils.get_session_dir(),
+        hashlib.sha1(key).hexdigest(),
+    )
+    result_path = base_path + '.result'
+    with open(base_path + '.lock', 'a') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            # the same command is in flight, waiting for its result
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(result_path) as result_file:
+                    return load_result(result_file.read()), False
+            except (IOError, OSError, ValueError):
+                pass  # the command has failed, executing it by ourselves
+        try:
+            os.remove(result_path)  # result of the previous flight
+        except OSError:
+            pass
+        result = execute()
+        with open(result_path, 'w') as result_file:
+            result_file.write(dump_result(result))
+        return result, True
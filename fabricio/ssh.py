@@ -0,0 +1,365 @@
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import six
+
+from fabric import api as fab
+from fabric.exceptions import CommandTimeout, NetworkError
+from fabric.network import normalize
+from fabric.operations import (
+    _AttributeString,
+    _prefix_commands,
+    _prefix_env_vars,
+    _shell_wrap,
+    _sudo_prefix,
+)
+from fabric.state import output
+from fabric.utils import error
+
+import fabricio
+
+from fabricio import logger, utils
+
+
+class ConnectionPool(object):
+    """
+    OpenSSH master connections (see ControlMaster option of ssh_config),
+    one per host, used by `fabricio.run` instead of Fabric's connections
+
+    Master connection is a separate `ssh` process listening on the Unix
+    socket, therefore (unlike Paramiko's transport) it survives forks made
+    by Fabric's parallel mode and subsequent `fab.execute` calls, so
+    SSH handshake is made only once per host during the session.
+
+    Authentication is made by OpenSSH non-interactively (keys, agent,
+    ~/.ssh/config), `sudo` commands are executed by Fabric as usual.
+    """
+
+    def __init__(self, control_dir='~/.ssh', persist=600, executable='ssh'):
+        self.control_dir = control_dir
+        self.persist = persist
+        self.executable = executable
+        self.connect_times = {}
+
+    @property
+    def control_path(self):
+        # %C is a hash of local host, remote host, port and user
+        return os.path.join(self.control_dir, 'fabricio-%C')
+
+    def options(self, host_string):
+        user, host, port = normalize(host_string)
+        options = [
+            self.executable,
+            '-o', 'ControlMaster=auto',
+            '-o', 'ControlPath=' + self.control_path,
+            '-o', 'ControlPersist={0}'.format(self.persist),
+            '-o', 'BatchMode=yes',
+            '-p', six.text_type(port),
+            '-l', user,
+        ]
+        if fab.env.disable_known_hosts:
+            options += [
+                '-o', 'StrictHostKeyChecking=no',
+                '-o', 'UserKnownHostsFile=/dev/null',
+            ]
+        key_filename = fab.env.key_filename
+        if isinstance(key_filename, six.string_types):
+            key_filename = [key_filename]
+        for key in key_filename or ():
+            options += ['-i', key]
+        if fab.env.gateway:
+            options += ['-J', fab.env.gateway]
+        if fab.env.forward_agent:
+            options.append('-A')
+        return options + [host]
+
+    def control(self, host_string, command):
+        """
+        returns ssh arguments to send control command (e.g. 'check')
+        to the master connection
+        """
+        options = self.options(host_string)
+        return options[:-1] + ['-O', command, options[-1]]
+
+    def master(self, host_string):
+        """
+        returns ssh arguments to start master connection in background
+        """
+        control_dir = os.path.expanduser(self.control_dir)
+        if not os.path.isdir(control_dir):
+            os.makedirs(control_dir, 0o700)
+        options = self.options(host_string)
+        # -f puts master to background after authentication
+        return options[:-1] + ['-M', '-N', '-f', options[-1]]
+
+    def _call(self, args):
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.call(args, stdout=devnull, stderr=devnull)
+
+    def _start_master(self, host_string):
+        # stderr is written to the file because background master
+        # may keep it open
+        with tempfile.TemporaryFile() as stderr:
+            with open(os.devnull, 'w') as devnull:
+                status = subprocess.call(
+                    self.master(host_string),
+                    stdout=devnull,
+                    stderr=stderr,
+                )
+            stderr.seek(0)
+            self.check_master(host_string, status, stderr.read())
+
+    @staticmethod
+    def check_master(host_string, status, stderr=b''):
+        """
+        raises `NetworkError` (handled by Fabric according to
+        `env.skip_bad_hosts`) if master connection to the host
+        has not been started
+        """
+        if status == 0:
+            return
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode('utf-8', 'replace')
+        raise NetworkError(
+            'could not connect to {host} (ssh exit code {status}){error}'
+            ''.format(
+                host=host_string,
+                status=status,
+                error=stderr.strip() and ': ' + stderr.strip(),
+            )
+        )
+
+    def connect(self, host_string):
+        """
+        starts master connection to the host unless it is already running,
+        returns time spent to this
+        """
+        if host_string in self.connect_times:
+            return self.connect_times[host_string]
+        started = time.time()
+        if self._call(self.control(host_string, 'check')) != 0:
+            self._start_master(host_string)
+        self.connect_times[host_string] = connect_time = time.time() - started
+        fabricio.log('connection established in {time:.2f}s'.format(
+            time=connect_time,
+        ))
+        return connect_time
+
+    def close(self, host_string):
+        self.connect_times.pop(host_string, None)
+        self._call(self.control(host_string, 'exit'))
+
+    def command(
+        self,
+        host_string,
+        command,
+        sudo=False,
+        shell=True,
+        shell_escape=None,
+    ):
+        """
+        returns ssh arguments to execute the command on the host and
+        the command itself wrapped with current `cd`, `prefix`, etc.
+        """
+        if shell_escape is None:
+            shell_escape = fab.env.get('shell_escape', True)
+        wrapped_command = _shell_wrap(
+            _prefix_env_vars(_prefix_commands(command, 'remote')),
+            shell_escape,
+            shell,
+            _sudo_prefix(None, None) if sudo else None,
+        )
+        return self.options(host_string) + [wrapped_command], wrapped_command
+
+    def execute(self, args, timeout=None):
+        """
+        executes ssh with provided arguments,
+        returns exit code, stdout and stderr
+        """
+        process = subprocess.Popen(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        if timeout and six.PY3:
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise CommandTimeout(timeout=timeout)
+        else:
+            stdout, stderr = process.communicate()
+        return process.returncode, stdout, stderr
+
+    def stream(self, args, buffer_size, stream=None, prefix='', timeout=None):
+        """
+        executes ssh with provided arguments writing its output to the
+        stream while it is being received, returns exit code and last
+        `buffer_size` characters of output
+        """
+        return utils.stream_output(
+            args,
+            buffer_size,
+            stream=stream,
+            prefix=prefix,
+            timeout=timeout,
+        )
+
+    def _run(
+        self,
+        command,
+        sudo=False,
+        shell=True,
+        shell_escape=None,
+        timeout=None,
+        stdout=None,
+        stderr=None,
+        capture_buffer_size=None,
+        **kwargs
+    ):
+        host_string = fab.env.host_string
+        self.connect(host_string)
+        args, wrapped_command = self.command(
+            host_string,
+            command,
+            sudo=sudo,
+            shell=shell,
+            shell_escape=shell_escape,
+        )
+        which = 'sudo' if sudo else 'run'
+        if output.running:
+            print('[{host}] {which}: {command}'.format(
+                host=host_string,
+                which=which,
+                command=command,
+            ))
+        if capture_buffer_size:
+            # output is printed while being received and only its tail
+            # is kept in memory (stderr goes together with stdout here)
+            status, result_stdout = self.stream(
+                args,
+                capture_buffer_size,
+                stream=(stdout or sys.stdout) if output.stdout else None,
+                prefix='[{host}] out: '.format(host=host_string),
+                timeout=timeout or fab.env.command_timeout,
+            )
+            result = make_result(
+                command,
+                wrapped_command,
+                status=status,
+                stdout=result_stdout,
+                stderr='',
+            )
+        else:
+            status, result_stdout, result_stderr = self.execute(
+                args,
+                timeout=timeout or fab.env.command_timeout,
+            )
+            result = make_result(
+                command,
+                wrapped_command,
+                status=status,
+                stdout=result_stdout,
+                stderr=result_stderr,
+            )
+            print_result(
+                result,
+                host_string=host_string,
+                stdout=stdout,
+                stderr=stderr,
+                show_stdout=output.stdout,
+                show_stderr=output.stderr,
+            )
+        if result.failed:
+            message = '{which}() received nonzero return code {status} ' \
+                      'while executing'.format(
+                          which=which,
+                          status=result.return_code,
+                      )
+            if fab.env.warn_only:
+                message += " '{command}'!".format(command=command)
+            else:
+                message += '!\n\nRequested: {command}\nExecuted: {wrapped}' \
+                           ''.format(command=command, wrapped=wrapped_command)
+            error(message=message, stdout=result, stderr=result.stderr)
+        return result
+
+    def run(self, command, **kwargs):
+        return self._run(command, **kwargs)
+
+    @staticmethod
+    def sudo(command, **kwargs):
+        # sudo may ask for password, so it is executed by Fabric
+        return fab.sudo(command, **kwargs)
+
+
+def make_result(command, wrapped_command, status, stdout, stderr):
+    if isinstance(stdout, bytes):
+        stdout = stdout.decode('utf-8', 'replace')
+    if isinstance(stderr, bytes):
+        stderr = stderr.decode('utf-8', 'replace')
+    result = _AttributeString(stdout.strip())
+    result.stderr = _AttributeString(stderr.strip())
+    result.command = command
+    result.real_command = wrapped_command
+    result.return_code = status
+    result.failed = status not in fab.env.ok_ret_codes
+    result.succeeded = not result.failed
+    return result
+
+
+def print_result(
+    result,
+    host_string=None,
+    stdout=None,
+    stderr=None,
+    show_stdout=True,
+    show_stderr=True,
+):
+    for stream, prefix, show, text in (
+        (stdout or sys.stdout, 'out', show_stdout, result),
+        (stderr or sys.stderr, 'err', show_stderr, result.stderr),
+    ):
+        if show and text:
+            lines = text.splitlines()
+            if host_string:
+                lines = [
+                    '[{host}] {prefix}: {line}'.format(
+                        host=host_string,
+                        prefix=prefix,
+                        line=line,
+                    )
+                    for line in lines
+                ]
+            logger.write(
+                ''.join(line + '\n' for line in lines),
+                output=stream,
+                host_string=host_string,
+            )
+
+
+_pool = None
+
+
+def get_pool(force=False):
+    """
+    returns connection pool if SSH multiplexing is enabled by
+    `env.ssh_multiplexing` (e.g. `fab --set ssh_multiplexing=yes ...`)
+    or `force` is set
+    """
+    global _pool
+    enabled = utils.strtobool(fab.env.get('ssh_multiplexing', False))
+    if not (enabled or force):
+        return None
+    if _pool is None:
+        _pool = ConnectionPool(
+            control_dir=fab.env.get('ssh_control_dir', '~/.ssh'),
+            persist=fab.env.get('ssh_control_persist', 600),
+        )
+    return _pool
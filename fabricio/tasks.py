@@ -15,7 +15,8 @@ from fabric.tasks import Task, WrappedCallableTask, get_task_details
 
 import fabricio
 
-from fabricio import docker, utils
+from fabricio import docker, executors, operations, retry, utils
+from fabricio.cache import persist
 from fabricio.misc import dangling_images_delete_command
 
 fab.env.setdefault('infrastructure', None)
@@ -218,6 +219,33 @@ class Infrastructure(Task, Tasks):
 infrastructure = Infrastructure
 
 
+class CacheTasks(Tasks):
+    """
+    If `path` is provided then results of the cached commands are kept in
+    this file between Fabric invocations (for `ttl` seconds if provided)
+    """
+
+    def __init__(self, path=None, ttl=None, **kwargs):
+        super(CacheTasks, self).__init__(**kwargs)
+        if path is not None:
+            persist(path, ttl=ttl)
+
+    @fab.hosts()
+    @fab.roles()
+    @fab.task
+    def clear(self, image=None, hostname=None):
+        """
+        clear cached commands results (all or only of the image and/or host)
+        """
+        invalidate_kwargs = dict(image=image)
+        if hostname is not None:
+            invalidate_kwargs.update(host=hostname)
+        removed = operations.run.cache.invalidate(**invalidate_kwargs)
+        if hostname is None:
+            removed += operations.local.cache.invalidate(image=image)
+        fabricio.log('Removed {0} cached result(s).'.format(removed))
+
+
 class DockerTasks(Tasks):
 
     _warnings_stacklevel = 2
@@ -240,7 +268,9 @@ class DockerTasks(Tasks):
         prepare_command=False,
         push_command=False,
         upgrade_command=False,
+        wait_command=False,
         env=None,
+        executor=None,
         **kwargs
     ):
         self.destroy = self.DestroyTask(tasks=self)
@@ -276,6 +306,7 @@ class DockerTasks(Tasks):
         self.revert.use_task_objects = task_mode or revert_command
         self.pull.use_task_objects = task_mode or pull_command
         self.update.use_task_objects = task_mode or update_command
+        self.wait.use_task_objects = task_mode or wait_command
         self.destroy.use_task_objects = not task_mode
         self.rollback.use_task_objects = task_mode or rollback_command
 
@@ -296,6 +327,10 @@ class DockerTasks(Tasks):
 
         self.env = env or {}
 
+        # callable used instead of `fab.execute` to run tasks on all hosts
+        # or its name, see `fabricio.executors.get_executor()`
+        self.executor = executor
+
     def _set_registry(self, registry):
         self.__dict__['registry'] = docker.Registry(registry)
 
@@ -393,7 +428,7 @@ class DockerTasks(Tasks):
             return
         image = self.image[tag]  # type: docker.Image
         if image:
-            image.pull(local=True, use_cache=True)
+            image.pull(local=True)
 
     def delete_dangling_images(self):  # pragma: no cover
         warnings.warn(
@@ -408,11 +443,12 @@ class DockerTasks(Tasks):
 
     def push_image(self, tag=None):
         image = self.image[self.registry:tag:self.account]
-        fabricio.local(
-            'docker push {image}'.format(image=image),
-            quiet=False,
-            use_cache=True,
-        )
+        with retry.attached('push'):
+            fabricio.local(
+                'docker push {image}'.format(image=image),
+                quiet=False,
+                buffer_size=fabricio.local.buffer_size,
+            )
 
     @fab.hosts()
     @fab.roles()
@@ -427,18 +463,12 @@ class DockerTasks(Tasks):
         if not image:
             return
         proxy_tag = image[self.registry:tag:self.account]
-        fabricio.local(
-            'docker tag {image} {tag}'.format(
-                image=image,
-                tag=proxy_tag,
-            ),
-            use_cache=True,
-        )
+        fabricio.local('docker tag {image} {tag}'.format(
+            image=image,
+            tag=proxy_tag,
+        ))
         self.push_image(tag=tag)
-        fabricio.local(
-            'docker rmi {tag}'.format(tag=proxy_tag),
-            use_cache=True,
-        )
+        fabricio.local('docker rmi {tag}'.format(tag=proxy_tag))
 
     def pull_image(self, tag=None):
         self.service.pull_image(
@@ -481,7 +511,7 @@ class DockerTasks(Tasks):
 
     @fab.task
     @fabricio.skip_unknown_host
-    def update(self, tag=None, force=False):
+    def update(self, tag=None, force=False, wait=False):
         """
         update service to a new version
         """
@@ -494,9 +524,26 @@ class DockerTasks(Tasks):
             )
         if updated is False:
             fabricio.log('No changes detected, update skipped.')
+        elif utils.strtobool(wait):
+            self.service.wait_rollout()
 
     @fab.task
-    def upgrade(self, tag=None, force=False, backup=False, migrate=True):
+    @fabricio.skip_unknown_host
+    def wait(self, timeout=None):
+        """
+        wait until all service replicas run its current version
+        """
+        self.service.wait_rollout(timeout=timeout and float(timeout))
+
+    @fab.task
+    def upgrade(
+        self,
+        tag=None,
+        force=False,
+        backup=False,
+        migrate=True,
+        wait=False,
+    ):
         """
         upgrade service to a new version (backup -> pull -> migrate -> update)
         """
@@ -505,23 +552,32 @@ class DockerTasks(Tasks):
         self.pull(tag=tag)
         if utils.strtobool(migrate):
             self.migrate(tag=tag)
-        self.update(tag=tag, force=force)
+        self.update(tag=tag, force=force, wait=wait)
 
     @fab.hosts()
     @fab.roles()
     @fab.task
-    def deploy(self, tag=None, force=False, backup=False, migrate=True):
+    def deploy(
+        self,
+        tag=None,
+        force=False,
+        backup=False,
+        migrate=True,
+        wait=False,
+    ):
         """
         deploy service (prepare -> push -> backup -> pull -> migrate -> update)
         """
         self.prepare(tag=tag)
         self.push(tag=tag)
-        fab.execute(
+        execute = executors.get_executor(self.executor)
+        execute(
             self.upgrade,
             tag=tag,
             force=force,
             backup=backup,
             migrate=migrate,
+            wait=wait,
         )
 
     class DestroyTask(Task, Tasks):
@@ -572,7 +628,8 @@ class DockerTasks(Tasks):
             """
             self.run.hosts = self.hosts
             self.run.roles = self.roles
-            return fab.execute(self.run, *args, **kwargs)
+            execute = executors.get_executor(self.tasks.executor)
+            return execute(self.run, *args, **kwargs)
 
         @fab.task(name='destroy')
         def run(self, *args, **kwargs):
@@ -631,7 +688,6 @@ class ImageBuildDockerTasks(DockerTasks):
             local=True,
             build_path=self.build_path,
             options=options,
-            use_cache=True,
         )
 
     @fab.hosts()
@@ -0,0 +1,106 @@
+"""
+JSON lines trace of executed commands (one record per command) enabled by
+`trace_file` setting (e.g. `fab --set trace_file=trace.jsonl ...`)
+or FABRICIO_TRACE environment variable
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+import six
+
+from fabric import api as fab
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+_lock = threading.Lock()
+
+
+def get_path():
+    return fab.env.get('trace_file') or os.environ.get('FABRICIO_TRACE')
+
+
+def write(record, path=None):
+    """
+    appends record to the trace file by single write under the lock,
+    so records of parallel workers (threads and processes) never mix up
+    """
+    path = path or get_path()
+    if not path:
+        return
+    line = json.dumps(record, sort_keys=True) + '\n'
+    with _lock:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, line.encode('utf-8'))
+        finally:
+            os.close(fd)  # releases flock as well
+
+
+def size(data):
+    """
+    returns size of data (string, file-like object or path to the local
+    file) in bytes or None if it can't be found out
+    """
+    if data is None:
+        return None
+    if hasattr(data, 'getvalue'):
+        return _length(data.getvalue())
+    if isinstance(data, six.string_types) and os.path.isfile(data):
+        return os.path.getsize(data)
+    return None
+
+
+def _length(text):
+    if isinstance(text, six.text_type):
+        text = text.encode('utf-8')
+    return len(text)
+
+
+@contextlib.contextmanager
+def command(method, command, cache=None, attempt=None):
+    """
+    writes trace record of the command executed inside the context,
+    yielded dict can be updated with additional info (e.g. 'bytes_in'),
+    `result` key is replaced by exit status and size of output
+    """
+    path = get_path()
+    if not path:
+        yield {}
+        return
+    record = dict(
+        host=fab.env.host_string or 'localhost',
+        task=fab.env.command,
+        method=method,
+        command=command,
+        cache=cache,
+        bytes_out=_length(command),
+        bytes_in=None,
+        status=None,
+        start=time.time(),
+    )
+    if attempt is not None:
+        record['attempt'] = attempt
+    try:
+        yield record
+    except BaseException as exception:
+        record.update(
+            status='error',
+            error=six.text_type(exception) or type(exception).__name__,
+        )
+        raise
+    finally:
+        result = record.pop('result', None)
+        if result is not None:
+            record['status'] = getattr(result, 'return_code', record['status'])
+            stderr = getattr(result, 'stderr', '') or ''
+            record['bytes_in'] = _length(result) + _length(stderr)
+        record['end'] = time.time()
+        write(record, path=path)
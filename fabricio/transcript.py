@@ -0,0 +1,223 @@
+"""
+transcript of the deploy: commands executed by `fabricio.run` and
+`fabricio.local` along with their output, exit status and duration,
+as well as file transfers made by `fabricio.put` and `fabricio.get`
+(content of downloaded file is recorded too)
+
+Transcript is recorded to the file provided by `record_transcript` setting
+(e.g. `fab --set record_transcript=deploy.jsonl app.deploy`) and can be
+replayed then without any SSH connection by `replay_transcript` setting
+(e.g. `fab --set replay_transcript=deploy.jsonl,replay_speed=0 app.deploy`),
+`replay_speed` is a multiplier of recorded durations (1 by default,
+0 means no delays).
+"""
+import base64
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+import six
+
+from fabric import api as fab
+from fabric.operations import _AttributeList
+from fabric.utils import error
+
+import fabricio
+
+from fabricio import ssh, trace
+
+
+def get_recorder():
+    path = fab.env.get('record_transcript')
+    if path and not fab.env.get('replay_transcript'):
+        return path
+    return None
+
+
+@contextlib.contextmanager
+def recording(method, command):
+    """
+    records command executed inside the context to the transcript (if
+    recording is enabled), result of the command must be set to the
+    'result' key of yielded dict
+    """
+    path = get_recorder()
+    if not path:
+        yield {}
+        return
+    entry = dict(
+        method=method,
+        host=None if method == 'local' else fab.env.host_string,
+        command=command,
+    )
+    started = time.time()
+    try:
+        yield entry
+    except BaseException as exception:
+        entry['error'] = str(exception) or type(exception).__name__
+        raise
+    finally:
+        entry['duration'] = time.time() - started
+        result = entry.pop('result', None)
+        if result is not None:
+            entry.update(
+                stdout=result,
+                stderr=getattr(result, 'stderr', '') or '',
+                return_code=getattr(result, 'return_code', 0),
+            )
+        trace.write(entry, path=path)
+
+
+def read_content(local_path, result):
+    """
+    returns base64 encoded content of the file downloaded by `fab.get`
+    (None if several files were downloaded)
+    """
+    if hasattr(local_path, 'getvalue'):
+        content = local_path.getvalue()
+    elif len(result) == 1:
+        with open(result[0], 'rb') as local_file:
+            content = local_file.read()
+    else:
+        return None
+    if isinstance(content, six.text_type):
+        content = content.encode('utf-8')
+    return base64.b64encode(content).decode('ascii')
+
+
+class Player(object):
+    """
+    backend of `fabricio.run`, `fabricio.local`, `fabricio.put` and
+    `fabricio.get` answering by results of the same commands (executed
+    on the same host) from the transcript
+
+    Repeated commands get recorded results in the order of recording,
+    the last one is reused when they are over.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.entries = collections.defaultdict(collections.deque)
+        self.lock = threading.Lock()
+        with open(path) as transcript:
+            for line in transcript:
+                if line.strip():
+                    entry = json.loads(line)
+                    key = entry['method'], entry['host'], entry['command']
+                    self.entries[key].append(entry)
+
+    def get_entry(self, method, command, host_string=None):
+        key = method, host_string, command
+        with self.lock:
+            entries = self.entries.get(key)
+            if not entries:
+                raise fabricio.Error(
+                    '{method} of {command!r} on {host} not found in the '
+                    'transcript {path}'.format(
+                        method=method,
+                        command=command,
+                        host=host_string or 'localhost',
+                        path=self.path,
+                    )
+                )
+            if len(entries) > 1:
+                return entries.popleft()
+            return entries[0]
+
+    def replay_entry(self, method, command, host_string=None):
+        entry = self.get_entry(method, command, host_string=host_string)
+        if self.speed:
+            time.sleep(entry.get('duration', 0) * self.speed)
+        if 'error' in entry:
+            error(entry['error'])
+            return None  # warn_only is set
+        return entry
+
+    def replay(
+        self,
+        method,
+        command,
+        host_string=None,
+        stdout=None,
+        stderr=None,
+        **kwargs
+    ):
+        entry = self.replay_entry(method, command, host_string=host_string)
+        if entry is None:
+            return None
+        result = ssh.make_result(
+            command,
+            command,
+            status=entry['return_code'],
+            stdout=entry['stdout'],
+            stderr=entry['stderr'],
+        )
+        ssh.print_result(
+            result,
+            host_string=host_string,
+            stdout=stdout,
+            stderr=stderr,
+            show_stdout=fab.output.stdout,
+            show_stderr=fab.output.stderr,
+        )
+        return result
+
+    def run(self, command, **kwargs):
+        return self.replay('run', command, fab.env.host_string, **kwargs)
+
+    def sudo(self, command, **kwargs):
+        return self.replay('sudo', command, fab.env.host_string, **kwargs)
+
+    def local(self, command, **kwargs):
+        return self.replay('local', command, **kwargs)
+
+    def put(self, local_path=None, remote_path=None, **kwargs):
+        entry = self.replay_entry('put', remote_path, fab.env.host_string)
+        if entry is None:
+            return None
+        result = _AttributeList([remote_path])
+        result.failed = [local_path] if entry['return_code'] else []
+        result.succeeded = not result.failed
+        return result
+
+    def get(self, remote_path, local_path=None, **kwargs):
+        entry = self.replay_entry('get', remote_path, fab.env.host_string)
+        if entry is None:
+            return None
+        result = _AttributeList()
+        content = entry.get('content')
+        if not entry['return_code'] and content is not None:
+            content = base64.b64decode(content)
+            if hasattr(local_path, 'write'):
+                local_path.write(content)
+            else:
+                path = local_path or os.path.basename(remote_path)
+                if os.path.isdir(path):
+                    path = os.path.join(path, os.path.basename(remote_path))
+                with open(path, 'wb') as local_file:
+                    local_file.write(content)
+                result.append(path)
+        result.failed = [remote_path] if entry['return_code'] else []
+        result.succeeded = not result.failed
+        return result
+
+
+_players = {}
+
+
+def get_player():
+    """
+    returns transcript player if replay is enabled
+    by `env.replay_transcript` setting
+    """
+    path = fab.env.get('replay_transcript')
+    if not path:
+        return None
+    speed = float(fab.env.get('replay_speed', 1))
+    if (path, speed) not in _players:
+        _players[path, speed] = Player(path, speed=speed)
+    return _players[path, speed]
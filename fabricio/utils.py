@@ -1,18 +1,50 @@
+import atexit
 import collections
 import contextlib
+import errno
+import functools
+import hashlib
+import itertools
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
 import warnings
 
 from distutils import util as distutils
 
 import six
 
-from six.moves import shlex_quote, collections_abc
+from fabric import api as fab
+from fabric.exceptions import CommandTimeout
+from six.moves import shlex_quote, collections_abc, cPickle as pickle
 
 import fabricio
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
 DEFAULT = object()
 
 
+# chosen by the main process before workers are forked, so all of them
+# share it, while directory itself is created on first use by any of
+# them, random name guarantees that state left by killed session is
+# never picked up by the next one (even if it got the same pid)
+_session_dir = os.path.join(
+    tempfile.gettempdir(),
+    'fabricio-session-{0}'.format(uuid.uuid4().hex),
+)
+_session_dir_created = False
+
+atexit.register(shutil.rmtree, _session_dir, True)  # forks skip `atexit`
+
+
 @contextlib.contextmanager
 def patch(obj, attr, value, default=DEFAULT, force_delete=False):
     original = not force_delete and getattr(obj, attr, default)
@@ -111,6 +143,432 @@ class PriorityDict(dict):
                 yield key, self[key]
 
 
+def memoize(maxsize=1024):
+    """
+    caches results of the function of hashable arguments keeping
+    `maxsize` most recently used of them (`functools.lru_cache` analogue)
+    """
+    def decorator(func):
+        cache = collections.OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def _func(*args):
+            with lock:
+                try:
+                    result = cache.pop(args)
+                except KeyError:
+                    pass
+                else:
+                    cache[args] = result  # move to the end
+                    return result
+            result = func(*args)
+            with lock:
+                cache[args] = result
+                if len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return result
+
+        _func.cache = cache
+        return _func
+
+    return decorator
+
+
+def get_session_dir():
+    """
+    returns temporary directory shared by all workers of the Fabric
+    session (threads and forked processes), it is created on first use
+    and removed at exit of the main process
+    """
+    global _session_dir_created
+    if not _session_dir_created:
+        try:
+            os.mkdir(_session_dir, 0o700)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+        _session_dir_created = True
+    return _session_dir
+
+
+class SharedDict(collections_abc.MutableMapping):
+    """
+    dict shared by all workers of the Fabric session (threads and forked
+    processes), items (with string keys) are kept in the files of the
+    session directory, so no `multiprocessing.Manager` process is needed
+    """
+
+    counter = itertools.count()
+
+    def __init__(self, *args, **kwargs):
+        # name is unique for all workers even if dict is created by worker
+        self.name = 'shared-{pid}-{number}'.format(
+            pid=os.getpid(),
+            number=next(self.counter),
+        )
+        self.update(*args, **kwargs)
+
+    @property
+    def path(self):
+        return os.path.join(get_session_dir(), self.name)
+
+    def _get_item_path(self, key):
+        key = six.text_type(key).encode('utf-8')
+        return os.path.join(self.path, hashlib.sha1(key).hexdigest())
+
+    def _read(self, path):
+        with open(path, 'rb') as item_file:
+            return pickle.load(item_file)
+
+    def __getitem__(self, key):
+        try:
+            return self._read(self._get_item_path(key))[1]
+        except (IOError, OSError, EOFError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        path = self._get_item_path(key)
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError as error:  # pragma: no cover
+                if error.errno != errno.EEXIST:
+                    raise
+        temp_path = '{dir}/.{pid}.{thread}'.format(
+            dir=self.path,
+            pid=os.getpid(),
+            thread=threading.current_thread().ident,
+        )
+        with open(temp_path, 'wb') as item_file:
+            pickle.dump((key, value), item_file, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, path)  # readers never see partial item
+
+    def __delitem__(self, key):
+        try:
+            os.remove(self._get_item_path(key))
+        except OSError:
+            raise KeyError(key)
+
+    def _items(self):
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            names = []
+        for name in names:
+            if name.startswith('.'):
+                continue
+            try:
+                yield self._read(os.path.join(self.path, name))
+            except (IOError, OSError, EOFError):  # pragma: no cover
+                pass  # removed by another worker
+
+    def __iter__(self):
+        return (key for key, value in self._items())
+
+    def __len__(self):
+        return sum(1 for _ in self._items())
+
+    def __repr__(self):
+        return '{cls}({items})'.format(
+            cls=type(self).__name__,
+            items=dict(self._items()),
+        )
+
+
+class SharedNamespace(object):
+    """
+    namespace which attributes are shared by all workers of the Fabric
+    session (see `SharedDict`)
+    """
+
+    def __init__(self, **attrs):
+        object.__setattr__(self, '_data', SharedDict(attrs))
+
+    def __getattr__(self, attr):
+        try:
+            return self._data[attr]
+        except KeyError:
+            raise AttributeError(attr)
+
+    def __setattr__(self, attr, value):
+        self._data[attr] = value
+
+    def __delattr__(self, attr):
+        try:
+            del self._data[attr]
+        except KeyError:
+            raise AttributeError(attr)
+
+
+class SharedLock(object):
+    """
+    lock shared by all workers of the Fabric session (threads and forked
+    processes), `multiprocessing.Lock` analogue based on file lock placed
+    to the session directory
+    """
+
+    counter = itertools.count()
+
+    def __init__(self):
+        self.name = 'lock-{pid}-{number}'.format(
+            pid=os.getpid(),
+            number=next(self.counter),
+        )
+        self.thread_lock = threading.Lock()
+        self.lock_file = None
+        self.pid = os.getpid()
+
+    @property
+    def path(self):
+        return os.path.join(get_session_dir(), self.name)
+
+    def _get_thread_lock(self):
+        if self.pid != os.getpid():
+            # lock could be held by the parent at the moment of fork
+            self.thread_lock = threading.Lock()
+            self.lock_file = None
+            self.pid = os.getpid()
+        return self.thread_lock
+
+    def acquire(self, block=True):
+        # POSIX locks don't exclude threads of the same process
+        thread_lock = self._get_thread_lock()
+        if not thread_lock.acquire(block):
+            return False
+        if fcntl is None:  # pragma: no cover
+            self.lock_file = True
+            return True
+        lock_file = open(self.path, 'a')
+        flags = fcntl.LOCK_EX
+        if not block:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.lockf(lock_file, flags)
+        except (IOError, OSError):
+            lock_file.close()
+            thread_lock.release()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def release(self):
+        lock_file, self.lock_file = self.lock_file, None
+        if lock_file is None or self.pid != os.getpid():
+            raise ValueError('lock released too many times')
+        if fcntl is not None:
+            fcntl.lockf(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+        self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class SharedEvent(object):
+    """
+    event shared by all workers of the Fabric session (threads and forked
+    processes), `multiprocessing.Event` analogue which is set while its
+    file exists in the session directory
+    """
+
+    counter = itertools.count()
+
+    poll_interval = 0.05
+
+    def __init__(self):
+        self.name = 'event-{pid}-{number}'.format(
+            pid=os.getpid(),
+            number=next(self.counter),
+        )
+
+    @property
+    def path(self):
+        return os.path.join(get_session_dir(), self.name)
+
+    def is_set(self):
+        return os.path.exists(self.path)
+
+    def set(self):
+        open(self.path, 'a').close()
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def wait(self, timeout=None):
+        deadline = timeout is not None and time.time() + timeout
+        while not self.is_set():
+            if deadline is not False and time.time() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+
+class TailBuffer(object):
+    """
+    file-like object which keeps only last `size` characters written to it
+    (all of them if size is None)
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.chunks = collections.deque()
+        self.length = 0
+
+    def write(self, text):
+        self.chunks.append(text)
+        self.length += len(text)
+        if self.size is None:
+            return
+        while self.length - len(self.chunks[0]) >= self.size:
+            self.length -= len(self.chunks.popleft())
+
+    def getvalue(self):
+        value = ''.join(self.chunks)
+        return value if self.size is None else value[-self.size:]
+
+
+def stream_output(
+    args,
+    buffer_size,
+    stream=None,
+    prefix='',
+    timeout=None,
+    **kwargs
+):
+    """
+    executes process writing its output (stdout and stderr together)
+    line by line to the stream, only last `buffer_size` characters of
+    output (all if None) are kept in memory, returns exit code and kept
+    output
+    """
+    process = subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        **kwargs
+    )
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    timer = timeout and threading.Timer(timeout, kill)
+    if timer:
+        timer.start()
+    buffer = TailBuffer(buffer_size)
+    readline = functools.partial(process.stdout.readline, 8192)
+    try:
+        for line in iter(readline, b''):
+            line = line.decode('utf-8', 'replace')
+            buffer.write(line)
+            if stream is not None:
+                stream.write(prefix + line)
+                stream.flush()
+        process.wait()
+    finally:
+        process.stdout.close()
+        if timer:
+            timer.cancel()
+    if timed_out.is_set():
+        raise CommandTimeout(timeout=timeout)
+    return process.returncode, buffer.getvalue()
+
+
+class ThreadLocalDict(dict):
+    """
+    mixin for dicts shared by threads (e.g. `fab.env`) which items are read
+    from and written to the current thread's own copy (if any)
+    """
+
+    def _data(self):
+        data = getattr(self.__dict__['_thread_local'], 'data', None)
+        return self if data is None else data
+
+    def __getitem__(self, key):
+        return dict.__getitem__(self._data(), key)
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self._data(), key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self._data(), key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self._data(), key)
+
+    def __iter__(self):
+        return dict.__iter__(self._data())
+
+    def __len__(self):
+        return dict.__len__(self._data())
+
+    def get(self, key, default=None):
+        return dict.get(self._data(), key, default)
+
+    def setdefault(self, key, default=None):
+        return dict.setdefault(self._data(), key, default)
+
+    def pop(self, key, *args):
+        return dict.pop(self._data(), key, *args)
+
+    def update(self, *args, **kwargs):
+        dict.update(self._data(), *args, **kwargs)
+
+    def keys(self):
+        return dict.keys(self._data())
+
+    def values(self):
+        return dict.values(self._data())
+
+    def items(self):
+        return dict.items(self._data())
+
+    def copy(self):
+        return dict.copy(self._data())
+
+    def clear(self):
+        dict.clear(self._data())
+
+    @classmethod
+    def patch(cls, obj):
+        """
+        makes existing dict (e.g. `fab.env`) thread-local
+        """
+        if isinstance(obj, cls):
+            return obj
+        obj_cls = type(obj)
+        thread_local_cls = type(obj_cls.__name__, (obj_cls, cls), {})
+        # Fabric's dicts override __setattr__ to set items
+        object.__setattr__(obj, '__class__', thread_local_cls)
+        object.__setattr__(obj, '_thread_local', threading.local())
+        return obj
+
+
+@contextlib.contextmanager
+def isolated_env(**values):
+    """
+    gives the current thread its own copies of `fab.env` (updated with
+    values) and Fabric's output settings, so changes made by the thread
+    (e.g. `host_string` or `fab.hide()`) don't affect others
+    """
+    env = ThreadLocalDict.patch(fab.env)
+    output = ThreadLocalDict.patch(fab.output)
+    env_data = env.copy()
+    env_data.update(values)
+    with patch(env._thread_local, 'data', env_data):
+        with patch(output._thread_local, 'data', output.copy()):
+            yield
+
+
 class OrderedSet(collections.MutableSet):  # pragma: no cover
     """
     http://code.activestate.com/recipes/576694-orderedset/
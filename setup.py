@@ -14,7 +14,6 @@ install_requires = [
     'cached-property>=1.3',
     'docker-py>=1.8.1,<2.0',
     'six>=1.13.0',
-    'dpath<2',
     'colorama<0.4',
 ]
 
@@ -2,8 +2,11 @@ import argparse
 import itertools
 import shlex
 
+import mock
 import unittest2 as unittest
 
+from fabricio import operations
+
 
 class FabricioTestCase(unittest.TestCase):
 
@@ -47,6 +50,29 @@ class FailedResult(str):
 
     failed = True
 
+
+def inspect_all_call(*commands):
+    batch = operations.Batch()
+    batch_commands = [
+        batch.add(command, ignore_errors=True)
+        for command in commands
+    ]
+    return mock.call(batch.make_script(batch_commands), ignore_errors=True)
+
+
+def inspect_all_result(*chunks):
+    # output of the batch script executed with pty (Fabric's default),
+    # stderr markers are merged into stdout and lines end with '\r\n'
+    return SucceededResult('\r\n'.join(
+        '{output}\r\n\r\n__fabricio_batch__ {number} {status}\r\n'
+        '\r\n__fabricio_batch_stderr__ {number} {status}'.format(
+            output=output,
+            number=number,
+            status=status,
+        )
+        for number, (output, status) in enumerate(chunks)
+    ))
+
 docker_run_args_parser = argparse.ArgumentParser(argument_default=argparse.SUPPRESS)
 docker_run_args_parser.add_argument('executable', nargs=1)
 docker_run_args_parser.add_argument('run_or_create', nargs=1)
@@ -78,6 +104,7 @@ args_parser.add_argument('args', nargs=argparse.REMAINDER)
 docker_inspect_args_parser = argparse.ArgumentParser(argument_default=argparse.SUPPRESS)
 docker_inspect_args_parser.add_argument('executable', nargs=2)
 docker_inspect_args_parser.add_argument('--type')
+docker_inspect_args_parser.add_argument('--format')
 docker_inspect_args_parser.add_argument('image_or_container')
 
 # TODO use args_parser instead
@@ -111,6 +138,9 @@ docker_service_update_args_parser.add_argument('--restart-condition', dest='rest
 docker_service_update_args_parser.add_argument('--user')
 docker_service_update_args_parser.add_argument('--stop-grace-period', dest='stop-grace-period')
 docker_service_update_args_parser.add_argument('--args')
+docker_service_update_args_parser.add_argument('--update-parallelism', dest='update-parallelism')
+docker_service_update_args_parser.add_argument('--update-delay', dest='update-delay')
+docker_service_update_args_parser.add_argument('--update-failure-action', dest='update-failure-action')
 docker_service_update_args_parser.add_argument('--custom_option')
 docker_service_update_args_parser.add_argument('service')
 
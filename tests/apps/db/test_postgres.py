@@ -1,19 +1,18 @@
+import multiprocessing
+import os
 import shlex
 import sys
 
-from multiprocessing.synchronize import Event
-
 import mock
 import six
 import unittest2 as unittest
 
 from fabric import api as fab
-from fabric.contrib import files
 
 import fabricio
 
 from fabricio.apps.db import postgres
-from fabricio import docker
+from fabricio import docker, tasks, utils
 from tests import SucceededResult, FailedResult, docker_run_args_parser, \
     docker_inspect_args_parser, args_parser
 
@@ -70,6 +69,7 @@ class PostgresqlBackupMixinTestCase(unittest.TestCase):
                     {
                         'executable': ['docker', 'inspect'],
                         'type': 'container',
+                        'format': '[{"Image":{{json .Image}}}]',
                         'image_or_container': 'name',
                     },
                     {
@@ -98,7 +98,7 @@ class PostgresqlBackupMixinTestCase(unittest.TestCase):
                     db_backup_filename='backup.dump',
                 ),
                 expected_args=[
-                    dict(args=['docker', 'service', 'inspect', 'name']),
+                    dict(args=['docker', 'service', 'inspect', 'name', '--format', '[{"Spec":{"TaskTemplate":{"ContainerSpec":{"Image":{{json .Spec.TaskTemplate.ContainerSpec.Image}}}}}}]']),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -135,6 +135,7 @@ class PostgresqlBackupMixinTestCase(unittest.TestCase):
                     {
                         'executable': ['docker', 'inspect'],
                         'type': 'container',
+                        'format': '[{"Image":{{json .Image}}}]',
                         'image_or_container': 'name',
                     },
                     {
@@ -170,7 +171,7 @@ class PostgresqlBackupMixinTestCase(unittest.TestCase):
                     db_backup_workers=2,
                 ),
                 expected_args=[
-                    dict(args=['docker', 'service', 'inspect', 'name']),
+                    dict(args=['docker', 'service', 'inspect', 'name', '--format', '[{"Spec":{"TaskTemplate":{"ContainerSpec":{"Image":{{json .Spec.TaskTemplate.ContainerSpec.Image}}}}}}]']),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -230,6 +231,7 @@ class PostgresqlBackupMixinTestCase(unittest.TestCase):
                     {
                         'executable': ['docker', 'inspect'],
                         'type': 'container',
+                        'format': '[{"Image":{{json .Image}}}]',
                         'image_or_container': 'name',
                     },
                     {
@@ -257,7 +259,7 @@ class PostgresqlBackupMixinTestCase(unittest.TestCase):
             ),
             service_default=dict(
                 expected_args=[
-                    dict(args=['docker', 'service', 'inspect', 'name']),
+                    dict(args=['docker', 'service', 'inspect', 'name', '--format', '[{"Spec":{"TaskTemplate":{"ContainerSpec":{"Image":{{json .Spec.TaskTemplate.ContainerSpec.Image}}}}}}]']),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -286,6 +288,7 @@ class PostgresqlBackupMixinTestCase(unittest.TestCase):
                     {
                         'executable': ['docker', 'inspect'],
                         'type': 'container',
+                        'format': '[{"Image":{{json .Image}}}]',
                         'image_or_container': 'name',
                     },
                     {
@@ -320,7 +323,7 @@ class PostgresqlBackupMixinTestCase(unittest.TestCase):
             ),
             service_regular=dict(
                 expected_args=[
-                    dict(args=['docker', 'service', 'inspect', 'name']),
+                    dict(args=['docker', 'service', 'inspect', 'name', '--format', '[{"Spec":{"TaskTemplate":{"ContainerSpec":{"Image":{{json .Spec.TaskTemplate.ContainerSpec.Image}}}}}}]']),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -425,7 +428,7 @@ class PostgresqlContainerTestCase(unittest.TestCase):
     @mock.patch.object(fab, 'get')
     @mock.patch.object(fab, 'put')
     @mock.patch.object(postgres.PostgresqlContainer, 'create_db')
-    @mock.patch.object(files, 'exists', return_value=True)
+    @mock.patch.object(fabricio, 'exists', return_value=True)
     def test_update(self, exists, create_db, *args):
         cases = dict(
             updated_without_config_change=dict(
@@ -527,7 +530,7 @@ class PostgresqlContainerTestCase(unittest.TestCase):
                 expected_commands=[
                     mock.call('mv -f /data/pg_hba.conf /data/pg_hba.conf.backup', ignore_errors=True, sudo=True),
                     mock.call('docker kill --signal HUP name'),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    mock.call('docker inspect --type container name_backup --format \'[{"Image":{{json .Image}}}]\'', abort_exception=docker.ContainerNotFoundError),
                     mock.call('docker rm --volumes name_backup'),
                     mock.call('docker rmi image_id', ignore_errors=True),
                     mock.call('rm -f /data/postgresql.conf.backup', ignore_errors=True, sudo=True),
@@ -554,7 +557,7 @@ class PostgresqlContainerTestCase(unittest.TestCase):
                 expected_commands=[
                     mock.call('mv -f /data/pg_hba.conf /data/pg_hba.conf.backup', ignore_errors=True, sudo=True),
                     mock.call('docker kill --signal HUP name'),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    mock.call('docker inspect --type container name_backup --format \'[{"Image":{{json .Image}}}]\'', abort_exception=docker.ContainerNotFoundError),
                     mock.call('rm -f /data/postgresql.conf.backup', ignore_errors=True, sudo=True),
                 ],
                 side_effect=(
@@ -592,7 +595,7 @@ class PostgresqlContainerTestCase(unittest.TestCase):
                 expected_commands=[
                     mock.call('mv -f /data/postgresql.conf /data/postgresql.conf.backup', ignore_errors=True, sudo=True),
                     mock.call('docker restart --time 30 name'),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    mock.call('docker inspect --type container name_backup --format \'[{"Image":{{json .Image}}}]\'', abort_exception=docker.ContainerNotFoundError),
                     mock.call('docker rm --volumes name_backup'),
                     mock.call('docker rmi image_id', ignore_errors=True),
                     mock.call('rm -f /data/pg_hba.conf.backup', ignore_errors=True, sudo=True),
@@ -619,7 +622,7 @@ class PostgresqlContainerTestCase(unittest.TestCase):
                 expected_commands=[
                     mock.call('mv -f /data/postgresql.conf /data/postgresql.conf.backup', ignore_errors=True, sudo=True),
                     mock.call('docker restart --time 30 name'),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    mock.call('docker inspect --type container name_backup --format \'[{"Image":{{json .Image}}}]\'', abort_exception=docker.ContainerNotFoundError),
                     mock.call('rm -f /data/pg_hba.conf.backup', ignore_errors=True, sudo=True),
                 ],
                 side_effect=(
@@ -658,7 +661,7 @@ class PostgresqlContainerTestCase(unittest.TestCase):
                     mock.call('mv -f /data/postgresql.conf /data/postgresql.conf.backup', ignore_errors=True, sudo=True),
                     mock.call('mv -f /data/pg_hba.conf /data/pg_hba.conf.backup', ignore_errors=True, sudo=True),
                     mock.call('docker restart --time 30 name'),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    mock.call('docker inspect --type container name_backup --format \'[{"Image":{{json .Image}}}]\'', abort_exception=docker.ContainerNotFoundError),
                     mock.call('docker rm --volumes name_backup'),
                     mock.call('docker rmi image_id', ignore_errors=True),
                 ],
@@ -685,7 +688,7 @@ class PostgresqlContainerTestCase(unittest.TestCase):
                     mock.call('mv -f /data/postgresql.conf /data/postgresql.conf.backup', ignore_errors=True, sudo=True),
                     mock.call('mv -f /data/pg_hba.conf /data/pg_hba.conf.backup', ignore_errors=True, sudo=True),
                     mock.call('docker restart --time 30 name'),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    mock.call('docker inspect --type container name_backup --format \'[{"Image":{{json .Image}}}]\'', abort_exception=docker.ContainerNotFoundError),
                 ],
                 side_effect=(
                     SucceededResult(),
@@ -723,7 +726,7 @@ class PostgresqlContainerTestCase(unittest.TestCase):
                     mock.call('mv -f /data/postgresql.conf /data/postgresql.conf.backup', ignore_errors=True, sudo=True),
                     mock.call('mv -f /data/pg_hba.conf /data/pg_hba.conf.backup', ignore_errors=True, sudo=True),
                     mock.call('docker restart --time 30 name'),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    mock.call('docker inspect --type container name_backup --format \'[{"Image":{{json .Image}}}]\'', abort_exception=docker.ContainerNotFoundError),
                 ],
                 side_effect=(
                     SucceededResult(),
@@ -914,7 +917,7 @@ class StreamingReplicatedPostgresqlContainerTestCase(unittest.TestCase):
     def setUp(self):
         self.fab_settings = fab.settings(fab.hide('everything'))
         self.fab_settings.__enter__()
-        self.event_wait_mock = mock.patch.object(Event, 'wait')
+        self.event_wait_mock = mock.patch.object(utils.SharedEvent, 'wait')
         self.event_wait_mock.start()
         self.stderr = sys.stderr
         sys.stderr = six.BytesIO()
@@ -926,7 +929,7 @@ class StreamingReplicatedPostgresqlContainerTestCase(unittest.TestCase):
         sys.stderr = self.stderr
 
     @mock.patch.object(postgres.StreamingReplicatedPostgresqlContainer, 'db_exists')
-    @mock.patch.object(files, 'exists')
+    @mock.patch.object(fabricio, 'exists')
     @mock.patch.object(fabricio, 'run')
     def test_update_recovery_config(self, run, recovery_exists, db_exists):
         cases = dict(
@@ -1075,7 +1078,7 @@ class StreamingReplicatedPostgresqlContainerTestCase(unittest.TestCase):
         container.update_recovery_config()
 
     @mock.patch.object(postgres.PostgresqlContainer, 'db_exists', return_value=True)
-    @mock.patch.object(files, 'exists', return_value=True)
+    @mock.patch.object(fabricio, 'exists', return_value=True)
     def test_update_fails_when_master_not_found_and_promotion_disabled(self, *args):
         class AbortException(Exception):
             pass
@@ -1187,7 +1190,7 @@ class StreamingReplicatedPostgresqlContainerTestCase(unittest.TestCase):
 
     @mock.patch.object(postgres.PostgresqlContainer, 'update', return_value=False)
     @mock.patch.object(postgres.PostgresqlContainer, 'reload')
-    @mock.patch.object(Event, 'clear')
+    @mock.patch.object(utils.SharedEvent, 'clear')
     @mock.patch.object(postgres.StreamingReplicatedPostgresqlContainer, 'update_recovery_config', return_value=True)
     def test_update_set_exception_info_if_any_happens(self, *args):
         exception = Exception('error')
@@ -1217,3 +1220,28 @@ class StreamingReplicatedPostgresqlContainerTestCase(unittest.TestCase):
                         )
                         self.assertFalse(container.master_obtained.is_set())
                         container.multiprocessing_data.exception = None
+
+    @mock.patch.object(postgres.PostgresqlContainer, 'update', return_value=True)
+    @mock.patch.object(postgres.PostgresqlContainer, 'migrate')
+    @mock.patch.object(postgres.StreamingReplicatedPostgresqlContainer, 'update_recovery_config', return_value=False)
+    def test_deploy_starts_no_processes(self, update_recovery_config, *args):
+        process_start = mock.Mock(side_effect=multiprocessing.process.BaseProcess.start)
+        fork = mock.Mock(side_effect=os.fork)
+        container = postgres.StreamingReplicatedPostgresqlContainer(
+            name='name', options=dict(volume='/data:/data'),
+        )
+        tasks_list = tasks.DockerTasks(
+            service=container,
+            executor='threads',
+            hosts=['host1', 'host2', 'host3'],
+        )
+        with mock.patch.object(multiprocessing.process.BaseProcess, 'start', new=process_start):
+            with mock.patch.object(os, 'fork', new=fork):
+                with fab.settings(parallel=True):
+                    fab.execute(tasks_list.deploy)
+        self.assertEqual(3, update_recovery_config.call_count)
+        self.assertEqual(0, process_start.call_count)
+        self.assertEqual(0, fork.call_count)
+        self.assertListEqual([], multiprocessing.active_children())
+        self.assertEqual(0, len(container.instances))
+        self.assertFalse(container.master_obtained.is_set())
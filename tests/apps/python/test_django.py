@@ -9,8 +9,7 @@ import fabricio
 
 from fabricio.apps.python.django import *
 from fabricio.docker.service import ManagedService
-from tests import SucceededResult, docker_run_args_parser, args_parser, \
-    docker_inspect_args_parser
+from tests import SucceededResult, docker_run_args_parser, args_parser
 
 
 class DjangoContainerTestCase(unittest.TestCase):
@@ -295,7 +294,7 @@ class DjangoContainerTestCase(unittest.TestCase):
                     docker_run_args_parser,
                 ],
                 expected_args=[
-                    dict(args=['docker', 'inspect', '--type', 'container', 'name']),
+                    dict(args=['docker', 'inspect', '--type', 'container', 'name', '--format', '\'[{"Image":{{json', ".Image}}}]'"]),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -305,7 +304,7 @@ class DjangoContainerTestCase(unittest.TestCase):
                         'image': 'current_image_id',
                         'command': ['python', 'manage.py', 'showmigrations', '--plan', '|', 'egrep', "'^\\[X\\]'", '|', 'awk', "'{print", "$2}'", '&&', 'test', '${PIPESTATUS[0]}', '-eq', '0'],
                     },
-                    dict(args=['docker', 'inspect', '--type', 'container', 'name_backup']),
+                    dict(args=['docker', 'inspect', '--type', 'container', 'name_backup', '--format', '\'[{"Image":{{json', ".Image}}}]'"]),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -572,7 +571,7 @@ class DjangoContainerTestCase(unittest.TestCase):
                     docker_run_args_parser,
                 ],
                 expected_args=[
-                    dict(args=['docker', 'inspect', '--type', 'container', 'name']),
+                    dict(args=['docker', 'inspect', '--type', 'container', 'name', '--format', '\'[{"Image":{{json', ".Image}}}]'"]),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -582,7 +581,7 @@ class DjangoContainerTestCase(unittest.TestCase):
                         'image': 'current_image_id',
                         'command': ['python', 'manage.py', 'showmigrations', '--plan', '|', 'egrep', "'^\\[X\\]'", '|', 'awk', "'{print", "$2}'", '&&', 'test', '${PIPESTATUS[0]}', '-eq', '0'],
                     },
-                    dict(args=['docker', 'inspect', '--type', 'container', 'name_backup']),
+                    dict(args=['docker', 'inspect', '--type', 'container', 'name_backup', '--format', '\'[{"Image":{{json', ".Image}}}]'"]),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -772,7 +771,7 @@ class DjangoContainerTestCase(unittest.TestCase):
                     docker_run_args_parser,
                 ],
                 expected_args=[
-                    dict(args=['docker', 'inspect', '--type', 'container', 'name']),
+                    dict(args=['docker', 'inspect', '--type', 'container', 'name', '--format', '\'[{"Image":{{json', ".Image}}}]'"]),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -782,7 +781,7 @@ class DjangoContainerTestCase(unittest.TestCase):
                         'image': 'current_image_id',
                         'command': ['python', 'manage.py', 'showmigrations', '--plan', '|', 'egrep', "'^\\[X\\]'", '|', 'awk', "'{print", "$2}'", '&&', 'test', '${PIPESTATUS[0]}', '-eq', '0'],
                     },
-                    dict(args=['docker', 'inspect', '--type', 'container', 'name_backup']),
+                    dict(args=['docker', 'inspect', '--type', 'container', 'name_backup', '--format', '\'[{"Image":{{json', ".Image}}}]'"]),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -1122,7 +1121,7 @@ class DjangoContainerTestCase(unittest.TestCase):
                     SucceededResult(),
                 ),
                 expected_args=[
-                    dict(args=['docker', 'inspect', '--type', 'container', 'name']),
+                    dict(args=['docker', 'inspect', '--type', 'container', 'name', '--format', '\'[{"Image":{{json', ".Image}}}]'"]),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -1139,7 +1138,7 @@ class DjangoContainerTestCase(unittest.TestCase):
                         'image': 'current_image_id',
                         'command': ['python', 'manage.py', 'showmigrations', '--plan', '|', 'egrep', "'^\\[X\\]'", '|', 'awk', "'{print", "$2}'", '&&', 'test', '${PIPESTATUS[0]}', '-eq', '0'],
                     },
-                    dict(args=['docker', 'inspect', '--type', 'container', 'name_backup']),
+                    dict(args=['docker', 'inspect', '--type', 'container', 'name_backup', '--format', '\'[{"Image":{{json', ".Image}}}]'"]),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -1634,14 +1633,10 @@ class DjangoContainerTestCase(unittest.TestCase):
                     fabricio.Error(),
                 ),
                 args_parsers=[
-                    docker_inspect_args_parser,
+                    args_parser,
                 ],
                 expected_args=[
-                    {
-                        'executable': ['docker', 'inspect'],
-                        'type': 'container',
-                        'image_or_container': 'name',
-                    },
+                    dict(args=['docker', 'inspect', '--type', 'container', 'name', '--format', '\'[{"Image":{{json', ".Image}}}]'"]),
                 ],
             ),
             backup_container_not_found=dict(
@@ -1654,16 +1649,12 @@ class DjangoContainerTestCase(unittest.TestCase):
                     fabricio.Error(),
                 ),
                 args_parsers=[
-                    docker_inspect_args_parser,
+                    args_parser,
                     docker_run_args_parser,
-                    docker_inspect_args_parser,
+                    args_parser,
                 ],
                 expected_args=[
-                    {
-                        'executable': ['docker', 'inspect'],
-                        'type': 'container',
-                        'image_or_container': 'name',
-                    },
+                    dict(args=['docker', 'inspect', '--type', 'container', 'name', '--format', '\'[{"Image":{{json', ".Image}}}]'"]),
                     {
                         'executable': ['docker'],
                         'run_or_create': ['run'],
@@ -1673,11 +1664,7 @@ class DjangoContainerTestCase(unittest.TestCase):
                         'image': 'current_image_id',
                         'command': ['python', 'manage.py', 'showmigrations', '--plan', '|', 'egrep', "'^\\[X\\]'", '|', 'awk', "'{print", "$2}'", '&&', 'test', '${PIPESTATUS[0]}', '-eq', '0'],
                     },
-                    {
-                        'executable': ['docker', 'inspect'],
-                        'type': 'container',
-                        'image_or_container': 'name_backup',
-                    },
+                    dict(args=['docker', 'inspect', '--type', 'container', 'name_backup', '--format', '\'[{"Image":{{json', ".Image}}}]'"]),
                 ],
             ),
         )
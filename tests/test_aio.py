@@ -0,0 +1,196 @@
+import sys
+import threading
+
+import mock
+import unittest2 as unittest
+
+from fabric import api as fab
+from fabric.exceptions import NetworkError
+
+import fabricio
+
+from fabricio import docker, ssh
+
+if sys.version_info >= (3, 5):
+    import asyncio
+
+    from fabricio import aio
+else:  # pragma: no cover
+    aio = None
+
+
+def done(result):
+    future = asyncio.get_event_loop().create_future()
+    future.set_result(result)
+    return future
+
+
+class FakeSubprocess(object):
+
+    def __init__(self, status=0, stdout=b'', master_status=None):
+        self.status = status
+        self.stdout = stdout
+        self.master_status = master_status
+        self.master_kwargs = None
+        self.commands = []
+
+    def __call__(self, *args, **kwargs):
+        stderr = b''
+        if '-O' in args:
+            # master connection check
+            status = 0 if self.master_status is None else 255
+            stdout = b''
+        elif '-M' in args:
+            status, stdout = self.master_status, b''
+            self.master_kwargs = kwargs
+            if status:
+                kwargs['stderr'].write(b'Permission denied (publickey).')
+        else:
+            self.commands.append((args[-2], args[-1]))
+            status, stdout = self.status, self.stdout
+        process = mock.Mock(returncode=status)
+        process.communicate.side_effect = lambda: done((stdout, stderr))
+        chunks = [stdout + stderr, b'']
+        process.stdout.read.side_effect = lambda size: done(chunks.pop(0))
+        process.wait.side_effect = lambda: done(status)
+        return done(process)
+
+
+@unittest.skipIf(aio is None, 'requires Python 3.5+')
+class AioTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fab_settings = fab.settings(fab.hide('everything', 'aborts'))
+        self.fab_settings.__enter__()
+        self.addCleanup(setattr, ssh, '_pool', None)
+        ssh._pool = None
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(asyncio.set_event_loop, None)
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+
+    def patch_subprocess(self, **kwargs):
+        subprocess = FakeSubprocess(**kwargs)
+        patcher = mock.patch.object(asyncio, 'create_subprocess_exec', subprocess)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return subprocess
+
+    def test_run(self):
+        subprocess = self.patch_subprocess(stdout=b'output\n')
+        result = self.loop.run_until_complete(
+            aio.run('command', host_string='user@host'),
+        )
+        self.assertEqual('output', result)
+        self.assertTrue(result.succeeded)
+        self.assertListEqual(
+            [('host', '/bin/bash -l -c "command"')],
+            subprocess.commands,
+        )
+        self.assertIn('user@host', ssh._pool.connect_times)
+
+    def test_run_failed(self):
+        self.patch_subprocess(status=1)
+        with self.assertRaises(fabricio.Error):
+            self.loop.run_until_complete(aio.run('command', host_string='host'))
+        result = self.loop.run_until_complete(
+            aio.run('command', host_string='host', ignore_errors=True),
+        )
+        self.assertTrue(result.failed)
+        self.assertEqual(1, result.return_code)
+
+    def test_pull_image(self):
+        subprocess = self.patch_subprocess()
+        self.loop.run_until_complete(
+            aio.pull_image(docker.Image('image:tag'), host_string='host'),
+        )
+        self.assertListEqual(
+            [
+                'docker tag image:tag fabricio-temp-image:image '
+                '&& docker rmi image:tag',
+                'docker pull image:tag',
+                'docker rmi fabricio-temp-image:image',
+            ],
+            [
+                command[len('/bin/bash -l -c "'):-1]
+                for host, command in subprocess.commands
+            ],
+        )
+
+    def test_run_connection_failed(self):
+        subprocess = self.patch_subprocess(master_status=255)
+        with self.assertRaises(NetworkError) as context:
+            self.loop.run_until_complete(
+                aio.run('command', host_string='user@host'),
+            )
+        self.assertIn('Permission denied', str(context.exception))
+        self.assertListEqual([], subprocess.commands)
+        # background master must not hold pipes being read
+        self.assertEqual(
+            asyncio.subprocess.DEVNULL,
+            subprocess.master_kwargs['stdout'],
+        )
+        self.assertNotIn('user@host', ssh._pool.connect_times)
+
+    def test_update_uses_own_env_for_each_host(self):
+        subprocess = self.patch_subprocess()
+
+        class Service(object):
+
+            @staticmethod
+            def update(**kwargs):
+                fabricio.run('command')
+                return fab.env.host, kwargs['tag']
+
+        host = fab.env.host
+        results = self.loop.run_until_complete(asyncio.gather(
+            aio.update(Service(), tag='tag', host_string='host1'),
+            aio.update(Service(), tag='tag', host_string='host2'),
+        ))
+        self.assertListEqual([('host1', 'tag'), ('host2', 'tag')], results)
+        self.assertListEqual(
+            [
+                ('host1', '/bin/bash -l -c "command"'),
+                ('host2', '/bin/bash -l -c "command"'),
+            ],
+            sorted(subprocess.commands),
+        )
+        self.assertEqual(host, fab.env.host)
+
+    def test_executor(self):
+        self.patch_subprocess()
+
+        @fab.task
+        def task(fail_host=None):
+            if fab.env.host == fail_host:
+                raise fabricio.Error('error')
+            fabricio.run('command')
+            return fab.env.host, len(fab.env.all_hosts)
+
+        executor = aio.Executor(concurrency=1)
+        self.assertDictEqual(
+            {'host1': ('host1', 2), 'host2': ('host2', 2)},
+            executor(task, hosts=['host1', 'host2']),
+        )
+        with self.assertRaises(SystemExit):
+            executor(task, hosts=['host1', 'host2'], fail_host='host2')
+
+    def test_executor_threads_are_bounded(self):
+        self.patch_subprocess()
+
+        @fab.task
+        def task():
+            fabricio.run('command')
+            return threading.current_thread().ident
+
+        hosts = ['host{0}'.format(n) for n in range(aio.max_concurrency * 2)]
+        results = aio.Executor()(task, hosts=hosts)
+        self.assertEqual(len(hosts), len(results))
+        self.assertLessEqual(len(set(results.values())), aio.max_concurrency)
+        with fab.settings(pool_size=2):
+            results = aio.Executor()(task, hosts=hosts)
+        self.assertLessEqual(len(set(results.values())), 2)
+
@@ -0,0 +1,261 @@
+import os
+import shutil
+import tempfile
+
+import mock
+import unittest2 as unittest
+
+from fabric import api as fab
+
+import fabricio
+
+from fabricio import docker
+from fabricio import cache as fabricio_cache
+from fabricio.cache import Cache, PersistentCache, make_key
+from tests import SucceededResult
+
+
+class CacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.cache = Cache(timer=lambda: self.now)
+        self.fab_settings = fab.settings(fab.hide('everything'))
+        self.fab_settings.__enter__()
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+
+    def test_get_and_set(self):
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('key', 'value')
+        self.assertEqual('value', self.cache.get('key'))
+        self.assertIn('key', self.cache)
+        self.assertDictEqual(
+            dict(hits=1, misses=1, evictions=0, size=1),
+            dict(self.cache.stats),
+        )
+
+    def test_max_size(self):
+        self.cache.max_size = 2
+        self.cache.set('key1', 'value1')
+        self.cache.set('key2', 'value2')
+        self.cache.get('key1')  # key1 becomes recently used
+        self.cache.set('key3', 'value3')
+        self.assertIn('key1', self.cache)
+        self.assertNotIn('key2', self.cache)
+        self.assertIn('key3', self.cache)
+        self.assertEqual(1, self.cache.evictions)
+
+    def test_ttl(self):
+        self.cache.ttl = 10
+        self.cache.set('key', 'value')
+        self.now = 10
+        self.assertEqual('value', self.cache.get('key'))
+        self.now = 11
+        self.assertNotIn('key', self.cache)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(1, self.cache.evictions)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_entry_ttl(self):
+        self.cache.set('key1', 'value1', ttl=10)
+        self.cache.set('key2', 'value2')
+        self.now = 11
+        self.assertNotIn('key1', self.cache)
+        self.assertIsNone(self.cache.get('key1'))
+        self.assertEqual('value2', self.cache.get('key2'))
+        self.cache.ttl = 5
+        self.cache.set('key3', 'value3', ttl=10)
+        self.now = 17
+        self.assertNotIn('key3', self.cache)
+
+    def test_invalidate(self):
+        cases = dict(
+            all=dict(
+                kwargs=dict(),
+                expected_keys=[],
+            ),
+            host=dict(
+                kwargs=dict(host='host1'),
+                expected_keys=['key3', 'key4'],
+            ),
+            prefix=dict(
+                kwargs=dict(prefix='docker inspect'),
+                expected_keys=['key2', 'key4'],
+            ),
+            host_and_prefix=dict(
+                kwargs=dict(host='host1', prefix='docker inspect'),
+                expected_keys=['key2', 'key3', 'key4'],
+            ),
+            local=dict(
+                kwargs=dict(host=None),
+                expected_keys=['key1', 'key2', 'key3'],
+            ),
+            host_and_command=dict(
+                kwargs=dict(host='host1', command='docker inspect a'),
+                expected_keys=['key2', 'key3', 'key4'],
+            ),
+            image=dict(
+                kwargs=dict(image='a'),
+                expected_keys=[],
+            ),
+            host_and_image=dict(
+                kwargs=dict(host='host1', image='a'),
+                expected_keys=['key3', 'key4'],
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                cache = Cache()
+                cache.set('key1', 1, host='host1', command='docker inspect a')
+                cache.set('key2', 2, host='host1', command='docker pull a')
+                cache.set('key3', 3, host='host2', command='docker inspect a')
+                cache.set('key4', 4, command='docker push a')
+                removed = cache.invalidate(**data['kwargs'])
+                self.assertListEqual(data['expected_keys'], list(cache.entries))
+                self.assertEqual(4 - len(data['expected_keys']), removed)
+
+    @mock.patch.dict(fab.env, dict(host='host'))
+    def test_run_uses_cache(self):
+        self.addCleanup(fabricio.run.cache.clear)
+        with mock.patch.object(fab, 'run', return_value=SucceededResult('result')) as run:
+            run.__name__ = 'mocked_run'
+            fabricio.run('command', use_cache=True)
+            self.assertIn(
+                make_key('command', host='host'),
+                fabricio.run.cache,
+            )
+            fabricio.run.cache.invalidate(host='host', prefix='command')
+            fabricio.run('command', use_cache=True)
+            self.assertEqual(2, run.call_count)
+
+    @mock.patch.dict(fab.env, dict(host='host'))
+    def test_service_update_invalidates_service_inspect(self):
+        self.addCleanup(fabricio.run.cache.clear)
+        fabricio.run.cache.set('inspect', 1, host='host', command='docker service inspect service')
+        fabricio.run.cache.set('other_host', 2, host='host2', command='docker service inspect service')
+        fabricio.run.cache.set('image', 3, host='host', command='docker inspect image')
+        with mock.patch.object(fabricio, 'run'):
+            docker.Service(name='service')._update_service(options='')
+        self.assertListEqual(['other_host', 'image'], list(fabricio.run.cache.entries))
+
+
+class PersistentCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_cache(self, namespace='run', **kwargs):
+        return PersistentCache(
+            self.path,
+            namespace=namespace,
+            timer=lambda: self.now,
+            **kwargs
+        )
+
+    def test_entries_shared_between_instances(self):
+        result = SucceededResult('output')
+        result.stderr = 'error'
+        result.return_code = 0
+        self.make_cache().set(b'key', result, host='host', command='command')
+
+        cache = self.make_cache()
+        self.assertIn(b'key', cache)
+        cached_result = cache.get(b'key')
+        self.assertEqual('output', cached_result)
+        self.assertEqual('error', cached_result.stderr)
+        self.assertEqual(0, cached_result.return_code)
+        self.assertTrue(cached_result.succeeded)
+        self.assertFalse(cached_result.failed)
+
+        self.assertNotIn(b'key', self.make_cache(namespace='local'))
+
+    def test_ttl(self):
+        self.make_cache(ttl=10).set(b'key', 'value')
+        self.now = 11
+        self.assertIsNone(self.make_cache(ttl=10).get(b'key'))
+        self.assertEqual('value', self.make_cache().get(b'key'))
+
+    def test_entry_ttl(self):
+        self.make_cache().set(b'key1', 'value1', ttl=10)
+        self.make_cache().set(b'key2', 'value2')
+        self.now = 11
+        cache = self.make_cache()
+        self.assertIsNone(cache.get(b'key1'))
+        self.assertEqual('value2', cache.get(b'key2'))
+        cache.set(b'key3', 'value3')  # expired entries are removed from disk
+        count = cache.connection.execute('SELECT count(*) FROM cache').fetchone()  # noqa
+        self.assertEqual((2, ), count)
+
+    def test_database_of_previous_version(self):
+        import sqlite3
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            'CREATE TABLE cache (namespace TEXT, key TEXT, host TEXT, '
+            'command TEXT, timestamp REAL, value TEXT, '
+            'PRIMARY KEY (namespace, key))'
+        )
+        connection.commit()
+        connection.close()
+        self.make_cache().set(b'key', 'value', ttl=10)
+        self.assertEqual('value', self.make_cache().get(b'key'))
+        self.now = 11
+        self.assertIsNone(self.make_cache().get(b'key'))
+
+    def test_invalidate(self):
+        cases = dict(
+            host=dict(
+                kwargs=dict(host='host1'),
+                expected_keys=[b'key3', b'key4'],
+            ),
+            prefix=dict(
+                kwargs=dict(prefix='docker inspect'),
+                expected_keys=[b'key2', b'key4'],
+            ),
+            contains=dict(
+                kwargs=dict(contains='image'),
+                expected_keys=[b'key2', b'key3'],
+            ),
+            image=dict(
+                kwargs=dict(image='a'),
+                expected_keys=[b'key1', b'key4'],
+            ),
+            local=dict(
+                kwargs=dict(host=None),
+                expected_keys=[b'key1', b'key2', b'key3'],
+            ),
+            command=dict(
+                kwargs=dict(command='docker inspect a'),
+                expected_keys=[b'key1', b'key2', b'key4'],
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                cache = self.make_cache()
+                cache.clear()
+                cache.set(b'key1', 1, host='host1', command='docker inspect image')
+                cache.set(b'key2', 2, host='host1', command='docker pull a')
+                cache.set(b'key3', 3, host='host2', command='docker inspect a')
+                cache.set(b'key4', 4, command='docker push image')
+                cache.invalidate(**data['kwargs'])
+                cache = self.make_cache()
+                self.assertListEqual(
+                    data['expected_keys'],
+                    [key for key in (b'key1', b'key2', b'key3', b'key4') if key in cache],
+                )
+
+    def test_persist(self):
+        run_cache, local_cache = fabricio.run.cache, fabricio.local.cache
+        self.addCleanup(setattr, fabricio.operations.run, 'cache', run_cache)
+        self.addCleanup(setattr, fabricio.operations.local, 'cache', local_cache)
+        fabricio_cache.persist(self.path, ttl=60)
+        for command in (fabricio.run, fabricio.local):
+            self.assertIsInstance(command.cache, PersistentCache)
+            self.assertEqual(self.path, command.cache.path)
+            self.assertEqual(60, command.cache.ttl)
@@ -1,3 +1,5 @@
+import multiprocessing
+
 import mock
 import unittest2 as unittest
 
@@ -76,3 +78,43 @@ class DecoratorsTestCase(unittest.TestCase):
         method.reset()
         self.assertFalse(method.has_result())
         self.assertFalse(method.wait(0))
+
+    @mock.patch.object(multiprocessing, 'Manager')
+    def test_once_per_task_starts_no_processes(self, manager):
+        method = fabricio.once_per_task(lambda: 'result')
+        with fab.settings(command='command'):
+            self.assertEqual('result', method())
+            self.assertTrue(method.has_result())
+        manager.assert_not_called()
+
+    def test_once_per_task_keeps_result_of_last_task_only(self):
+        real_method = mock.Mock(side_effect=['result1', 'result2'])
+        method = fabricio.once_per_task(real_method)
+        with fab.settings(command='task1'):
+            self.assertEqual('result1', method())
+            self.assertEqual('result1', method())
+            self.assertTrue(method.has_result())
+        with fab.settings(command='task2'):
+            self.assertFalse(method.has_result())
+            self.assertEqual('result2', method())
+        with fab.settings(command='task1'):
+            self.assertFalse(method.has_result())
+
+    def test_once_per_task_processes(self):
+        counter = multiprocessing.Value('i', 0)
+
+        def real_method():
+            with counter.get_lock():
+                counter.value += 1
+
+        method = fabricio.once_per_task(real_method, block=True)
+        with fab.settings(command='processes'):
+            workers = [
+                multiprocessing.Process(target=method) for _ in range(3)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            method()
+        self.assertEqual(1, counter.value)
@@ -1,6 +1,11 @@
 # coding: utf-8
+import copy
+import gc
 import json
+import multiprocessing
 import shlex
+import subprocess
+import time
 
 from collections import OrderedDict
 
@@ -11,12 +16,14 @@ from fabric import api as fab
 
 import fabricio
 
-from fabricio import docker
+from fabricio import docker, executors
+from fabricio.apps.db.postgres import StreamingReplicatedPostgresqlContainer
 from fabricio.docker.container import Option, Attribute
 from tests import SucceededResult, docker_run_args_parser, \
     docker_service_update_args_parser, \
     docker_entity_inspect_args_parser, docker_inspect_args_parser, \
-    docker_service_create_args_parser, args_parser, Command, FailedResult
+    docker_service_create_args_parser, args_parser, Command, FailedResult, \
+    inspect_all_call, inspect_all_result
 
 
 class TestContainer(docker.Container):
@@ -28,6 +35,9 @@ class ContainerTestCase(unittest.TestCase):
 
     maxDiff = None
 
+    def setUp(self):
+        self.addCleanup(docker.inspection.clear)
+
     def test_options(self):
         cases = dict(
             default=dict(
@@ -284,7 +294,7 @@ class ContainerTestCase(unittest.TestCase):
             with_image=dict(
                 delete_kwargs=dict(delete_image=True),
                 expected_commands=[
-                    mock.call('docker inspect --type container name', abort_exception=docker.ContainerNotFoundError),
+                    mock.call('docker inspect --type container name --format \'[{"Image":{{json .Image}}}]\'', abort_exception=docker.ContainerNotFoundError),
                     mock.call('docker rm --volumes name'),
                     mock.call('docker rmi image_id', ignore_errors=True),
                 ],
@@ -310,7 +320,7 @@ class ContainerTestCase(unittest.TestCase):
             complex=dict(
                 delete_kwargs=dict(force=True, delete_image=True),
                 expected_commands=[
-                    mock.call('docker inspect --type container name', abort_exception=docker.ContainerNotFoundError),
+                    mock.call('docker inspect --type container name --format \'[{"Image":{{json .Image}}}]\'', abort_exception=docker.ContainerNotFoundError),
                     mock.call('docker rm --force --volumes name'),
                     mock.call('docker rmi image_id', ignore_errors=True),
                 ],
@@ -724,13 +734,19 @@ class ContainerTestCase(unittest.TestCase):
         cases = dict(
             no_change=dict(
                 side_effect=(
-                    SucceededResult('[{"Image": "image_id"}]'),  # current container info
-                    SucceededResult('[{"Id": "image_id"}]'),  # new image info
+                    inspect_all_result(
+                        ('[{"Image": "image_id"}]', 0),  # current container info
+                        ('[{"Id": "image_id"}]', 0),  # new image info
+                        ('', 1),  # obsolete container info
+                    ),
                     SucceededResult(),  # force starting container
                 ),
                 expected_commands=[
-                    mock.call('docker inspect --type container name', abort_exception=docker.ContainerNotFoundError),
-                    mock.call('docker inspect --type image image:tag', abort_exception=docker.ImageNotFoundError),
+                    inspect_all_call(
+                        'docker inspect --type container name',
+                        'docker inspect --type image image:tag',
+                        'docker inspect --type container name_backup',
+                    ),
                     mock.call('docker start name'),
                 ],
                 update_kwargs=dict(),
@@ -738,13 +754,19 @@ class ContainerTestCase(unittest.TestCase):
             ),
             no_change_with_tag=dict(
                 side_effect=(
-                    SucceededResult('[{"Image": "image_id"}]'),  # current container info
-                    SucceededResult('[{"Id": "image_id"}]'),  # new image info
+                    inspect_all_result(
+                        ('[{"Image": "image_id"}]', 0),  # current container info
+                        ('[{"Id": "image_id"}]', 0),  # new image info
+                        ('', 1),  # obsolete container info
+                    ),
                     SucceededResult(),  # force starting container
                 ),
                 expected_commands=[
-                    mock.call('docker inspect --type container name', abort_exception=docker.ContainerNotFoundError),
-                    mock.call('docker inspect --type image image:foo', abort_exception=docker.ImageNotFoundError),
+                    inspect_all_call(
+                        'docker inspect --type container name',
+                        'docker inspect --type image image:foo',
+                        'docker inspect --type container name_backup',
+                    ),
                     mock.call('docker start name'),
                 ],
                 update_kwargs=dict(tag='foo'),
@@ -760,7 +782,7 @@ class ContainerTestCase(unittest.TestCase):
                     SucceededResult('new_container_id'),  # run new container
                 ),
                 expected_commands=[
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    mock.call('docker inspect --type container name_backup --format \'[{"Image":{{json .Image}}}]\'', abort_exception=docker.ContainerNotFoundError),
                     mock.call('docker rm --volumes name_backup'),
                     mock.call('docker rmi image_id', ignore_errors=True),
                     mock.call('docker rename name name_backup'),
@@ -779,9 +801,11 @@ class ContainerTestCase(unittest.TestCase):
             ),
             regular=dict(
                 side_effect=(
-                    SucceededResult('[{"Image": "image_id"}]'),  # current container info
-                    SucceededResult('[{"Id": "new_image_id"}]'),  # new image info
-                    SucceededResult('[{"Image": "old_image_id"}]'),  # obsolete container info
+                    inspect_all_result(
+                        ('[{"Image": "image_id"}]', 0),  # current container info
+                        ('[{"Id": "new_image_id"}]', 0),  # new image info
+                        ('[{"Image": "old_image_id"}]', 0),  # obsolete container info
+                    ),
                     SucceededResult(),  # delete obsolete container
                     SucceededResult(),  # delete obsolete container image
                     SucceededResult(),  # rename current container
@@ -789,9 +813,11 @@ class ContainerTestCase(unittest.TestCase):
                     SucceededResult('new_container_id'),  # run new container
                 ),
                 expected_commands=[
-                    mock.call('docker inspect --type container name', abort_exception=docker.ContainerNotFoundError),
-                    mock.call('docker inspect --type image image:tag', abort_exception=docker.ImageNotFoundError),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    inspect_all_call(
+                        'docker inspect --type container name',
+                        'docker inspect --type image image:tag',
+                        'docker inspect --type container name_backup',
+                    ),
                     mock.call('docker rm --volumes name_backup'),
                     mock.call('docker rmi old_image_id', ignore_errors=True),
                     mock.call('docker rename name name_backup'),
@@ -810,9 +836,11 @@ class ContainerTestCase(unittest.TestCase):
             ),
             regular_with_tag=dict(
                 side_effect=(
-                    SucceededResult('[{"Image": "image_id"}]'),  # current container info
-                    SucceededResult('[{"Id": "new_image_id"}]'),  # new image info
-                    SucceededResult('[{"Image": "old_image_id"}]'),  # obsolete container info
+                    inspect_all_result(
+                        ('[{"Image": "image_id"}]', 0),  # current container info
+                        ('[{"Id": "new_image_id"}]', 0),  # new image info
+                        ('[{"Image": "old_image_id"}]', 0),  # obsolete container info
+                    ),
                     SucceededResult(),  # delete obsolete container
                     SucceededResult(),  # delete obsolete container image
                     SucceededResult(),  # rename current container
@@ -820,9 +848,11 @@ class ContainerTestCase(unittest.TestCase):
                     SucceededResult('new_container_id'),  # run new container
                 ),
                 expected_commands=[
-                    mock.call('docker inspect --type container name', abort_exception=docker.ContainerNotFoundError),
-                    mock.call('docker inspect --type image image:foo', abort_exception=docker.ImageNotFoundError),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    inspect_all_call(
+                        'docker inspect --type container name',
+                        'docker inspect --type image image:foo',
+                        'docker inspect --type container name_backup',
+                    ),
                     mock.call('docker rm --volumes name_backup'),
                     mock.call('docker rmi old_image_id', ignore_errors=True),
                     mock.call('docker rename name name_backup'),
@@ -841,9 +871,11 @@ class ContainerTestCase(unittest.TestCase):
             ),
             regular_with_registry=dict(
                 side_effect=(
-                    SucceededResult('[{"Image": "image_id"}]'),  # current container info
-                    SucceededResult('[{"Id": "new_image_id"}]'),  # new image info
-                    SucceededResult('[{"Image": "old_image_id"}]'),  # obsolete container info
+                    inspect_all_result(
+                        ('[{"Image": "image_id"}]', 0),  # current container info
+                        ('[{"Id": "new_image_id"}]', 0),  # new image info
+                        ('[{"Image": "old_image_id"}]', 0),  # obsolete container info
+                    ),
                     SucceededResult(),  # delete obsolete container
                     SucceededResult(),  # delete obsolete container image
                     SucceededResult(),  # rename current container
@@ -851,9 +883,11 @@ class ContainerTestCase(unittest.TestCase):
                     SucceededResult('new_container_id'),  # run new container
                 ),
                 expected_commands=[
-                    mock.call('docker inspect --type container name', abort_exception=docker.ContainerNotFoundError),
-                    mock.call('docker inspect --type image registry/image:tag', abort_exception=docker.ImageNotFoundError),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    inspect_all_call(
+                        'docker inspect --type container name',
+                        'docker inspect --type image registry/image:tag',
+                        'docker inspect --type container name_backup',
+                    ),
                     mock.call('docker rm --volumes name_backup'),
                     mock.call('docker rmi old_image_id', ignore_errors=True),
                     mock.call('docker rename name name_backup'),
@@ -872,9 +906,11 @@ class ContainerTestCase(unittest.TestCase):
             ),
             regular_complex=dict(  # TODO add more options
                 side_effect=(
-                    SucceededResult('[{"Image": "image_id"}]'),  # current container info
-                    SucceededResult('[{"Id": "new_image_id"}]'),  # new image info
-                    SucceededResult('[{"Image": "old_image_id"}]'),  # obsolete container info
+                    inspect_all_result(
+                        ('[{"Image": "image_id"}]', 0),  # current container info
+                        ('[{"Id": "new_image_id"}]', 0),  # new image info
+                        ('[{"Image": "old_image_id"}]', 0),  # obsolete container info
+                    ),
                     SucceededResult(),  # delete obsolete container
                     SucceededResult(),  # delete obsolete container image
                     SucceededResult(),  # rename current container
@@ -882,9 +918,11 @@ class ContainerTestCase(unittest.TestCase):
                     SucceededResult('new_container_id'),  # run new container
                 ),
                 expected_commands=[
-                    mock.call('docker inspect --type container name', abort_exception=docker.ContainerNotFoundError),
-                    mock.call('docker inspect --type image registry/account/image:foo', abort_exception=docker.ImageNotFoundError),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    inspect_all_call(
+                        'docker inspect --type container name',
+                        'docker inspect --type image registry/account/image:foo',
+                        'docker inspect --type container name_backup',
+                    ),
                     mock.call('docker rm --volumes name_backup'),
                     mock.call('docker rmi old_image_id', ignore_errors=True),
                     mock.call('docker rename name name_backup'),
@@ -903,17 +941,21 @@ class ContainerTestCase(unittest.TestCase):
             ),
             regular_without_backup_container=dict(
                 side_effect=(
-                    SucceededResult('[{"Image": "image_id"}]'),  # current container info
-                    SucceededResult('[{"Id": "new_image_id"}]'),  # new image info
-                    docker.ContainerNotFoundError,  # obsolete container info
+                    inspect_all_result(
+                        ('[{"Image": "image_id"}]', 0),  # current container info
+                        ('[{"Id": "new_image_id"}]', 0),  # new image info
+                        ('', 1),  # obsolete container info
+                    ),
                     SucceededResult(),  # rename current container
                     SucceededResult(),  # stop current container
                     SucceededResult('new_container_id'),  # run new container
                 ),
                 expected_commands=[
-                    mock.call('docker inspect --type container name', abort_exception=docker.ContainerNotFoundError),
-                    mock.call('docker inspect --type image image:tag', abort_exception=docker.ImageNotFoundError),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    inspect_all_call(
+                        'docker inspect --type container name',
+                        'docker inspect --type image image:tag',
+                        'docker inspect --type container name_backup',
+                    ),
                     mock.call('docker rename name name_backup'),
                     mock.call('docker stop --time 10 name_backup'),
                     mock.call(Command(docker_run_args_parser, {
@@ -936,7 +978,7 @@ class ContainerTestCase(unittest.TestCase):
                     SucceededResult('new_container_id'),  # run new container
                 ),
                 expected_commands=[
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    mock.call('docker inspect --type container name_backup --format \'[{"Image":{{json .Image}}}]\'', abort_exception=docker.ContainerNotFoundError),
                     mock.call('docker rename name name_backup'),
                     mock.call('docker stop --time 10 name_backup'),
                     mock.call(Command(docker_run_args_parser, {
@@ -953,14 +995,20 @@ class ContainerTestCase(unittest.TestCase):
             ),
             from_scratch=dict(
                 side_effect=(
-                    docker.ContainerNotFoundError,  # current container info
-                    docker.ContainerNotFoundError,  # obsolete container info
+                    inspect_all_result(
+                        ('', 1),  # current container info
+                        ('[{"Id": "new_image_id"}]', 0),  # new image info
+                        ('', 1),  # obsolete container info
+                    ),
                     fabricio.Error,  # rename current container
                     SucceededResult('new_container_id'),  # run new container
                 ),
                 expected_commands=[
-                    mock.call('docker inspect --type container name', abort_exception=docker.ContainerNotFoundError),
-                    mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+                    inspect_all_call(
+                        'docker inspect --type container name',
+                        'docker inspect --type image image:tag',
+                        'docker inspect --type container name_backup',
+                    ),
                     mock.call('docker rename name name_backup'),
                     mock.call(Command(docker_run_args_parser, {
                         'executable': ['docker'],
@@ -977,6 +1025,7 @@ class ContainerTestCase(unittest.TestCase):
         )
         for case, params in cases.items():
             with self.subTest(case=case):
+                docker.inspection.clear()
                 container = TestContainer(name='name')
                 side_effect = params['side_effect']
                 expected_commands = params['expected_commands']
@@ -992,21 +1041,53 @@ class ContainerTestCase(unittest.TestCase):
                     self.assertListEqual(run.mock_calls, expected_commands)
                     self.assertEqual(excpected_result, result)
 
+    def test_update_sends_independent_commands_at_once(self):
+        batch_result = inspect_all_result(('', 0), ('', 0))
+        side_effect = (
+            inspect_all_result(
+                ('[{"Image": "image_id"}]', 0),  # current container info
+                ('[{"Id": "new_image_id"}]', 0),  # new image info
+                ('[{"Image": "old_image_id"}]', 0),  # obsolete container info
+            ),
+            batch_result,  # delete obsolete container and its image
+            SucceededResult(),  # rename current container
+            batch_result,  # stop current container and run new one
+        )
+        container = TestContainer(name='name')
+        with fab.settings(fab.hide('everything')):
+            with mock.patch.object(fab, 'run', side_effect=side_effect) as run:
+                run.__name__ = 'mocked_run'
+                self.assertTrue(container.update())
+        commands = [call[1][0] for call in run.mock_calls]
+        self.assertEqual(4, len(commands))
+        self.assertIn('docker inspect --type container name\n', commands[0])
+        self.assertIn('docker inspect --type image image:tag', commands[0])
+        self.assertIn('docker inspect --type container name_backup', commands[0])
+        self.assertIn('docker rm --volumes name_backup', commands[1])
+        self.assertIn('docker rmi old_image_id', commands[1])
+        self.assertEqual('docker rename name name_backup', commands[2])
+        self.assertIn('docker stop --time 10 name_backup', commands[3])
+        self.assertIn('docker run --name=name --detach image:tag', commands[3])
+
     def test_revert(self):
         side_effect = (
-            SucceededResult('[{"Image": "backup_image_id"}]'),  # backup container info
+            inspect_all_result(
+                ('[{"Image": "backup_image_id"}]', 0),  # backup container info
+                ('[{"Image": "failed_image_id"}]', 0),  # current container info
+            ),
             SucceededResult(),  # stop current container
             SucceededResult(),  # start backup container
-            SucceededResult('[{"Image": "failed_image_id"}]'),  # current container info
             SucceededResult(),  # delete current container
             SucceededResult(),  # delete current container image
             SucceededResult(),  # rename backup container
         )
         expected_commands = [
-            mock.call('docker inspect --type container name_backup', abort_exception=docker.ContainerNotFoundError),
+            inspect_all_call(
+                'docker inspect --type container name_backup',
+                'docker inspect --type container name',
+            ),
             mock.call('docker stop --time 10 name'),
             mock.call('docker start name_backup'),
-            mock.call('docker inspect --type container name', abort_exception=docker.ContainerNotFoundError),
             mock.call('docker rm --volumes name'),
             mock.call('docker rmi failed_image_id', ignore_errors=True),
             mock.call('docker rename name_backup name'),
@@ -1016,24 +1097,664 @@ class ContainerTestCase(unittest.TestCase):
             container.revert()
             self.assertListEqual(run.mock_calls, expected_commands)
 
-    @mock.patch.object(
-        docker.Container,
-        'info',
-        new_callable=mock.PropertyMock,
-        side_effect=docker.ContainerNotFoundError,
-    )
     @mock.patch.object(fabricio, 'run')
-    def test_revert_raises_error_if_backup_container_not_found(self, run, *args):
+    def test_revert_raises_error_if_backup_container_not_found(self, run):
+        run.return_value = inspect_all_result(
+            ('', 1),  # backup container info
+            ('[{"Image": "image_id"}]', 0),  # current container info
+        )
         container = docker.Container(name='name')
         with self.assertRaises(docker.ContainerError):
             container.revert()
-        run.assert_not_called()
+        run.assert_called_once()
+
+
+class InspectionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(docker.inspection.clear)
+
+    @mock.patch.object(fabricio, 'run')
+    def test_info_is_cached(self, run):
+        run.return_value = SucceededResult('[{"Image": "image_id"}]')
+        container = TestContainer(name='name')
+        with fab.settings(command='task1', host_string='host1'):
+            self.assertEqual('image_id', container.info['Image'])
+            self.assertEqual('image_id', container.fork().info['Image'])
+            container.info['Image'] = 'changed'  # cached result is immutable
+            self.assertEqual('image_id', str(container.image))
+            self.assertEqual(1, run.call_count)
+
+            with fabricio.batch():
+                container.stop()  # invalidates cached results
+                self.assertEqual('image_id', container.info['Image'])
+            self.assertEqual(
+                [
+                    mock.call('docker stop --time 10 name'),
+                    mock.call(
+                        'docker inspect --type container name',
+                        abort_exception=docker.ContainerNotFoundError,
+                    ),
+                ],
+                run.mock_calls[1:],
+            )
+        with fab.settings(command='task1', host_string='host2'):
+            container.info
+            self.assertEqual(4, run.call_count)
+        with fab.settings(command='task2', host_string='host1'):
+            container.info
+            self.assertEqual(5, run.call_count)
+
+    @mock.patch.object(fabricio, 'run')
+    def test_inspect_all(self, run):
+        run.return_value = inspect_all_result(
+            ('[{"Image": "image_id"}]', 0),
+            ('', 1),
+        )
+        container = TestContainer(name='name')
+        missing_container = TestContainer(name='missing')
+        with fab.settings(command='task', host_string='host'):
+            docker.inspection.inspect_all([container, missing_container])
+            docker.inspection.inspect_all([container, missing_container])
+            self.assertEqual('image_id', container.image_id)
+            with self.assertRaises(docker.ContainerNotFoundError):
+                missing_container.info
+            self.assertEqual(
+                [
+                    inspect_all_call(
+                        'docker inspect --type container name',
+                        'docker inspect --type container missing',
+                    ),
+                ],
+                run.mock_calls,
+            )
+
+            # only result of the changed container is invalidated
+            run.return_value = SucceededResult()
+            missing_container.start()
+            docker.inspection.inspect_all([container, missing_container])
+            self.assertEqual('image_id', container.image_id)
+            self.assertEqual(2, run.call_count)
+
+    @mock.patch.object(fabricio, 'run')
+    def test_inspect_all_skips_empty_output(self, run):
+        run.side_effect = [
+            inspect_all_result(('', 0), ('[{"Image": "image_id"}]', 0)),
+            SucceededResult('[{"Image": "other_image_id"}]'),
+        ]
+        container = TestContainer(name='name')
+        other_container = TestContainer(name='other')
+        with fab.settings(command='task', host_string='host'):
+            docker.inspection.inspect_all([container, other_container])
+            self.assertEqual('image_id', other_container.image_id)
+            self.assertEqual('other_image_id', container.image_id)
+        self.assertEqual(2, run.call_count)
+
+    @mock.patch.object(fabricio, 'run')
+    def test_project(self, run):
+        run.return_value = SucceededResult('[{"Image": "image_id"}]')
+        container = TestContainer(name='name')
+        with fab.settings(command='task', host_string='host'):
+            self.assertEqual('image_id', container.image_id)
+            self.assertEqual('image_id', container.fork().image_id)
+            container.info  # full result is requested separately
+            container.stop()  # invalidates both results
+            run.return_value = SucceededResult('[{"Image": "new_image_id"}]')
+            container.info
+            self.assertEqual('new_image_id', container.image_id)
+        self.assertEqual(
+            [
+                mock.call(
+                    'docker inspect --type container name '
+                    '--format \'[{"Image":{{json .Image}}}]\'',
+                    abort_exception=docker.ContainerNotFoundError,
+                ),
+                mock.call(
+                    'docker inspect --type container name',
+                    abort_exception=docker.ContainerNotFoundError,
+                ),
+                mock.call('docker stop --time 10 name'),
+                mock.call(
+                    'docker inspect --type container name',
+                    abort_exception=docker.ContainerNotFoundError,
+                ),
+            ],
+            run.mock_calls,
+        )
+
+    def test_make_template(self):
+        cases = dict(
+            field=dict(
+                fields=['Image'],
+                expected_template='[{"Image":{{json .Image}}}]',
+            ),
+            nested_fields=dict(
+                fields=['Config.Labels', 'Config.Env', 'Parent'],
+                expected_template='[{"Config":{"Labels":{{json .Config.Labels}},"Env":{{json .Config.Env}}},"Parent":{{json .Parent}}}]',
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                template = docker.inspection.make_template(data['fields'])
+                self.assertEqual(data['expected_template'], template)
+
+    def test_prune(self):
+        info = {
+            'Id': 'id',
+            'Parent': 'parent',
+            'Config': {'Labels': {'label': 'value'}, 'Env': ['FOO=bar']},
+        }
+        self.assertEqual(
+            {
+                'Parent': 'parent',
+                'Config': {'Labels': {'label': 'value'}},
+                'Spec': {'Labels': None},
+            },
+            docker.inspection.prune(info, ['Parent', 'Config.Labels', 'Spec.Labels']),
+        )
+
+    def test_projection_of_big_service(self):
+        spec = {
+            'Name': 'service',
+            'Labels': {'fabricio.service.options': 'options'},
+            'TaskTemplate': {'ContainerSpec': {
+                'Image': 'image@sha256:' + '0' * 64,
+                'Env': ['VARIABLE_{0}=value'.format(n) for n in range(200)],
+                'Mounts': [
+                    {'Type': 'volume', 'Source': 'volume', 'Target': '/%d' % n}
+                    for n in range(100)
+                ],
+            }},
+        }
+        info = json.dumps([{
+            'ID': 'id',
+            'Spec': spec,
+            'PreviousSpec': spec,
+            'Endpoint': {'Ports': [
+                {'TargetPort': n, 'PublishedPort': n} for n in range(100)
+            ]},
+        }])
+        fields = ['Spec.Labels']
+        projection = json.dumps([
+            docker.inspection.prune(json.loads(info)[0], fields),
+        ])
+        self.assertLess(len(projection) * 100, len(info))
+        self.assertDictEqual(
+            {'Spec': {'Labels': {'fabricio.service.options': 'options'}}},
+            json.loads(projection)[0],
+        )
+
+    @mock.patch.object(fabricio, 'run')
+    def test_errors_are_not_cached(self, run):
+        run.side_effect = [
+            docker.ServiceNotFoundError(),
+            SucceededResult('[{"ID": "id"}]'),
+        ]
+        service = docker.Service(name='service')
+        with fab.settings(command='task', host_string='host'):
+            with self.assertRaises(docker.ServiceNotFoundError):
+                service.info
+            self.assertEqual({'ID': 'id'}, service.info)
+            self.assertEqual({'ID': 'id'}, service.info)
+        self.assertEqual(2, run.call_count)
+
+
+class RolloutTestCase(unittest.TestCase):
+
+    replicas_command = (
+        "docker service ls --filter name=service1 --filter name=service2 "
+        "--format '{{.Name}} {{.Replicas}}'"
+    )
+
+    update_status_command = (
+        "docker service inspect --format '{{.Spec.Name}} "
+        "{{.Spec.TaskTemplate.ContainerSpec.Image}} {{json .UpdateStatus}}' "
+        "service1 service2"
+    )
+
+    tasks_command = (
+        "docker service ps --filter desired-state=running --no-trunc "
+        "--format '{{.Name}} {{.Image}}' service1 service2"
+    )
+
+    def setUp(self):
+        self.fab_settings = fab.settings(fab.hide('everything'))
+        self.fab_settings.__enter__()
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+
+    def poll_call(self):
+        batch = fabricio.operations.Batch()
+        commands = [
+            batch.add(self.replicas_command),
+            batch.add(self.update_status_command, ignore_errors=True),
+            batch.add(self.tasks_command, ignore_errors=True),
+        ]
+        return mock.call(batch.make_script(commands), ignore_errors=True)
+
+    def test_wait(self):
+        tasks = (
+            'service1.1 image:new\nservice1.2 image:new\n'
+            'service1.3 image:new\nservice2.1 image:2',
+            0,
+        )
+        converged = inspect_all_result(
+            ('service1 3/3\nservice2 1/1 (max 1 per node)', 0),
+            ('service1 image:new {"State":"completed"}\nservice2 image:2 null', 0),
+            tasks,
+        )
+        cases = dict(
+            converged=dict(
+                side_effect=[converged],
+                expected_polls=1,
+            ),
+            updating=dict(
+                side_effect=[
+                    inspect_all_result(
+                        ('service1 1/3\nservice2 0/1', 0),
+                        ('service1 image:new {"State":"updating"}\nservice2 image:2 null', 0),
+                        tasks,
+                    ),
+                    inspect_all_result(
+                        ('service1 3/3\nservice2 0/1', 0),
+                        ('service1 image:new {"State":"completed"}\nservice2 image:2 null', 0),
+                        tasks,
+                    ),
+                    converged,
+                ],
+                expected_polls=3,
+            ),
+            previous_update_completed=dict(
+                side_effect=[
+                    inspect_all_result(
+                        ('service1 3/3\nservice2 1/1', 0),
+                        ('service1 image:new {"State":"completed"}\nservice2 image:2 null', 0),
+                        (
+                            'service1.1 image:old\nservice1.2 image:old\n'
+                            'service1.3 image:old\nservice2.1 image:2',
+                            0,
+                        ),
+                    ),
+                    inspect_all_result(
+                        ('service1 3/3\nservice2 1/1', 0),
+                        ('service1 image:new {"State":"updating"}\nservice2 image:2 null', 0),
+                        (
+                            'service1.1 image:new\n \\_ service1.1 image:old\n'
+                            'service1.2 image:old\nservice1.3 image:old\n'
+                            'service2.1 image:2',
+                            0,
+                        ),
+                    ),
+                    converged,
+                ],
+                expected_polls=3,
+            ),
+            rolled_back=dict(
+                side_effect=[
+                    inspect_all_result(
+                        ('service1 3/3\nservice2 1/1', 0),
+                        ('service1 image:new {"State":"rollback_completed","Message":"update rolled back"}\nservice2 image:2 null', 0),
+                        tasks,
+                    ),
+                ],
+                expected_polls=1,
+                expected_exception=docker.RolloutError,
+            ),
+            not_found=dict(
+                side_effect=[
+                    inspect_all_result(
+                        ('service1 3/3', 0),
+                        ('service1 image:new null\nError: no such service: service2', 1),
+                        ('Error: no such service: service2', 1),
+                    ),
+                ],
+                expected_polls=1,
+                expected_exception=docker.RolloutError,
+            ),
+            timed_out=dict(
+                side_effect=[
+                    inspect_all_result(
+                        ('service1 1/3\nservice2 1/1', 0),
+                        ('service1 image:new {"State":"updating"}\nservice2 image:2 null', 0),
+                        tasks,
+                    ),
+                ] * 3,
+                expected_polls=3,
+                expected_exception=docker.RolloutTimeoutError,
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                timer = mock.Mock(side_effect=[0, 10, 20, 30])
+                sleep = mock.Mock()
+                watcher = docker.rollout.Watcher(
+                    ['service1', 'service2'],
+                    timeout=30,
+                    interval=10,
+                    timer=timer,
+                    sleep=sleep,
+                )
+                with mock.patch.object(
+                    fabricio,
+                    'run',
+                    side_effect=data['side_effect'],
+                ) as run:
+                    expected_exception = data.get('expected_exception')
+                    if expected_exception:
+                        with self.assertRaises(expected_exception):
+                            watcher.wait()
+                    else:
+                        statuses = watcher.wait()
+                        self.assertListEqual(
+                            [
+                                ('service1', 3, 3, 'completed', None, 0),
+                                ('service2', 1, 1, None, None, 0),
+                                ],
+                            statuses,
+                        )
+                expected_polls = data['expected_polls']
+                self.assertListEqual([self.poll_call()] * expected_polls, run.mock_calls)
+                self.assertListEqual([mock.call(10)] * expected_polls, sleep.mock_calls)
+
+    def test_poll_merged_output(self):
+        # docker is faked by shell function, the script is executed with
+        # stderr merged into stdout as Fabric does by default
+        fake_docker = (
+            'docker() {\n'
+            '  case "$2" in\n'
+            "    ls) echo 'service1 3/3'; echo 'service2 0/1';;\n"
+            "    inspect) echo 'service1 image:1 {\"State\":\"completed\"}';"
+            " echo 'service2 image:2 null'; echo 'warning' >&2;;\n"
+            "    ps) echo 'service1.1 image:1'; echo 'service1.2 image:1';"
+            " echo 'service1.3 image:0';;\n"
+            '  esac\n'
+            '}\n'
+        )
+
+        def run(script, **kwargs):
+            process = subprocess.Popen(
+                ['sh', '-c', fake_docker + script],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                universal_newlines=True,
+            )
+            result = SucceededResult(process.communicate()[0])
+            result.stderr = ''
+            return result
+
+        watcher = docker.rollout.Watcher(['service1', 'service2'])
+        with mock.patch.object(fabricio, 'run', side_effect=run):
+            statuses = watcher.poll()
+        self.assertListEqual(
+            [
+                ('service1', 3, 3, 'completed', None, 1),
+                ('service2', 0, 1, None, None, 0),
+            ],
+            statuses,
+        )
+        self.assertFalse(any(status.failed for status in statuses))
+
+    def test_plan(self):
+        cases = dict(
+            duration=dict(
+                plan_kwargs=dict(replicas=200, duration=600),
+                expected_plan=(200, 4, 2, 'rollback', 598),
+            ),
+            one_by_one=dict(
+                plan_kwargs=dict(replicas=3, duration=60),
+                expected_plan=(3, 1, 15, 'pause', 60),
+            ),
+            max_unavailable_percentage=dict(
+                plan_kwargs=dict(replicas=200, max_unavailable='10%'),
+                expected_plan=(200, 20, 0, 'rollback', 100),
+            ),
+            max_unavailable_fraction=dict(
+                plan_kwargs=dict(replicas=10, max_unavailable=0.25),
+                expected_plan=(10, 2, 0, 'rollback', 50),
+            ),
+            max_unavailable_number=dict(
+                plan_kwargs=dict(replicas=10, max_unavailable='3'),
+                expected_plan=(10, 3, 0, 'rollback', 40),
+            ),
+            budget_exceeds_duration=dict(
+                plan_kwargs=dict(replicas=200, duration=600, max_unavailable=2),
+                expected_plan=(200, 2, 0, 'rollback', 1000),
+            ),
+            custom_task_time=dict(
+                plan_kwargs=dict(replicas=6, duration=120, task_time=30),
+                expected_plan=(6, 2, 15, 'rollback', 120),
+            ),
+            no_replicas=dict(
+                plan_kwargs=dict(replicas=0, duration=60),
+                expected_plan=(0, 1, 0, 'pause', 0),
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                plan = docker.rollout.plan(**data['plan_kwargs'])
+                self.assertTupleEqual(data['expected_plan'], plan)
+
+    @mock.patch.object(fabricio, 'run')
+    def test_plan_rollout(self, run):
+        cases = dict(
+            disabled=dict(
+                init_kwargs=dict(),
+                side_effect=[],
+                expected_plan=None,
+                expected_calls=[],
+            ),
+            replicas_option=dict(
+                init_kwargs=dict(options=dict(replicas=4), rollout_duration=60),
+                side_effect=[],
+                expected_plan=(4, 1, 6, 'pause', 58),
+                expected_calls=[],
+            ),
+            replicated=dict(
+                init_kwargs=dict(rollout_max_unavailable='50%'),
+                side_effect=[
+                    SucceededResult('[{"Spec":{"Mode":{"Replicated":{"Replicas":6}}}}]'),
+                ],
+                expected_plan=(6, 3, 0, 'rollback', 20),
+                expected_calls=[
+                    mock.call(
+                        "docker service inspect service --format '[{\"Spec\":{\"Mode\":{{json .Spec.Mode}}}}]'",
+                        abort_exception=docker.ServiceNotFoundError,
+                    ),
+                ],
+            ),
+            global_mode=dict(
+                init_kwargs=dict(rollout_max_unavailable=1, rollout_task_time=30),
+                side_effect=[
+                    SucceededResult('[{"Spec":{"Mode":{"Global":{}}}}]'),
+                    SucceededResult('node1\nnode2\nnode3\n'),
+                ],
+                expected_plan=(3, 1, 0, 'pause', 90),
+                expected_calls=[
+                    mock.call(
+                        "docker service inspect service --format '[{\"Spec\":{\"Mode\":{{json .Spec.Mode}}}}]'",
+                        abort_exception=docker.ServiceNotFoundError,
+                    ),
+                    mock.call('docker node ls --quiet'),
+                ],
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                fab.env.command = '{0}__{1}'.format(self, case)
+                docker.inspection.clear()
+                run.reset_mock()
+                run.side_effect = data['side_effect']
+                service = docker.Service(name='service', **data['init_kwargs'])
+                plan = service.plan_rollout()
+                if data['expected_plan'] is None:
+                    self.assertIsNone(plan)
+                else:
+                    self.assertTupleEqual(data['expected_plan'], plan)
+                self.assertListEqual(data['expected_calls'], run.mock_calls)
+
+    @mock.patch.object(docker.rollout, 'wait')
+    @mock.patch.object(docker.Service, '_update', return_value=True)
+    @mock.patch.object(docker.Service, 'is_manager', return_value=True)
+    def test_service_update_wait(self, is_manager, update, wait):
+        cases = dict(
+            no_wait=dict(
+                update_kwargs=dict(),
+                updated=True,
+                expected_wait_calls=[],
+            ),
+            wait=dict(
+                update_kwargs=dict(wait=True),
+                updated=True,
+                expected_wait_calls=[
+                    mock.call(['service'], timeout=600, interval=2),
+                ],
+            ),
+            not_updated=dict(
+                update_kwargs=dict(wait=True),
+                updated=False,
+                expected_wait_calls=[],
+            ),
+            custom_timeout=dict(
+                init_kwargs=dict(rollout_timeout=60, rollout_interval=5),
+                update_kwargs=dict(wait=True),
+                updated=True,
+                expected_wait_calls=[
+                    mock.call(['service'], timeout=60, interval=5),
+                ],
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                fab.env.command = '{0}__{1}'.format(self, case)
+                wait.reset_mock()
+                update.return_value = data['updated']
+                service = docker.Service(
+                    name='service',
+                    image='image',
+                    **data.get('init_kwargs', {})
+                )
+                service.update(**data['update_kwargs'])
+                self.assertListEqual(data['expected_wait_calls'], wait.mock_calls)
 
 
 class ImageTestCase(unittest.TestCase):
 
     maxDiff = None
 
+    def setUp(self):
+        self.addCleanup(docker.inspection.clear)
+
+    references = (
+        'image',
+        'image:tag',
+        'namespace/image',
+        'namespace/image:tag',
+        'org/namespace/image:tag',
+        'localhost/image',
+        'localhost:5000/image:tag',
+        'registry/image',
+        'registry.com/image',
+        'registry.com:5000/namespace/image:tag',
+        'registry:5000/image',
+        'docker.io/library/image:tag',
+        'index.docker.io/image',
+        'image@sha256:digest',
+        'registry:5000/image@sha256:digest',
+        'image:tag@sha256:digest',
+        '192.168.0.1:5000/image:1.0.0',
+        '/image',
+        'image:',
+    )
+
+    def test_parse_image_name(self):
+        import docker.auth as docker_auth
+        import docker.utils as docker_utils
+        for reference in self.references:
+            with self.subTest(reference=reference):
+                repository, tag = docker_utils.parse_repository_tag(reference)
+                registry, name = docker_auth.resolve_repository_name(
+                    repository,
+                )
+                if registry == docker_auth.INDEX_NAME:
+                    registry = None
+                self.assertTupleEqual(
+                    (registry, name, tag),
+                    docker.Image.parse_image_name(reference),
+                )
+
+    def test_parse_image_name_errors(self):
+        for reference in ('https://registry/image', '-registry.com/image'):
+            with self.subTest(reference=reference):
+                with self.assertRaises(docker.ImageError):
+                    docker.Image.parse_image_name(reference)
+
+    def test_reference_is_interned(self):
+        image = docker.Image('registry:5000/image:tag')
+        self.assertIs(
+            image.reference,
+            docker.Image('image', tag='tag', registry='registry:5000').reference,
+        )
+        self.assertIs(image.reference, image[:].reference)
+        self.assertIs(image.reference, image['tag'].reference)
+        self.assertIs(image['tag2'].reference, image['tag2'].reference)
+        self.assertIsNot(image['tag2'], image['tag2'])
+        self.assertIs(
+            docker.Image('registry:5000/image@sha256:digest').reference,
+            image[None:'image@sha256:digest'].reference,
+        )
+        with self.assertRaises(AttributeError):
+            image.reference.tag = 'tag2'
+
+    def test_fields_can_be_changed(self):
+        image = docker.Image('registry:5000/image:tag')
+        reference = image.reference
+        image.tag = 'tag2'
+        image.name = 'account/image'
+        image.registry = 'registry:6000'
+        self.assertEqual('registry:6000/account/image:tag2', repr(image))
+        self.assertEqual(6000, image.registry.port)
+        self.assertIs(image.reference, docker.Image('registry:6000/account/image:tag2').reference)
+        self.assertEqual('registry:5000/image:tag', reference.string)
+        image.tag = 'sha256:digest'
+        image.use_digest = True
+        self.assertEqual('registry:6000/account/image@sha256:digest', repr(image))
+
+    def test_slices_are_not_kept(self):
+        image = docker.Image('slices_test_image:tag')
+        sliced_image = image['tag2']
+        self.assertEqual(1, len(image.reference.slices))
+        del sliced_image
+        docker.image.ImageReference.parse.cache.clear()  # bounded anyway
+        gc.collect()
+        self.assertEqual(0, len(image.reference.slices))
+
+    def test_slice_of_subclass_is_initialized(self):
+        class Image(docker.Image):
+            def __init__(self, *args, **kwargs):
+                super(Image, self).__init__(*args, **kwargs)
+                self.initialized = True
+
+        image = Image('registry:5000/image:tag')
+        for sliced_image in (
+            image[:],
+            image['tag2'],
+            image[None:'image@sha256:digest'],
+        ):
+            self.assertIsInstance(sliced_image, Image)
+            self.assertTrue(sliced_image.initialized)
+        self.assertEqual('registry:5000/image@sha256:digest', repr(image[None:'image@sha256:digest']))
+        self.assertEqual('registry:5000/image:tag2', repr(image['tag2']))
+
+    def test_service_binding(self):
+        class Service(docker.BaseService):
+            image = docker.Image('image:tag')
+        service = Service(name='service')
+        self.assertIs(Service.image.reference, service.image.reference)
+        self.assertIs(service, service.image.service)
+        self.assertIsNone(Service.image.service)
+        self.assertEqual('image:tag', repr(service.image))
+
     def test___init___can_take_another_image_as_argument(self):
         cases = dict(
             default_image=dict(
@@ -1748,7 +2469,7 @@ class ImageTestCase(unittest.TestCase):
                 expected_calls=[
                     mock.call.run('docker inspect --type image image:latest', abort_exception=docker.ImageNotFoundError, use_cache=False),
                     mock.call.run('docker tag image:latest fabricio-temp-image:image && docker rmi image:latest', use_cache=False, ignore_errors=True),
-                    mock.call.run('docker build --tag=image:latest --pull=1 --force-rm=1 .', use_cache=False, quiet=False),
+                    mock.call.run('docker build --tag=image:latest --pull=1 --force-rm=1 .', use_cache=False, quiet=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:image old_parent_id', use_cache=False, ignore_errors=True),
                 ],
                 side_effect=[
@@ -1763,7 +2484,7 @@ class ImageTestCase(unittest.TestCase):
                 expected_calls=[
                     mock.call.local('docker inspect --type image image:latest', abort_exception=docker.ImageNotFoundError, use_cache=False, capture=True),
                     mock.call.local('docker tag image:latest fabricio-temp-image:image && docker rmi image:latest', use_cache=False, ignore_errors=True),
-                    mock.call.local('docker build --tag=image:latest --pull=1 --force-rm=1 .', use_cache=False, quiet=False),
+                    mock.call.local('docker build --tag=image:latest --pull=1 --force-rm=1 .', use_cache=False, quiet=False, buffer_size=local.buffer_size),
                     mock.call.local('docker rmi fabricio-temp-image:image old_parent_id', use_cache=False, ignore_errors=True),
                 ],
                 side_effect=[
@@ -1778,7 +2499,7 @@ class ImageTestCase(unittest.TestCase):
                 expected_calls=[
                     mock.call.run('docker inspect --type image image:latest', abort_exception=docker.ImageNotFoundError, use_cache=False),
                     mock.call.run('docker tag image:latest fabricio-temp-image:image && docker rmi image:latest', use_cache=False, ignore_errors=True),
-                    mock.call.run('docker build --tag=image:latest --pull=1 --force-rm=1 .', use_cache=False, quiet=False),
+                    mock.call.run('docker build --tag=image:latest --pull=1 --force-rm=1 .', use_cache=False, quiet=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:image ', use_cache=False, ignore_errors=True),
                 ],
                 side_effect=[
@@ -1811,6 +2532,7 @@ class ServiceTestCase(unittest.TestCase):
 
     def tearDown(self):
         fabricio.run.cache.clear()
+        docker.inspection.clear()
         self.fab_settings.__exit__(None, None, None)
 
     def test_update(self):
@@ -1922,7 +2644,7 @@ class ServiceTestCase(unittest.TestCase):
                                 ],
                             },
                         },
-                    }}])),  # service info
+                    }}])),  # service labels
                 ),
                 args_parsers=[
                     args_parser,
@@ -1940,6 +2662,7 @@ class ServiceTestCase(unittest.TestCase):
                     },
                     {
                         'executable': ['docker', 'service', 'inspect'],
+                        'format': '[{"Spec":{"Labels":{{json .Spec.Labels}}}}]',
                         'service': 'service',
                     },
                 ],
@@ -1974,13 +2697,32 @@ class ServiceTestCase(unittest.TestCase):
                                 ],
                             },
                         },
-                    }}])),  # service info
+                    }}])),  # service labels
+                    SucceededResult(json.dumps([{"Spec": {
+                        "Labels": {
+                            "fabricio.service.options": "b1a9a7833e4ca8b5122b9db71844ed33",
+                        },
+                        "TaskTemplate": {
+                            "ContainerSpec": {
+                                "Secrets": [
+                                    {
+                                        "File": {
+                                            "Name": "secret",
+                                        },
+                                        "SecretID": "secret",
+                                        "SecretName": "secret",
+                                    },
+                                ],
+                            },
+                        },
+                    }}])),  # service full info
                     SucceededResult(),  # service update
                 ),
                 args_parsers=[
                     args_parser,
                     docker_inspect_args_parser,
                     docker_entity_inspect_args_parser,
+                    docker_entity_inspect_args_parser,
                     docker_service_update_args_parser,
                 ],
                 expected_args=[
@@ -1992,6 +2734,11 @@ class ServiceTestCase(unittest.TestCase):
                         'type': 'image',
                         'image_or_container': 'image:tag',
                     },
+                    {
+                        'executable': ['docker', 'service', 'inspect'],
+                        'format': '[{"Spec":{"Labels":{{json .Spec.Labels}}}}]',
+                        'service': 'service',
+                    },
                     {
                         'executable': ['docker', 'service', 'inspect'],
                         'service': 'service',
@@ -2003,6 +2750,9 @@ class ServiceTestCase(unittest.TestCase):
                         'args': '',
                         'label-add': [
                             'fabricio.service.options=b1a9a7833e4ca8b5122b9db71844ed33',
+                            'fabricio.service.options.args=9d4568c009d203ab10e33ea9953a0264',
+                            'fabricio.service.options.image=619130ad54a412b58688b9ce3a5e4838',
+                            'fabricio.service.options.secret=8d0fc4c014111463b58a5b9f850c3f05',
                         ],
                         'secret-add': ['secret'],
                         'secret-rm': ['secret'],
@@ -2010,6 +2760,105 @@ class ServiceTestCase(unittest.TestCase):
                 ],
                 expected_result=True,
             ),
+            updated_changed_groups_only=dict(
+                init_kwargs=dict(
+                    name='service',
+                    image='image:tag',
+                    options=dict(
+                        env='FOO=bar',
+                        secret='secret',
+                    ),
+                ),
+                update_kwargs=dict(),
+                side_effect=(
+                    SucceededResult('  Is Manager: true'),  # manager status
+                    SucceededResult('[{"RepoDigests": ["digest"]}]'),  # image info
+                    SucceededResult(json.dumps([{"Spec": {
+                        "Labels": {
+                            "fabricio.service.options": "outdated",
+                            "fabricio.service.options.args": "9d4568c009d203ab10e33ea9953a0264",
+                            "fabricio.service.options.env": "outdated",
+                            "fabricio.service.options.image": "619130ad54a412b58688b9ce3a5e4838",
+                            "fabricio.service.options.secret": "8d0fc4c014111463b58a5b9f850c3f05",
+                        },
+                        "TaskTemplate": {
+                            "ContainerSpec": {
+                                "Secrets": [
+                                    {
+                                        "File": {
+                                            "Name": "secret",
+                                        },
+                                        "SecretID": "secret",
+                                        "SecretName": "secret",
+                                    },
+                                ],
+                            },
+                        },
+                    }}])),  # service labels
+                    SucceededResult(json.dumps([{"Spec": {
+                        "Labels": {
+                            "fabricio.service.options": "outdated",
+                            "fabricio.service.options.args": "9d4568c009d203ab10e33ea9953a0264",
+                            "fabricio.service.options.env": "outdated",
+                            "fabricio.service.options.image": "619130ad54a412b58688b9ce3a5e4838",
+                            "fabricio.service.options.secret": "8d0fc4c014111463b58a5b9f850c3f05",
+                        },
+                        "TaskTemplate": {
+                            "ContainerSpec": {
+                                "Secrets": [
+                                    {
+                                        "File": {
+                                            "Name": "secret",
+                                        },
+                                        "SecretID": "secret",
+                                        "SecretName": "secret",
+                                    },
+                                ],
+                            },
+                        },
+                    }}])),  # service full info
+                    SucceededResult(),  # service update
+                ),
+                args_parsers=[
+                    args_parser,
+                    docker_inspect_args_parser,
+                    docker_entity_inspect_args_parser,
+                    docker_entity_inspect_args_parser,
+                    docker_service_update_args_parser,
+                ],
+                expected_args=[
+                    {
+                        'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
+                    },
+                    {
+                        'executable': ['docker', 'inspect'],
+                        'type': 'image',
+                        'image_or_container': 'image:tag',
+                    },
+                    {
+                        'executable': ['docker', 'service', 'inspect'],
+                        'format': '[{"Spec":{"Labels":{{json .Spec.Labels}}}}]',
+                        'service': 'service',
+                    },
+                    {
+                        'executable': ['docker', 'service', 'inspect'],
+                        'service': 'service',
+                    },
+                    {
+                        'executable': ['docker', 'service', 'update'],
+                        'service': 'service',
+                        'env-add': ['FOO=bar'],
+                        'label-add': [
+                            'fabricio.service.options=2a141f67eef5cd10967137eb734a11fb',
+                            'fabricio.service.options.args=9d4568c009d203ab10e33ea9953a0264',
+                            'fabricio.service.options.env=8472c5f040444f86d0846e9ca15b3034',
+                            'fabricio.service.options.image=619130ad54a412b58688b9ce3a5e4838',
+                            'fabricio.service.options.secret=8d0fc4c014111463b58a5b9f850c3f05',
+                        ],
+                    },
+                ],
+                expected_result=True,
+            ),
             updated=dict(
                 init_kwargs=dict(
                     name='service',
@@ -2019,13 +2868,15 @@ class ServiceTestCase(unittest.TestCase):
                 side_effect=(
                     SucceededResult('  Is Manager: true'),  # manager status
                     SucceededResult('[{"RepoDigests": ["digest"]}]'),  # image info
-                    SucceededResult('[{"Spec": {}}]'),  # service info
+                    SucceededResult('[{"Spec": {}}]'),  # service labels
+                    SucceededResult('[{"Spec": {}}]'),  # service full info
                     SucceededResult(),  # service update
                 ),
                 args_parsers=[
                     args_parser,
                     docker_inspect_args_parser,
                     docker_entity_inspect_args_parser,
+                    docker_entity_inspect_args_parser,
                     docker_service_update_args_parser,
                 ],
                 expected_args=[
@@ -2037,6 +2888,11 @@ class ServiceTestCase(unittest.TestCase):
                         'type': 'image',
                         'image_or_container': 'image:tag',
                     },
+                    {
+                        'executable': ['docker', 'service', 'inspect'],
+                        'format': '[{"Spec":{"Labels":{{json .Spec.Labels}}}}]',
+                        'service': 'service',
+                    },
                     {
                         'executable': ['docker', 'service', 'inspect'],
                         'service': 'service',
@@ -2048,7 +2904,134 @@ class ServiceTestCase(unittest.TestCase):
                         'args': '',
                         'label-add': [
                             'fabricio.service.options=5ed89ef87bc69f63506f92169933231d',
+                            'fabricio.service.options.args=9d4568c009d203ab10e33ea9953a0264',
+                            'fabricio.service.options.image=619130ad54a412b58688b9ce3a5e4838',
+                        ],
+                    },
+                ],
+                expected_result=True,
+            ),
+            updated_with_rollout_plan=dict(
+                init_kwargs=dict(
+                    name='service',
+                    image='image:tag',
+                    options=dict(replicas=4),
+                    rollout_duration=60,
+                ),
+                update_kwargs=dict(),
+                side_effect=(
+                    SucceededResult('  Is Manager: true'),  # manager status
+                    SucceededResult('[{"RepoDigests": ["digest"]}]'),  # image info
+                    SucceededResult('[{"Spec": {}}]'),  # service labels
+                    SucceededResult('[{"Spec": {}}]'),  # service full info
+                    SucceededResult(),  # service update
+                ),
+                args_parsers=[
+                    args_parser,
+                    docker_inspect_args_parser,
+                    docker_entity_inspect_args_parser,
+                    docker_entity_inspect_args_parser,
+                    docker_service_update_args_parser,
+                ],
+                expected_args=[
+                    {
+                        'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
+                    },
+                    {
+                        'executable': ['docker', 'inspect'],
+                        'type': 'image',
+                        'image_or_container': 'image:tag',
+                    },
+                    {
+                        'executable': ['docker', 'service', 'inspect'],
+                        'format': '[{"Spec":{"Labels":{{json .Spec.Labels}}}}]',
+                        'service': 'service',
+                    },
+                    {
+                        'executable': ['docker', 'service', 'inspect'],
+                        'service': 'service',
+                    },
+                    {
+                        'executable': ['docker', 'service', 'update'],
+                        'image': 'digest',
+                        'service': 'service',
+                        'args': '',
+                        'replicas': '4',
+                        'label-add': [
+                            'fabricio.service.options=8efaa1448f23defc2a3e6677a79dcc2f',
+                            'fabricio.service.options.args=9d4568c009d203ab10e33ea9953a0264',
+                            'fabricio.service.options.image=619130ad54a412b58688b9ce3a5e4838',
+                            'fabricio.service.options.replicas=a87ff679a2f3e71d9181a67b7542122c',
+                            'fabricio.service.options.rollout=ee6428d1c60dcfb0be50799645caabb0',
+                        ],
+                        'update-parallelism': '1',
+                        'update-delay': '6s',
+                        'update-failure-action': 'pause',
+                    },
+                ],
+                expected_result=True,
+            ),
+            updated_with_changed_rollout_plan=dict(
+                init_kwargs=dict(
+                    name='service',
+                    image='image:tag',
+                    options=dict(replicas=4),
+                    rollout_duration=60,
+                ),
+                update_kwargs=dict(),
+                side_effect=(
+                    SucceededResult('  Is Manager: true'),  # manager status
+                    SucceededResult('[{"RepoDigests": ["digest"]}]'),  # image info
+                    SucceededResult(
+                        '[{"Spec": {"Labels": {'
+                        '"fabricio.service.options": "outdated", '
+                        '"fabricio.service.options.args": "9d4568c009d203ab10e33ea9953a0264", '
+                        '"fabricio.service.options.image": "619130ad54a412b58688b9ce3a5e4838", '
+                        '"fabricio.service.options.replicas": "a87ff679a2f3e71d9181a67b7542122c", '
+                        '"fabricio.service.options.rollout": "outdated"'
+                        '}}}]'
+                    ),  # service labels
+                    SucceededResult('[{"Spec": {}}]'),  # service full info
+                    SucceededResult(),  # service update
+                ),
+                args_parsers=[
+                    args_parser,
+                    docker_inspect_args_parser,
+                    docker_entity_inspect_args_parser,
+                    docker_entity_inspect_args_parser,
+                    docker_service_update_args_parser,
+                ],
+                expected_args=[
+                    {
+                        'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
+                    },
+                    {
+                        'executable': ['docker', 'inspect'],
+                        'type': 'image',
+                        'image_or_container': 'image:tag',
+                    },
+                    {
+                        'executable': ['docker', 'service', 'inspect'],
+                        'format': '[{"Spec":{"Labels":{{json .Spec.Labels}}}}]',
+                        'service': 'service',
+                    },
+                    {
+                        'executable': ['docker', 'service', 'inspect'],
+                        'service': 'service',
+                    },
+                    {
+                        'executable': ['docker', 'service', 'update'],
+                        'service': 'service',
+                        'label-add': [
+                            'fabricio.service.options=8efaa1448f23defc2a3e6677a79dcc2f',
+                            'fabricio.service.options.args=9d4568c009d203ab10e33ea9953a0264',
+                            'fabricio.service.options.image=619130ad54a412b58688b9ce3a5e4838',
+                            'fabricio.service.options.replicas=a87ff679a2f3e71d9181a67b7542122c',
+                            'fabricio.service.options.rollout=ee6428d1c60dcfb0be50799645caabb0',
                         ],
+                        'update-parallelism': '1',
+                        'update-delay': '6s',
+                        'update-failure-action': 'pause',
                     },
                 ],
                 expected_result=True,
@@ -2064,13 +3047,15 @@ class ServiceTestCase(unittest.TestCase):
                 side_effect=(
                     SucceededResult('  Is Manager: true'),  # manager status
                     SucceededResult('[{"RepoDigests": ["digest"]}]'),  # image info
-                    SucceededResult('[{"Spec": {}}]'),  # service info
+                    SucceededResult('[{"Spec": {}}]'),  # service labels
+                    SucceededResult('[{"Spec": {}}]'),  # service full info
                     SucceededResult(),  # service update
                 ),
                 args_parsers=[
                     args_parser,
                     docker_inspect_args_parser,
                     docker_entity_inspect_args_parser,
+                    docker_entity_inspect_args_parser,
                     docker_service_update_args_parser,
                 ],
                 expected_args=[
@@ -2082,6 +3067,11 @@ class ServiceTestCase(unittest.TestCase):
                         'type': 'image',
                         'image_or_container': 'image:tag',
                     },
+                    {
+                        'executable': ['docker', 'service', 'inspect'],
+                        'format': '[{"Spec":{"Labels":{{json .Spec.Labels}}}}]',
+                        'service': 'service',
+                    },
                     {
                         'executable': ['docker', 'service', 'inspect'],
                         'service': 'service',
@@ -2094,6 +3084,9 @@ class ServiceTestCase(unittest.TestCase):
                             'label1=label1',
                             'label2=label2',
                             'fabricio.service.options=0a4991404e926ea32115d3ad6debf1c7',
+                            'fabricio.service.options.args=369e6b728997a9ad8c4f1c9976b84d25',
+                            'fabricio.service.options.image=619130ad54a412b58688b9ce3a5e4838',
+                            'fabricio.service.options.label=12db394f6d73b9f5b5f297b6d95f1363',
                         ],
                         'args': 'foo bar',
                     },
@@ -2109,13 +3102,15 @@ class ServiceTestCase(unittest.TestCase):
                 side_effect=(
                     SucceededResult('  Is Manager: true'),  # manager status
                     SucceededResult('[{"RepoDigests": ["digest"]}]'),  # image info
-                    SucceededResult('[{"Spec": {}}]'),  # service info
+                    SucceededResult('[{"Spec": {}}]'),  # service labels
+                    SucceededResult('[{"Spec": {}}]'),  # service full info
                     SucceededResult(),  # service update
                 ),
                 args_parsers=[
                     args_parser,
                     docker_inspect_args_parser,
                     docker_entity_inspect_args_parser,
+                    docker_entity_inspect_args_parser,
                     docker_service_update_args_parser,
                 ],
                 expected_args=[
@@ -2127,6 +3122,11 @@ class ServiceTestCase(unittest.TestCase):
                         'type': 'image',
                         'image_or_container': 'registry/account/image:custom_tag',
                     },
+                    {
+                        'executable': ['docker', 'service', 'inspect'],
+                        'format': '[{"Spec":{"Labels":{{json .Spec.Labels}}}}]',
+                        'service': 'service',
+                    },
                     {
                         'executable': ['docker', 'service', 'inspect'],
                         'service': 'service',
@@ -2138,6 +3138,8 @@ class ServiceTestCase(unittest.TestCase):
                         'args': '',
                         'label-add': [
                             'fabricio.service.options=5ed89ef87bc69f63506f92169933231d',
+                            'fabricio.service.options.args=9d4568c009d203ab10e33ea9953a0264',
+                            'fabricio.service.options.image=619130ad54a412b58688b9ce3a5e4838',
                         ],
                     },
                 ],
@@ -2152,7 +3154,7 @@ class ServiceTestCase(unittest.TestCase):
                 side_effect=(
                     SucceededResult('  Is Manager: true'),  # manager status
                     SucceededResult('[{"RepoDigests": ["digest"]}]'),  # image info
-                    docker.ServiceNotFoundError(),  # service info
+                    docker.ServiceNotFoundError(),  # service labels
                     SucceededResult(),  # service create
                 ),
                 args_parsers=[
@@ -2172,6 +3174,7 @@ class ServiceTestCase(unittest.TestCase):
                     },
                     {
                         'executable': ['docker', 'service', 'inspect'],
+                        'format': '[{"Spec":{"Labels":{{json .Spec.Labels}}}}]',
                         'service': 'service',
                     },
                     {
@@ -2181,6 +3184,8 @@ class ServiceTestCase(unittest.TestCase):
                         'args': [],
                         'label': [
                             'fabricio.service.options=5ed89ef87bc69f63506f92169933231d',
+                            'fabricio.service.options.args=9d4568c009d203ab10e33ea9953a0264',
+                            'fabricio.service.options.image=619130ad54a412b58688b9ce3a5e4838',
                         ],
                     },
                 ],
@@ -2195,7 +3200,7 @@ class ServiceTestCase(unittest.TestCase):
                 side_effect=(
                     SucceededResult('  Is Manager: true'),  # manager status
                     SucceededResult('[{"RepoDigests": ["digest"]}]'),  # image info
-                    docker.ServiceNotFoundError(),  # service info
+                    docker.ServiceNotFoundError(),  # service labels
                     SucceededResult(),  # service create
                 ),
                 args_parsers=[
@@ -2215,6 +3220,7 @@ class ServiceTestCase(unittest.TestCase):
                     },
                     {
                         'executable': ['docker', 'service', 'inspect'],
+                        'format': '[{"Spec":{"Labels":{{json .Spec.Labels}}}}]',
                         'service': 'service',
                     },
                     {
@@ -2224,6 +3230,8 @@ class ServiceTestCase(unittest.TestCase):
                         'args': [],
                         'label': [
                             'fabricio.service.options=5ed89ef87bc69f63506f92169933231d',
+                            'fabricio.service.options.args=9d4568c009d203ab10e33ea9953a0264',
+                            'fabricio.service.options.image=619130ad54a412b58688b9ce3a5e4838',
                         ],
                     },
                 ],
@@ -2267,6 +3275,30 @@ class ServiceTestCase(unittest.TestCase):
                             self.assertIsInstance(exception, expected_result)
                         self.assertEqual(run.call_count, len(data['expected_args']))
 
+    @mock.patch.object(fabricio, 'run', return_value='Is Manager: true')
+    def test_services_and_forks_start_no_processes(self, run):
+        start = multiprocessing.process.BaseProcess.start
+        with mock.patch.object(
+            multiprocessing.process.BaseProcess,
+            'start',
+            autospec=True,
+            side_effect=start,
+        ) as process_start:
+            services = [
+                docker.Service(name='service'),
+                docker.Stack(name='stack'),
+                StreamingReplicatedPostgresqlContainer(name='postgres'),
+            ]
+            for service in services:
+                fork = service.fork()
+                copy.copy(service).fork()
+                if isinstance(service, docker.ManagedService):
+                    self.assertTrue(fork.is_manager())
+                    self.assertTrue(service.managers[fab.env.host])
+        process_start.assert_not_called()
+        self.assertListEqual([], multiprocessing.active_children())
+        self.assertEqual(2, run.call_count)  # forks share `is_manager` state
+
     @mock.patch.dict(fab.env, dict(all_hosts=['host1', 'host2']))
     def test_is_manager_returns_false_if_pull_error(self, *args):
         with mock.patch.object(fabricio, 'run') as run:
@@ -2284,6 +3316,75 @@ class ServiceTestCase(unittest.TestCase):
                 service.is_manager()
             run.assert_not_called()
 
+    @mock.patch.dict(fab.env, dict(all_hosts=['user@manager:22', 'worker1', '10.0.0.3', 'unknown']))
+    def test_is_manager_discovers_workers(self):
+        nodes = SucceededResult(
+            'manager manager 10.0.0.1 10.0.0.1:2377\n'
+            'worker1 worker 10.0.0.2\n'
+            'node3 worker 10.0.0.3\n'
+        )
+        with mock.patch.object(fabricio, 'run', side_effect=[
+            SucceededResult('  Is Manager: true'),
+            nodes,
+        ]) as run:
+            service = docker.Service(name='service')
+            with fab.settings(host='manager'):
+                self.assertTrue(service.is_manager())
+            self.assertListEqual(
+                [
+                    mock.call('docker info 2>&1 | grep "Is Manager:"'),
+                    mock.call(docker.Service.nodes_command),
+                ],
+                run.mock_calls,
+            )
+            for host in ('worker1', '10.0.0.3'):
+                with fab.settings(host=host):
+                    self.assertFalse(service.is_manager())
+            self.assertEqual(2, run.call_count)
+
+        with mock.patch.object(fabricio, 'run', side_effect=[
+            SucceededResult('  Is Manager: false'),
+        ]) as run:
+            with fab.settings(host='unknown'):
+                self.assertFalse(service.is_manager())
+            run.assert_called_once_with('docker info 2>&1 | grep "Is Manager:"')
+
+        # list of nodes is cached (for the session or on disk)
+        with mock.patch.object(fabricio, 'run') as run:
+            service = docker.Service(name='service')
+            with fab.settings(host='worker1'):
+                self.assertFalse(service.is_manager())
+            self.assertTrue(service.managers['manager'])
+            run.assert_not_called()
+
+        # but not longer than `nodes_ttl`
+        entry = fabricio.run.cache.entries[service._nodes_cache_key]
+        self.assertEqual(docker.Service.nodes_ttl, entry.ttl)
+
+    def test_is_manager_probes_only_first_host_of_parallel_workers(self):
+        hosts = ['host{0}'.format(number) for number in range(20)]
+        nodes = SucceededResult(''.join(
+            '{host} manager 10.0.0.{number}\n'.format(host=host, number=number)
+            for number, host in enumerate(hosts)
+        ))
+        probes = []
+
+        def run(command, **kwargs):
+            if command == docker.Service.nodes_command:
+                return nodes
+            probes.append(fab.env.host)
+            time.sleep(0.01)  # other workers are coming meanwhile
+            return SucceededResult('  Is Manager: true')
+
+        service = docker.Service(name='service')
+        with mock.patch.object(fabricio, 'run', side_effect=run):
+            results = executors.ThreadExecutor()(
+                fab.task(service.is_manager),
+                hosts=hosts,
+            )
+        self.assertEqual(1, len(probes))
+        self.assertTrue(all(results.values()))
+
     def test_pull_image(self):
         cases = dict(
             no_errors=dict(
@@ -3835,6 +4936,86 @@ class ServiceTestCase(unittest.TestCase):
                         data['expected'],
                     )
 
+    def test_compile_path(self):
+        info = {
+            'Spec': {
+                'Labels': {'label': 'value'},
+                'TaskTemplate': {
+                    'ContainerSpec': {
+                        'Env': ['FOO=foo', 'BAR=bar'],
+                        'Mounts': [
+                            {'Target': '/a'},
+                            {'Source': 'volume'},
+                            {'Target': None},
+                        ],
+                        'Hosts': None,
+                        'Groups': 'group',
+                    },
+                    'Networks': {'one': {'Target': 'one'}},
+                },
+                'EndpointSpec': {'Ports': []},
+            },
+        }
+        cases = {
+            '/Spec/Labels': [{'label': 'value'}],
+            '/Spec/Labels/label': ['value'],
+            '/Spec/Labels/missing': [],
+            '/Spec/Missing/Labels': [],
+            '/Spec/TaskTemplate/ContainerSpec/Env/*': ['FOO=foo', 'BAR=bar'],
+            '/Spec/TaskTemplate/ContainerSpec/Env/1': ['BAR=bar'],
+            '/Spec/TaskTemplate/ContainerSpec/Env/2': [],
+            '/Spec/TaskTemplate/ContainerSpec/Mounts/*/Target': ['/a', None],
+            '/Spec/TaskTemplate/ContainerSpec/Hosts/*': [],
+            '/Spec/TaskTemplate/ContainerSpec/Groups/*': [],
+            '/Spec/TaskTemplate/Networks/*/Target': ['one'],
+            '/Spec/EndpointSpec/Ports/*/TargetPort': [],
+            '/Spec/*/ContainerSpec/Env/*': ['FOO=foo', 'BAR=bar'],
+        }
+        for path, expected_values in cases.items():
+            with self.subTest(path=path):
+                get_values = docker.service.compile_path(path)
+                self.assertListEqual(expected_values, get_values(info))
+                try:
+                    import dpath.util
+                except ImportError:
+                    continue
+                self.assertListEqual(dpath.util.values(info, path), get_values(info))
+
+    def test_get_current_values_of_big_service(self):
+        try:
+            import dpath.util
+        except ImportError:
+            self.skipTest('dpath is not installed')
+        spec = {
+            'Labels': {'label_%d' % n: 'value' for n in range(50)},
+            'TaskTemplate': {
+                'ContainerSpec': {
+                    'Labels': {'label_%d' % n: 'value' for n in range(50)},
+                    'Env': ['VARIABLE_{0}=value'.format(n) for n in range(200)],
+                    'Mounts': [
+                        {'Type': 'volume', 'Source': 'v', 'Target': '/%d' % n}
+                        for n in range(100)
+                    ],
+                },
+                'Networks': [{'Target': 'network_%d' % n} for n in range(10)],
+            },
+            'EndpointSpec': {'Ports': [
+                {'TargetPort': n, 'PublishedPort': n} for n in range(100)
+            ]},
+        }
+        info = {'ID': 'id', 'Spec': spec, 'PreviousSpec': spec}
+        options = [
+            option for option in vars(docker.Service).values()
+            if isinstance(option, docker.service.RemovableOption)
+        ]
+
+        for option in options:
+            with self.subTest(path=option.path):
+                self.assertListEqual(
+                    dpath.util.values(info, option.path),
+                    option.get_path_values(info),
+                )
+
     def test__update_labels(self):
         cases = dict(
             empty=dict(
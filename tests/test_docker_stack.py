@@ -11,7 +11,8 @@ import fabricio
 
 from fabricio import docker, utils
 from fabricio.docker import stack as stack_module
-from tests import SucceededResult, args_parser, FabricioTestCase
+from tests import SucceededResult, args_parser, FabricioTestCase, \
+    inspect_all_call, inspect_all_result
 
 
 def as_ordereddict(result):
@@ -23,6 +24,7 @@ class StackTestCase(FabricioTestCase):
     maxDiff = None
 
     def setUp(self):
+        self.addCleanup(docker.inspection.clear)
         stack_module.open = mock.MagicMock()
         self.cd = mock.patch.object(fab, 'cd')
         self.cd.start()
@@ -69,7 +71,7 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['rm', '-f', 'docker-compose.yml']},
                 ],
                 expected_result=False,
@@ -95,7 +97,7 @@ class StackTestCase(FabricioTestCase):
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
                     },
                     {
-                        'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack'],
+                        'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]'],
                     },
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
@@ -128,11 +130,11 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
                     },
@@ -164,11 +166,11 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
                     },
@@ -200,11 +202,11 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=compose.yml', 'stack'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
                     },
@@ -236,11 +238,11 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=compose.yml', 'stack'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
                     },
@@ -272,11 +274,11 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=compose.yml', 'stack'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
                     },
@@ -308,11 +310,11 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
                     },
@@ -344,11 +346,11 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
                     },
@@ -380,11 +382,11 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
                     },
@@ -423,11 +425,11 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack' , 'backup_parent_id;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
                     },
@@ -472,7 +474,7 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'tag', 'image:tag', 'fabricio-temp-image:image', '&&', 'docker', 'rmi', 'image:tag']}, {'args': ['docker', 'pull', 'image:tag']}, {'args': ['docker', 'rmi', 'fabricio-temp-image:image']},
                     {
                         'args': ['docker', 'inspect', '--type', 'image', '--format', '{{index .RepoDigests 0}}', 'image:tag'],
@@ -480,7 +482,7 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
                     },
@@ -527,7 +529,7 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'tag', 'image1:tag', 'fabricio-temp-image:image1', '&&', 'docker', 'rmi', 'image1:tag']}, {'args': ['docker', 'pull', 'image1:tag']}, {'args': ['docker', 'rmi', 'fabricio-temp-image:image1']},
                     {'args': ['docker', 'tag', 'image2:tag', 'fabricio-temp-image:image2', '&&', 'docker', 'rmi', 'image2:tag']}, {'args': ['docker', 'pull', 'image2:tag']}, {'args': ['docker', 'rmi', 'fabricio-temp-image:image2']},
                     {
@@ -536,7 +538,7 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-backup-stack:stack;', 'docker', 'tag', 'fabricio-current-stack:stack', 'fabricio-backup-stack:stack;', 'docker', 'rmi', 'fabricio-current-stack:stack'],
                     },
@@ -615,12 +617,12 @@ class StackTestCase(FabricioTestCase):
                     {
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
                     },
                     {'args': ['rm', '-f',  'docker-compose.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-current-stack:stack', 'current_parent_id;', 'docker', 'tag', 'fabricio-backup-stack:stack', 'fabricio-current-stack:stack;', 'docker', 'rmi', 'fabricio-backup-stack:stack'],
                     },
@@ -649,7 +651,7 @@ class StackTestCase(FabricioTestCase):
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
                     {
-                        'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack'],
+                        'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]'],
                     },
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
@@ -661,7 +663,7 @@ class StackTestCase(FabricioTestCase):
                         'args': ['docker', 'service', 'update', '--image', 'digest', 'service'],
                     },
                     {'args': ['rm', '-f',  'docker-compose.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-current-stack:stack', 'current_parent_id;', 'docker', 'tag', 'fabricio-backup-stack:stack', 'fabricio-current-stack:stack;', 'docker', 'rmi', 'fabricio-backup-stack:stack'],
                     },
@@ -691,7 +693,7 @@ class StackTestCase(FabricioTestCase):
                         'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                     },
                     {
-                        'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack'],
+                        'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]'],
                     },
                     {
                         'args': ['docker', 'stack', 'deploy', '--compose-file=docker-compose.yml', 'stack'],
@@ -706,7 +708,7 @@ class StackTestCase(FabricioTestCase):
                         'args': ['docker', 'service', 'update', '--image', 'digest2', 'service2'],
                     },
                     {'args': ['rm', '-f',  'docker-compose.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {
                         'args': ['docker', 'rmi', 'fabricio-current-stack:stack', 'current_parent_id;', 'docker', 'tag', 'fabricio-backup-stack:stack', 'fabricio-current-stack:stack;', 'docker', 'rmi', 'fabricio-backup-stack:stack'],
                     },
@@ -745,7 +747,7 @@ class StackTestCase(FabricioTestCase):
                 {
                     'args': ['docker', 'info', '2>&1', '|', 'grep', 'Is Manager:'],
                 },
-                {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack']},
+                {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-stack:stack', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
             ],
             side_effects=[
                 SucceededResult('  Is Manager: true'),  # manager status
@@ -772,16 +774,65 @@ class StackTestCase(FabricioTestCase):
     @mock.patch.object(docker.ManagedService, 'is_manager', return_value=True)
     @mock.patch.object(fabricio, 'run')
     def test_destroy(self, run, *_):
-        run.side_effect = [SucceededResult('service image')] + [SucceededResult('[{"Parent": "parent_id"}]')] * 4
+        run.side_effect = [
+            SucceededResult('service image'),
+            SucceededResult(),
+            inspect_all_result(
+                ('[{"Parent": "parent_id"}]', 0),
+                ('[{"Parent": "parent_id"}]', 0),
+            ),
+            SucceededResult(),
+        ]
         stack = docker.Stack(name='name')
         stack.destroy()
         self.assertListEqual(
             [
                 mock.call('docker stack services --format "{{.Name}} {{.Image}}" name'),
                 mock.call('docker stack rm  name'),
-                mock.call('docker inspect --type image fabricio-current-stack:name', abort_exception=docker.ImageNotFoundError),
-                mock.call('docker inspect --type image fabricio-backup-stack:name', abort_exception=docker.ImageNotFoundError),
+                inspect_all_call(
+                    'docker inspect --type image fabricio-current-stack:name'
+                    ' --format \'[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]\'',
+                    'docker inspect --type image fabricio-backup-stack:name'
+                    ' --format \'[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]\'',
+                ),
                 mock.call('docker rmi fabricio-current-stack:name fabricio-backup-stack:name parent_id parent_id image', ignore_errors=True),
             ],
             run.mock_calls,
         )
+
+    @mock.patch.object(docker.ManagedService, 'is_manager', return_value=True)
+    @mock.patch.object(fabricio, 'run')
+    def test_destroy_tolerates_missing_sentinel_images(self, run, *_):
+        run.side_effect = [
+            SucceededResult('service image'),
+            SucceededResult(),
+            inspect_all_result(
+                ('', 1),  # current sentinel image is missing
+                ('[{"Parent": "backup_parent_id"}]', 0),
+            ),
+            SucceededResult(),
+        ]
+        fab.env.command = 'test_stack_destroy_tolerates_missing_sentinel_images'
+        stack = docker.Stack(name='name')
+        stack.destroy()
+        self.assertEqual(
+            mock.call('docker rmi fabricio-current-stack:name fabricio-backup-stack:name backup_parent_id image', ignore_errors=True),
+            run.mock_calls[-1],
+        )
+
+    @mock.patch.object(docker.ManagedService, 'is_manager', return_value=True)
+    @mock.patch.object(docker.rollout, 'wait')
+    @mock.patch.object(fabricio, 'run')
+    def test_wait_rollout(self, run, wait, *_):
+        run.return_value = SucceededResult('stack_web image1\nstack_db image2\n')
+        fab.env.command = 'test_stack_wait_rollout'
+        stack = docker.Stack(name='stack', rollout_interval=5)
+        stack.wait_rollout(timeout=60)
+        run.assert_called_once_with(
+            'docker stack services --format "{{.Name}} {{.Image}}" stack',
+        )
+        wait.assert_called_once_with(
+            ['stack_db', 'stack_web'],
+            timeout=60,
+            interval=5,
+        )
@@ -0,0 +1,130 @@
+import threading
+
+import mock
+import unittest2 as unittest
+
+from fabric import api as fab
+
+import fabricio
+
+from fabricio import executors
+from tests import SucceededResult
+
+
+class ThreadExecutorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fab_settings = fab.settings(fab.hide('everything', 'aborts'))
+        self.fab_settings.__enter__()
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+
+    @mock.patch.object(fab, 'run', return_value=SucceededResult())
+    def test_execute(self, run):
+        run.__name__ = 'run'
+
+        @fab.task
+        def task(fail_host=None):
+            if fab.env.host == fail_host:
+                raise fabricio.Error('error')
+            fabricio.run('command')
+            return fab.env.host, len(fab.env.all_hosts)
+
+        executor = executors.ThreadExecutor(pool_size=2)
+        host = fab.env.host
+        self.assertDictEqual(
+            {'host1': ('host1', 2), 'host2': ('host2', 2)},
+            executor(task, hosts=['host1', 'host2']),
+        )
+        self.assertEqual(2, run.call_count)
+        self.assertEqual(host, fab.env.host)
+        with self.assertRaises(SystemExit):
+            executor(task, hosts=['host1', 'host2'], fail_host='host2')
+
+    def test_output_settings_isolated(self):
+        hidden = threading.Event()
+        checked = threading.Event()
+
+        @fab.task
+        def task():
+            with fab.show('stdout'):
+                if fab.env.host == 'host1':
+                    with fab.hide('stdout'):
+                        hidden.set()
+                        checked.wait(5)
+                    return fab.output.stdout
+                hidden.wait(5)
+                try:
+                    return fab.output.stdout
+                finally:
+                    checked.set()
+
+        executor = executors.ThreadExecutor(pool_size=2)
+        self.assertDictEqual(
+            {'host1': True, 'host2': True},
+            executor(task, hosts=['host1', 'host2']),
+        )
+
+    def test_threads_are_bounded(self):
+
+        @fab.task
+        def task():
+            return fab.env.host
+
+        hosts = ['host{0}'.format(n) for n in range(executors.max_pool_size * 2)]
+        cases = dict(
+            default=dict(
+                settings=dict(),
+                expected_pool_size=executors.max_pool_size,
+            ),
+            pool_size=dict(
+                settings=dict(pool_size=100),
+                expected_pool_size=100,
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                with mock.patch.object(
+                    executors,
+                    'ThreadPool',
+                    wraps=executors.ThreadPool,
+                ) as thread_pool:
+                    with fab.settings(**data['settings']):
+                        results = executors.ThreadExecutor()(task, hosts=hosts)
+                thread_pool.assert_called_once_with(data['expected_pool_size'])
+                self.assertEqual(len(hosts), len(results))
+
+    def test_get_executor(self):
+        executor = mock.Mock()
+        cases = dict(
+            default=dict(
+                kwargs=dict(),
+                expected=fab.execute,
+            ),
+            custom=dict(
+                kwargs=dict(executor=executor),
+                expected=executor,
+            ),
+            fork=dict(
+                kwargs=dict(executor='fork'),
+                expected=fab.execute,
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                self.assertIs(
+                    data['expected'],
+                    executors.get_executor(**data['kwargs']),
+                )
+        self.assertIsInstance(
+            executors.get_executor('threads'),
+            executors.ThreadExecutor,
+        )
+        with fab.settings(executor='threads'):
+            self.assertIsInstance(
+                executors.get_executor(),
+                executors.ThreadExecutor,
+            )
+        with self.assertRaises(ValueError):
+            executors.get_executor('unknown')
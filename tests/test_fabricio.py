@@ -1,11 +1,18 @@
+import os
+import subprocess
+import tempfile
+
 import mock
+import six
 import unittest2 as unittest
 
 from fabric import api as fab
 
 import fabricio
 
-from tests import SucceededResult
+from fabricio import retry
+
+from tests import SucceededResult, FailedResult
 
 
 class FabricioTestCase(unittest.TestCase):
@@ -109,3 +116,197 @@ class FabricioTestCase(unittest.TestCase):
             self.assertEqual(run.call_count, 3)
             fabricio.run('command', cache_salt='key2', use_cache=True)
             self.assertEqual(run.call_count, 3)
+
+    def test_run_with_stream(self):
+        with mock.patch.object(fab, 'run', return_value=SucceededResult()) as run:
+            run.__name__ = 'mocked_run'
+            with tempfile.NamedTemporaryFile(suffix='-{host}-{0}.log') as log:
+                with fab.settings(host='host1'):
+                    fabricio.run('command', stream=log.name)
+                path = log.name.replace('{host}', 'host1')
+                self.addCleanup(os.remove, path)
+            stdout = run.call_args[1]['stdout']
+            self.assertEqual(path, stdout.name)
+            self.assertTrue(stdout.closed)
+            run.assert_called_once_with(
+                'command',
+                stdout=stdout,
+                stderr=stdout,
+                capture_buffer_size=fabricio.run.buffer_size,
+            )
+
+    def test_printed_output_is_not_truncated(self):
+        output = 'x' * (fabricio.run.buffer_size * 2)
+        with mock.patch.object(fab, 'run', return_value=SucceededResult(output)) as run:
+            run.__name__ = 'mocked_run'
+            self.assertEqual(output, fabricio.run('command', quiet=False))
+            run.assert_called_once_with('command', stdout=mock.ANY, stderr=mock.ANY)
+        command = 'printf "%0{size}d" 0'.format(size=fabricio.local.buffer_size * 2)
+        with fab.settings(fab.hide('stdout')):
+            result = fabricio.local(command, capture=True, quiet=False)
+        self.assertEqual(fabricio.local.buffer_size * 2, len(result))
+        with mock.patch.dict(retry.policies, pull=retry.RetryPolicy(attempts=1)):
+            with fab.settings(fab.hide('stdout')), retry.attached('pull'):
+                result = fabricio.local(command, capture=True, quiet=False)
+        self.assertEqual(fabricio.local.buffer_size * 2, len(result))
+
+    def test_local_streaming(self):
+        command = 'for i in 1 2 3; do echo line$i; echo err$i >&2; done'
+        stream = six.StringIO()
+        with fab.settings(fab.show('stdout')):
+            result = fabricio.local(command, stream=stream, buffer_size=11)
+        self.assertEqual(
+            'line1\nerr1\nline2\nerr2\nline3\nerr3\n',
+            stream.getvalue(),
+        )
+        self.assertEqual('line3\nerr3', result)
+        self.assertEqual('', fabricio.local(command, buffer_size=1))
+        with self.assertRaises(fabricio.Error):
+            fabricio.local('exit 1', buffer_size=1)
+
+
+class BatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fab_settings = fab.settings(fab.hide('everything'))
+        self.fab_settings.__enter__()
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+
+    @staticmethod
+    def make_output(*chunks):
+        # Fabric runs commands with pty by default, so stderr markers
+        # are merged into stdout and lines end with '\r\n'
+        return FailedResult('\r\n'.join(
+            '{output}\r\n\r\n__fabricio_batch__ {number} {status}\r\n'
+            '\r\n__fabricio_batch_stderr__ {number} {status}'.format(
+                output=output,
+                number=number,
+                status=status,
+            )
+            for number, (output, status) in enumerate(chunks)
+        ))
+
+    def test_batch(self):
+        output = self.make_output(('out1', 0), ('', 1), ('out3', 0))
+        with mock.patch.object(fab, 'run', return_value=output) as run:
+            run.__name__ = 'mocked_run'
+            with fabricio.batch() as batch:
+                command1 = fabricio.run('command1')
+                command2 = fabricio.run('command2', ignore_errors=True)
+                with fabricio.batch() as nested_batch:
+                    self.assertIs(batch, nested_batch)
+                    command3 = fabricio.run('command3', quiet=True)
+                run.assert_not_called()
+            run.assert_called_once()
+            script = run.call_args[0][0]
+            self.assertIn('(\ncommand1\n)', script)
+            self.assertIn('(\ncommand2\n)', script)
+            self.assertIn('(\ncommand3\n)', script)
+        self.assertEqual('out1', command1.result)
+        self.assertTrue(command1.result.succeeded)
+        self.assertEqual('', command2.result)
+        self.assertTrue(command2.result.failed)
+        self.assertEqual(1, command2.result.return_code)
+        self.assertEqual('out3', command3.result)
+
+    def test_batch_script_output(self):
+        batch = fabricio.operations.Batch()
+        commands = [
+            batch.add('echo out1; echo err1 >&2'),
+            batch.add('echo out2; exit 3', ignore_errors=True),
+            batch.add('echo out3'),
+        ]
+        script = batch.make_script(commands)
+        cases = dict(
+            merged_stderr=dict(
+                stderr=subprocess.STDOUT,
+                expected_output=['out1\nerr1', 'out2', 'out3'],
+                expected_stderr=['', '', ''],
+            ),
+            separate_stderr=dict(
+                stderr=subprocess.PIPE,
+                expected_output=['out1', 'out2', 'out3'],
+                expected_stderr=['err1', '', ''],
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                process = subprocess.Popen(
+                    ['sh', '-c', script],
+                    stdout=subprocess.PIPE,
+                    stderr=data['stderr'],
+                    universal_newlines=True,
+                )
+                stdout, stderr = process.communicate()
+                result = SucceededResult(stdout)
+                result.stderr = stderr or ''
+                batch.set_results(commands, result)
+                self.assertListEqual(
+                    data['expected_output'],
+                    [command.result for command in commands],
+                )
+                self.assertListEqual(
+                    data['expected_stderr'],
+                    [command.result.stderr for command in commands],
+                )
+                self.assertListEqual(
+                    [0, 3, 0],
+                    [command.result.return_code for command in commands],
+                )
+
+    def test_batch_result_is_not_available_before_execution(self):
+        with mock.patch.object(fab, 'run', return_value=self.make_output(('out1', 0), ('out2', 0))) as run:  # noqa
+            run.__name__ = 'mocked_run'
+            with fabricio.batch():
+                command = fabricio.run('command1')
+                fabricio.run('command2')
+                with self.assertRaises(RuntimeError):
+                    command.splitlines()
+                with self.assertRaises(RuntimeError):
+                    bool(command)
+        self.assertEqual('out1', str(command))
+        self.assertTrue(command.succeeded)
+        self.assertEqual(['out1'], command.splitlines())
+
+    def test_batch_raises_abort_exception_of_failed_command(self):
+        class CustomError(fabricio.Error):
+            pass
+        output = self.make_output(('', 0), ('error', 1))
+        with mock.patch.object(fab, 'run', return_value=output) as run:
+            run.__name__ = 'mocked_run'
+            with self.assertRaises(CustomError):
+                with fabricio.batch():
+                    fabricio.run('command1')
+                    command = fabricio.run('command2', abort_exception=CustomError)
+                    fabricio.run('command3')
+        self.assertEqual('error', command.result)
+
+    def test_batch_of_single_command(self):
+        with mock.patch.object(fab, 'run', return_value=SucceededResult('out')) as run:
+            run.__name__ = 'mocked_run'
+            with fabricio.batch():
+                command = fabricio.run('command', ignore_errors=True)
+            run.assert_called_once_with('command', stdout=mock.ANY, stderr=mock.ANY)
+        self.assertEqual('out', command.result)
+
+    def test_batch_executes_queue_before_not_batchable_command(self):
+        with mock.patch.object(fab, 'run', return_value=SucceededResult('out')) as run:
+            run.__name__ = 'mocked_run'
+            with fabricio.batch():
+                fabricio.run('command1')
+                result = fabricio.run('command2', use_cache=True)
+                fabricio.run('command3', quiet=False)
+                fabricio.run('command4')
+            self.assertListEqual(
+                [
+                    mock.call('command1', stdout=mock.ANY, stderr=mock.ANY),
+                    mock.call('command2', stdout=mock.ANY, stderr=mock.ANY),
+                    mock.call('command3', stdout=mock.ANY, stderr=mock.ANY),
+                    mock.call('command4', stdout=mock.ANY, stderr=mock.ANY),
+                ],
+                run.mock_calls,
+            )
+        self.assertEqual('out', result)
+        fabricio.run.cache.clear()
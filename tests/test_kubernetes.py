@@ -11,7 +11,8 @@ import fabricio
 
 from fabricio import docker, utils, kubernetes
 from fabricio.docker import stack as stack_module
-from tests import SucceededResult, args_parser, FabricioTestCase, FailedResult
+from tests import SucceededResult, args_parser, FabricioTestCase, FailedResult, \
+    inspect_all_call, inspect_all_result
 
 
 def as_ordereddict(result):
@@ -23,6 +24,7 @@ class ConfigurationTestCase(FabricioTestCase):
     maxDiff = None
 
     def setUp(self):
+        self.addCleanup(docker.inspection.clear)
         stack_module.open = mock.MagicMock()
         self.cd = mock.patch.object(fab, 'cd')
         self.cd.start()
@@ -66,7 +68,7 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['rm', '-f', 'k8s.yml']},
                 ],
                 expected_result=False,
@@ -87,7 +89,7 @@ class ConfigurationTestCase(FabricioTestCase):
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-backup-kubernetes:k8s;', 'docker', 'tag', 'fabricio-current-kubernetes:k8s', 'fabricio-backup-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-current-kubernetes:k8s']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['echo', 'FROM scratch\nLABEL fabricio.configuration=azhzLnltbA== fabricio.digests=e30=\n', '|', 'docker', 'build', '--tag', 'fabricio-current-kubernetes:k8s', '-']},
@@ -111,9 +113,9 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-backup-kubernetes:k8s;', 'docker', 'tag', 'fabricio-current-kubernetes:k8s', 'fabricio-backup-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-current-kubernetes:k8s']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['echo', 'FROM scratch\nLABEL fabricio.configuration=azhzLnltbA== fabricio.digests=e30=\n', '|', 'docker', 'build', '--tag', 'fabricio-current-kubernetes:k8s', '-']},
@@ -137,9 +139,9 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-backup-kubernetes:k8s;', 'docker', 'tag', 'fabricio-current-kubernetes:k8s', 'fabricio-backup-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-current-kubernetes:k8s']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['echo', 'FROM scratch\nLABEL fabricio.configuration=azhzLnltbA== fabricio.digests=e30=\n', '|', 'docker', 'build', '--tag', 'fabricio-current-kubernetes:k8s', '-']},
@@ -163,9 +165,9 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-backup-kubernetes:k8s;', 'docker', 'tag', 'fabricio-current-kubernetes:k8s', 'fabricio-backup-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-current-kubernetes:k8s']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['echo', 'FROM scratch\nLABEL fabricio.configuration=azhzLnltbA==\n', '|', 'docker', 'build', '--tag', 'fabricio-current-kubernetes:k8s', '-']},
@@ -189,9 +191,9 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-backup-kubernetes:k8s;', 'docker', 'tag', 'fabricio-current-kubernetes:k8s', 'fabricio-backup-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-current-kubernetes:k8s']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['echo', 'FROM image:tag\nLABEL fabricio.configuration=azhzLnltbA== fabricio.digests=e30=\n', '|', 'docker', 'build', '--tag', 'fabricio-current-kubernetes:k8s', '-']},
@@ -215,9 +217,9 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-backup-kubernetes:k8s;', 'docker', 'tag', 'fabricio-current-kubernetes:k8s', 'fabricio-backup-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-current-kubernetes:k8s']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['echo', 'FROM registry/account/image:new-tag\nLABEL fabricio.configuration=azhzLnltbA== fabricio.digests=e30=\n', '|', 'docker', 'build', '--tag', 'fabricio-current-kubernetes:k8s', '-']},
@@ -241,9 +243,9 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-backup-kubernetes:k8s;', 'docker', 'tag', 'fabricio-current-kubernetes:k8s', 'fabricio-backup-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-current-kubernetes:k8s']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['echo', 'FROM registry/account/image:tag\nLABEL fabricio.configuration=azhzLnltbA== fabricio.digests=e30=\n', '|', 'docker', 'build', '--tag', 'fabricio-current-kubernetes:k8s', '-']},
@@ -274,9 +276,9 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-backup-kubernetes:k8s', 'backup_parent_id;', 'docker', 'tag', 'fabricio-current-kubernetes:k8s', 'fabricio-backup-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-current-kubernetes:k8s']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['docker', 'tag', 'image:tag', 'fabricio-temp-image:image', '&&', 'docker', 'rmi', 'image:tag']}, {'args': ['docker', 'pull', 'image:tag']}, {'args': ['docker', 'rmi', 'fabricio-temp-image:image']},
@@ -311,11 +313,11 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'tag', 'image:tag', 'fabricio-temp-image:image', '&&', 'docker', 'rmi', 'image:tag']}, {'args': ['docker', 'pull', 'image:tag']}, {'args': ['docker', 'rmi', 'fabricio-temp-image:image']},
                     {'args': ['docker', 'inspect', '--type', 'image', '--format', '{{index .RepoDigests 0}}', 'image:tag']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-backup-kubernetes:k8s', 'backup_parent_id;', 'docker', 'tag', 'fabricio-current-kubernetes:k8s', 'fabricio-backup-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-current-kubernetes:k8s']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['docker', 'tag', 'image:tag', 'fabricio-temp-image:image', '&&', 'docker', 'rmi', 'image:tag']}, {'args': ['docker', 'pull', 'image:tag']}, {'args': ['docker', 'rmi', 'fabricio-temp-image:image']},
@@ -352,12 +354,12 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'tag', 'image1:tag', 'fabricio-temp-image:image1', '&&', 'docker', 'rmi', 'image1:tag']}, {'args': ['docker', 'pull', 'image1:tag']}, {'args': ['docker', 'rmi', 'fabricio-temp-image:image1']},
                     {'args': ['docker', 'tag', 'image2:tag', 'fabricio-temp-image:image2', '&&', 'docker', 'rmi', 'image2:tag']}, {'args': ['docker', 'pull', 'image2:tag']}, {'args': ['docker', 'rmi', 'fabricio-temp-image:image2']},
                     {'args': ['docker', 'inspect', '--type', 'image', '--format', '{{index .RepoDigests 0}}', 'image1:tag', 'image2:tag']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-backup-kubernetes:k8s', 'backup_parent_id;', 'docker', 'tag', 'fabricio-current-kubernetes:k8s', 'fabricio-backup-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-current-kubernetes:k8s']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['docker', 'tag', 'image1:tag', 'fabricio-temp-image:image1', '&&', 'docker', 'rmi', 'image1:tag']}, {'args': ['docker', 'pull', 'image1:tag']}, {'args': ['docker', 'rmi', 'fabricio-temp-image:image1']},
@@ -428,10 +430,10 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
                     {'args': ['rm', '-f', 'k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-current-kubernetes:k8s', 'current_parent_id;', 'docker', 'tag', 'fabricio-backup-kubernetes:k8s', 'fabricio-current-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-backup-kubernetes:k8s']},
                 ],
                 expected_compose_file=b'old-compose.yml',
@@ -455,12 +457,12 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['kubectl', 'set', 'image', 'kind', 'name=digest']},
                     {'args': ['rm', '-f', 'k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-current-kubernetes:k8s', 'current_parent_id;', 'docker', 'tag', 'fabricio-backup-kubernetes:k8s', 'fabricio-current-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-backup-kubernetes:k8s']},
                 ],
                 expected_compose_file=b'compose.yml',
@@ -485,13 +487,13 @@ class ConfigurationTestCase(FabricioTestCase):
                 ],
                 expected_command_args=[
                     {'args': ['kubectl', 'config', 'current-context']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['kubectl', 'apply', '--filename=k8s.yml']},
                     {'args': ['kubectl', 'get', '--output=go-template', '--filename=k8s.yml', r'--template={{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}']},
                     {'args': ['kubectl', 'set', 'image', 'kind1', 'name1=digest1']},
                     {'args': ['kubectl', 'set', 'image', 'kind2', 'name2=digest2']},
                     {'args': ['rm', '-f', 'k8s.yml']},
-                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s']},
+                    {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-current-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
                     {'args': ['docker', 'rmi', 'fabricio-current-kubernetes:k8s', 'current_parent_id;', 'docker', 'tag', 'fabricio-backup-kubernetes:k8s', 'fabricio-current-kubernetes:k8s;', 'docker', 'rmi', 'fabricio-backup-kubernetes:k8s']},
                 ],
                 expected_compose_file=b'compose.yml',
@@ -530,7 +532,7 @@ class ConfigurationTestCase(FabricioTestCase):
             args_parsers=args_parser,
             expected_args_set=[
                 {'args': ['kubectl', 'config', 'current-context']},
-                {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s']},
+                {'args': ['docker', 'inspect', '--type', 'image', 'fabricio-backup-kubernetes:k8s', '--format', '[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]']},
             ],
             side_effects=[
                 SucceededResult(),  # manager status
@@ -560,7 +562,16 @@ class ConfigurationTestCase(FabricioTestCase):
     @mock.patch.object(fab, 'put')
     @mock.patch.object(fabricio, 'run')
     def test_destroy(self, run, put, *_):
-        run.side_effect = [SucceededResult('kind/name image-name image')] + [SucceededResult('[{"Parent": "parent_id"}]')] * 5
+        run.side_effect = [
+            SucceededResult('kind/name image-name image'),
+            SucceededResult(),
+            inspect_all_result(
+                ('[{"Parent": "parent_id"}]', 0),
+                ('[{"Parent": "parent_id"}]', 0),
+            ),
+            SucceededResult(),
+            SucceededResult(),
+        ]
         with mock.patch('fabricio.operations.run', run):
             config = kubernetes.Configuration(name='name', options=dict(filename='config.yml'))
             config.destroy()
@@ -568,11 +579,47 @@ class ConfigurationTestCase(FabricioTestCase):
                 [
                     mock.call('kubectl get --output=go-template --filename=config.yml --template=\'{{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}\''),
                     mock.call('kubectl delete --filename=config.yml'),
-                    mock.call('docker inspect --type image fabricio-current-kubernetes:name', abort_exception=docker.ImageNotFoundError),
-                    mock.call('docker inspect --type image fabricio-backup-kubernetes:name', abort_exception=docker.ImageNotFoundError),
+                    inspect_all_call(
+                        'docker inspect --type image fabricio-current-kubernetes:name'
+                        ' --format \'[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]\'',
+                        'docker inspect --type image fabricio-backup-kubernetes:name'
+                        ' --format \'[{"Parent":{{json .Parent}},"Config":{"Labels":{{json .Config.Labels}}}}]\'',
+                    ),
                     mock.call('docker rmi fabricio-current-kubernetes:name fabricio-backup-kubernetes:name parent_id parent_id image', ignore_errors=True),
                     mock.call('rm -f config.yml', ignore_errors=True, sudo=False),
                 ],
                 run.mock_calls,
             )
             put.assert_called_once_with(b'configuration', 'config.yml')
+
+    @mock.patch.object(kubernetes.Configuration, 'is_manager', return_value=True)
+    @mock.patch.object(kubernetes.Configuration, 'get_configuration', return_value=b'configuration')
+    @mock.patch.object(six, 'BytesIO', bytes)
+    @mock.patch.object(fab, 'put')
+    @mock.patch.object(fabricio, 'run')
+    def test_wait_rollout(self, run, put, *_):
+        run.side_effect = [
+            SucceededResult(
+                'Deployment/web web image1\n'
+                'Pod/pod pod image2\n'
+                'StatefulSet/db db image3\n'
+            ),
+            SucceededResult(),
+            SucceededResult(),
+            SucceededResult(),
+        ]
+        fab.env.command = 'test_kubernetes_wait_rollout'
+        config = kubernetes.Configuration(name='name', options=dict(filename='config.yml'))
+        with mock.patch('fabricio.operations.run', run):
+            with mock.patch.object(kubernetes.time, 'time', side_effect=[100, 100, 130]):
+                config.wait_rollout(timeout=60)
+        self.assertListEqual(
+            [
+                mock.call('kubectl get --output=go-template --filename=config.yml --template=\'{{define "images"}}{{$kind := .kind}}{{$name := .metadata.name}}{{with .spec.template.spec.containers}}{{range .}}{{$kind}}/{{$name}} {{.name}} {{.image}}{{"\\n"}}{{end}}{{end}}{{end}}{{if eq .kind "List"}}{{range .items}}{{template "images" .}}{{end}}{{else}}{{template "images" .}}{{end}}\''),
+                mock.call('rm -f config.yml', ignore_errors=True, sudo=False),
+                mock.call('kubectl rollout status --timeout=60s deployment/web', abort_exception=docker.RolloutError),
+                mock.call('kubectl rollout status --timeout=30s statefulset/db', abort_exception=docker.RolloutError),
+            ],
+            run.mock_calls,
+        )
+        put.assert_called_once_with(b'configuration', 'config.yml')
@@ -0,0 +1,106 @@
+import threading
+
+import mock
+import six
+import unittest2 as unittest
+
+from fabric import api as fab, colors
+
+import fabricio
+
+from fabricio import executors, logger
+from tests import SucceededResult
+
+
+class LoggerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fab_settings = fab.settings(
+            fab.hide('everything'),
+            fab.show('user'),
+        )
+        self.fab_settings.__enter__()
+        self.addCleanup(logger.flush)
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+
+    def test_log(self):
+        cases = dict(
+            host=dict(
+                settings=dict(host_string='host'),
+                expected='[host] \x1b[31mmessage\x1b[0m\n',
+            ),
+            no_host=dict(
+                settings=dict(host_string=None),
+                expected='\x1b[31mmessage\x1b[0m\n',
+            ),
+            no_prefix=dict(
+                settings=dict(host_string='host', output_prefix=False),
+                expected='\x1b[31mmessage\x1b[0m\n',
+            ),
+            grouping=dict(
+                settings=dict(host_string='host', output_grouping='yes'),
+                expected='',
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                output = six.StringIO()
+                with fab.settings(**data['settings']):
+                    fabricio.log('message', color=colors.red, output=output)
+                self.assertEqual(data['expected'], output.getvalue())
+        logger.flush()
+        self.assertEqual('[host] \x1b[31mmessage\x1b[0m\n', output.getvalue())
+
+    def test_grouped_output_of_threads(self):
+        output = six.StringIO()
+        host1_logged = threading.Event()
+        host2_finished = threading.Event()
+
+        def log(message):
+            fabricio.log(message, color=six.text_type, output=output)
+
+        @fab.task
+        def task():
+            if fab.env.host == 'host1':
+                log('message1')
+                host1_logged.set()
+                host2_finished.wait(5)
+                log('message2')
+            else:
+                host1_logged.wait(5)
+                log('message1')
+                log('message2')
+                host2_finished.set()
+
+        with fab.settings(output_grouping='yes'):
+            executors.ThreadExecutor(pool_size=2)(
+                task,
+                hosts=['host1', 'host2'],
+            )
+        self.assertListEqual(
+            [
+                '[host2] message1',
+                '[host2] message2',
+                '[host1] message1',
+                '[host1] message2',
+            ],
+            output.getvalue().splitlines(),
+        )
+
+    @mock.patch.object(fab, 'run')
+    def test_grouped_output_of_fabric_command(self, run):
+        run.__name__ = 'run'
+
+        def fabric_run(command, stdout=None, **kwargs):
+            stdout.write('[host] out: output\n')
+            return SucceededResult()
+
+        run.side_effect = fabric_run
+        output = six.StringIO()
+        with fab.settings(host_string='host', output_grouping='yes'):
+            fabricio.run('command', quiet=False, stdout=output)
+            self.assertEqual('', output.getvalue())
+            logger.flush('host')
+        self.assertEqual('[host] out: output\n', output.getvalue())
@@ -0,0 +1,158 @@
+import mock
+import unittest2 as unittest
+
+from fabric import api as fab
+from fabric.exceptions import NetworkError
+
+import fabricio
+
+from fabricio import docker, retry
+from tests import SucceededResult, FailedResult
+
+
+def failed(return_code=1, stderr=''):
+    result = FailedResult()
+    result.return_code, result.stderr = return_code, stderr
+    return result
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+
+    def test_is_retryable(self):
+        cases = dict(
+            ssh_failure=dict(
+                attempt=1,
+                result=failed(return_code=255),
+                expected=True,
+            ),
+            last_attempt=dict(
+                attempt=3,
+                result=failed(return_code=255),
+                expected=False,
+            ),
+            transient_stderr=dict(
+                attempt=1,
+                result=failed(stderr='net/http: TLS handshake timeout'),
+                expected=True,
+            ),
+            registry_5xx=dict(
+                attempt=2,
+                result=failed(stderr='received unexpected HTTP status: 503'),
+                expected=True,
+            ),
+            not_found=dict(
+                attempt=1,
+                result=failed(stderr='Error: No such image: image'),
+                expected=False,
+            ),
+            network_error=dict(
+                attempt=1,
+                exception=NetworkError('error'),
+                expected=True,
+            ),
+            abort_by_transient_error=dict(
+                attempt=1,
+                exception=fabricio.Error('connection reset by peer'),
+                expected=True,
+            ),
+            abort=dict(
+                attempt=1,
+                exception=fabricio.Error('error'),
+                expected=False,
+            ),
+        )
+        policy = retry.RetryPolicy(attempts=3)
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                self.assertEqual(
+                    data['expected'],
+                    policy.is_retryable(
+                        data['attempt'],
+                        result=data.get('result'),
+                        exception=data.get('exception'),
+                    ),
+                )
+
+    def test_get_delay(self):
+        policy = retry.RetryPolicy(delay=1, backoff=2, max_delay=5, jitter=0.5)
+        for attempt, delay in ((1, 1), (2, 2), (3, 4), (4, 5), (10, 5)):
+            with self.subTest(attempt=attempt):
+                self.assertGreaterEqual(policy.get_delay(attempt), delay * 0.5)
+                self.assertLessEqual(policy.get_delay(attempt), delay * 1.5)
+
+
+@mock.patch('time.sleep')
+class RetryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fab_settings = fab.settings(fab.hide('everything', 'aborts'))
+        self.fab_settings.__enter__()
+        policies = dict(retry.policies)
+        self.addCleanup(retry.policies.update, policies)
+        retry.policies['pull'] = retry.RetryPolicy(attempts=3)
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+
+    @mock.patch.object(fab, 'run')
+    def test_run(self, run, sleep):
+        run.__name__ = 'run'
+        cases = dict(
+            retried=dict(
+                side_effect=[failed(255), NetworkError(), SucceededResult()],
+                expected_calls=3,
+            ),
+            not_retryable=dict(
+                side_effect=[failed(1)],
+                expected_calls=1,
+                expected_exception=fabricio.Error,
+            ),
+            attempts_are_over=dict(
+                side_effect=[failed(255)] * 3,
+                expected_calls=3,
+                expected_exception=fabricio.Error,
+            ),
+            attempts_are_over_ignore_errors=dict(
+                side_effect=[failed(255)] * 3,
+                expected_calls=3,
+                ignore_errors=True,
+            ),
+            no_policy=dict(
+                side_effect=[SucceededResult()],
+                operation='push',
+                expected_calls=1,
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                run.reset_mock()
+                run.side_effect = data['side_effect']
+                with retry.attached(data.get('operation', 'pull')):
+                    if 'expected_exception' in data:
+                        with self.assertRaises(data['expected_exception']):
+                            fabricio.run('command')
+                    else:
+                        fabricio.run(
+                            'command',
+                            ignore_errors=data.get('ignore_errors', False),
+                        )
+                self.assertEqual(data['expected_calls'], run.call_count)
+                for args, kwargs in run.call_args_list:
+                    self.assertNotIn('attempt', kwargs)
+        self.assertIsNone(retry.current())
+
+    @mock.patch.object(fab, 'run')
+    def test_image_not_found_is_not_retried(self, run, sleep):
+        run.__name__ = 'run'
+        run.return_value = failed(1, stderr='Error: No such image: image')
+        with fab.settings(retry_attempts='3'):
+            with self.assertRaises(docker.ImageNotFoundError):
+                docker.Image('image').info
+        run.assert_called_once()
+        sleep.assert_not_called()
+
+    def test_get_policy(self, sleep):
+        self.assertIsNone(retry.get_policy('push'))
+        with fab.settings(retry_attempts='5'):
+            self.assertEqual(5, retry.get_policy('push').attempts)
+        self.assertIs(retry.policies['pull'], retry.get_policy('pull'))
@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import mock
+import unittest2 as unittest
+
+from fabric import api as fab
+
+import fabricio
+
+from fabricio import singleflight, utils
+from tests import SucceededResult
+
+
+class SingleFlightTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fab_settings = fab.settings(fab.hide('everything'))
+        self.fab_settings.__enter__()
+        self.addCleanup(fabricio.local.cache.clear)
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+
+    @staticmethod
+    def start_workers(target, number, factory=threading.Thread):
+        workers = [factory(target=target) for _ in range(number)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def test_threads(self):
+        started = threading.Event()
+        results = []
+
+        def local(command, **kwargs):
+            started.set()
+            time.sleep(0.3)
+            return SucceededResult('result')
+
+        def worker():
+            results.append(fabricio.local('command', use_cache=True))
+
+        with mock.patch.object(fab, 'local', side_effect=local) as fab_local:
+            fab_local.__name__ = 'local'
+            leader = threading.Thread(target=worker)
+            leader.start()
+            started.wait(5)
+            self.start_workers(worker, 4)
+            leader.join()
+        fab_local.assert_called_once()
+        self.assertListEqual(['result'] * 5, results)
+
+    def test_run_is_merged_per_host(self):
+        self.addCleanup(fabricio.run.cache.clear)
+
+        def run(command, **kwargs):
+            time.sleep(0.3)
+            return SucceededResult(fab.env.host)
+
+        def worker(host):
+            with utils.isolated_env(host=host, host_string=host):
+                results.append((host, fabricio.run('command', use_cache=True)))
+
+        results = []
+        with mock.patch.object(fab, 'run', side_effect=run) as fab_run:
+            fab_run.__name__ = 'run'
+            workers = [
+                threading.Thread(target=worker, args=(host, ))
+                for host in ('host1', 'host1', 'host2', 'host2')
+            ]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+        self.assertEqual(2, fab_run.call_count)  # once per host
+        self.assertListEqual(
+            [('host1', 'host1')] * 2 + [('host2', 'host2')] * 2,
+            sorted(results),
+        )
+
+    def test_processes(self):
+        counter = os.path.join(self.temp_dir, 'counter')
+        command = 'echo x >> {0}; sleep 0.5; echo result'.format(counter)
+
+        def worker():
+            fabricio.local(command, capture=True, use_cache=True)
+
+        self.start_workers(worker, 3, factory=multiprocessing.Process)
+        with open(counter) as counter_file:
+            self.assertEqual(1, len(counter_file.readlines()))
+
+    def test_failed_leader(self):
+        leader_started = threading.Event()
+        results = []
+
+        def fail():
+            leader_started.set()
+            time.sleep(0.2)
+            raise fabricio.Error
+
+        def leader():
+            with self.assertRaises(fabricio.Error):
+                singleflight.call(b'key', fail)
+
+        thread = threading.Thread(target=leader)
+        thread.start()
+        leader_started.wait(5)
+        results.append(singleflight.call(b'key', lambda: 'follower'))
+        thread.join()
+        self.assertListEqual([('follower', True)], results)
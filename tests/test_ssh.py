@@ -0,0 +1,154 @@
+import io
+
+import mock
+import six
+import unittest2 as unittest
+
+from fabric import api as fab
+from fabric.exceptions import NetworkError
+
+import fabricio
+
+from fabricio import ssh
+from tests import SucceededResult
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fab_settings = fab.settings(
+            fab.hide('everything'),
+            host_string='user@host:2222',
+            ssh_multiplexing='yes',
+        )
+        self.fab_settings.__enter__()
+        self.addCleanup(setattr, ssh, '_pool', None)
+        ssh._pool = None
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+
+    @staticmethod
+    def make_process(stdout=b'', stderr=b'', returncode=0):
+        process = mock.Mock(returncode=returncode)
+        process.communicate.return_value = stdout, stderr
+        return process
+
+    def test_run(self):
+        cases = dict(
+            new_master=dict(
+                check_status=255,
+                expected_calls=[
+                    mock.call.check,
+                    mock.call.start,
+                ],
+            ),
+            existing_master=dict(
+                check_status=0,
+                expected_calls=[
+                    mock.call.check,
+                ],
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                ssh._pool = None
+                calls = mock.Mock()
+
+                def call(args, **kwargs):
+                    if '-O' in args:
+                        calls.check()
+                        return data['check_status']
+                    calls.start()
+                    self.assertIn('-M', args)
+                    return 0
+
+                with mock.patch('subprocess.call', side_effect=call):
+                    with mock.patch(
+                        'subprocess.Popen',
+                        return_value=self.make_process(b'output\n'),
+                    ) as popen:
+                        self.assertEqual('output', fabricio.run('command1'))
+                        self.assertEqual('output', fabricio.run('command2'))
+                self.assertListEqual(data['expected_calls'], calls.mock_calls)
+                self.assertEqual(2, popen.call_count)
+                args = popen.call_args[0][0]
+                self.assertEqual(
+                    [
+                        'ssh',
+                        '-o', 'ControlMaster=auto',
+                        '-o', 'ControlPath=~/.ssh/fabricio-%C',
+                        '-o', 'ControlPersist=600',
+                        '-o', 'BatchMode=yes',
+                        '-p', '2222',
+                        '-l', 'user',
+                    ],
+                    args[:13],
+                )
+                self.assertEqual('host', args[-2])
+                self.assertIn('command2', args[-1])
+                self.assertIn('user@host:2222', ssh._pool.connect_times)
+
+    def test_connection_failed(self):
+        def call(args, stderr=None, **kwargs):
+            if '-O' in args:
+                return 255  # no master connection
+            stderr.write(b'Permission denied (publickey).\n')
+            return 255
+
+        with mock.patch('subprocess.call', side_effect=call):
+            with mock.patch('subprocess.Popen') as popen:
+                with self.assertRaises(NetworkError) as context:
+                    fabricio.run('command')
+                with self.assertRaises(NetworkError):
+                    fabricio.run('command', ignore_errors=True)
+        self.assertEqual(
+            'could not connect to user@host:2222 (ssh exit code 255): '
+            'Permission denied (publickey).',
+            str(context.exception),
+        )
+        popen.assert_not_called()
+        self.assertNotIn('user@host:2222', ssh._pool.connect_times)
+
+    @mock.patch('subprocess.call', return_value=0)
+    def test_run_failed(self, *args):
+        process = self.make_process(b'output', b'error', returncode=1)
+        with mock.patch('subprocess.Popen', return_value=process):
+            with self.assertRaises(fabricio.Error):
+                fabricio.run('command')
+            result = fabricio.run('command', ignore_errors=True)
+        self.assertTrue(result.failed)
+        self.assertEqual(1, result.return_code)
+        self.assertEqual('output', result)
+        self.assertEqual('error', result.stderr)
+
+    @mock.patch('subprocess.call', return_value=0)
+    @mock.patch('subprocess.Popen')
+    def test_sudo_is_executed_by_fabric(self, popen, *args):
+        with mock.patch.object(fab, 'sudo', return_value=SucceededResult()) as sudo:
+            sudo.__name__ = 'sudo'
+            fabricio.run('command', sudo=True)
+        sudo.assert_called_once()
+        popen.assert_not_called()
+
+    def test_get_pool(self):
+        self.assertIsInstance(ssh.get_pool(), ssh.ConnectionPool)
+        self.assertIs(ssh.get_pool(), ssh.get_pool())
+        with fab.settings(ssh_multiplexing='no'):
+            self.assertIsNone(ssh.get_pool())
+
+    @mock.patch('subprocess.call', return_value=0)
+    def test_run_streams_output(self, *args):
+        process = mock.Mock(returncode=0)
+        process.stdout = io.BytesIO(b'line1\nline2\nline3\n')
+        stream = six.StringIO()
+        with mock.patch('subprocess.Popen', return_value=process):
+            with fab.settings(fab.show('stdout')):
+                result = fabricio.run('command', stream=stream, buffer_size=6)
+        self.assertEqual('line3', result)
+        self.assertEqual(
+            '[user@host:2222] out: line1\n'
+            '[user@host:2222] out: line2\n'
+            '[user@host:2222] out: line3\n',
+            stream.getvalue(),
+        )
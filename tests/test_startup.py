@@ -0,0 +1,52 @@
+import json
+import subprocess
+import sys
+
+import unittest2 as unittest
+
+
+def get_imported_modules(statement):
+    """
+    returns names of modules imported by the statement executed
+    by the new interpreter
+    """
+    output = subprocess.check_output([
+        sys.executable,
+        '-c',
+        '{statement}; import json, sys; print(json.dumps(sorted(sys.modules)))'
+        ''.format(statement=statement),
+    ])
+    return set(json.loads(output.decode('utf-8').splitlines()[-1]))
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'lazy loading requires 3.7+')
+class StartupTestCase(unittest.TestCase):
+
+    # subsystems which are loaded on first use only
+    lazy_modules = (
+        'docker',
+        'sqlite3',
+        'fabricio.docker',
+        'fabricio.tasks',
+    )
+
+    def test_lazy_modules(self):
+        modules = get_imported_modules('import fabric.api; import fabricio')
+        self.assertIn('fabricio', modules)
+        for module in self.lazy_modules:
+            with self.subTest(module=module):
+                self.assertNotIn(module, modules)
+
+    def test_infrastructure_is_loaded_on_first_use(self):
+        modules = get_imported_modules(
+            'from fabricio import infrastructure; '
+            'assert isinstance(infrastructure, type)'
+        )
+        self.assertIn('fabricio.tasks', modules)
+
+    def test_infrastructure_is_class(self):
+        import fabricio
+        from fabricio import tasks
+        self.assertIs(tasks.Infrastructure, fabricio.infrastructure)
+        with self.assertRaises(AttributeError):
+            fabricio.unknown_attribute
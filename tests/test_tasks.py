@@ -198,6 +198,66 @@ class TasksTestCase(unittest.TestCase):
             super(TestTasks2, tasks_list).task3('argument')
 
 
+class CacheTasksTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fab_settings = fab.settings(fab.hide('everything'))
+        self.fab_settings.__enter__()
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+        fabricio.run.cache.clear()
+        fabricio.local.cache.clear()
+
+    def test_clear(self):
+        cases = dict(
+            all=dict(
+                kwargs=dict(),
+                expected_run_commands=[],
+                expected_local_commands=[],
+            ),
+            image=dict(
+                kwargs=dict(image='image'),
+                expected_run_commands=['docker pull other'],
+                expected_local_commands=['docker push image-worker', 'docker push other'],
+            ),
+            image_with_tag=dict(
+                kwargs=dict(image='image:tag'),
+                expected_run_commands=['docker pull image', 'docker pull other'],
+                expected_local_commands=['docker push image-worker', 'docker push other'],
+            ),
+            host=dict(
+                kwargs=dict(hostname='host1'),
+                expected_run_commands=['docker pull other'],
+                expected_local_commands=['docker build --tag=image:tag .', 'docker push image-worker', 'docker push other'],
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                fabricio.run.cache.set('key1', 1, host='host1', command='docker pull image')
+                fabricio.run.cache.set('key2', 2, host='host2', command='docker pull other')
+                fabricio.local.cache.set('key1', 1, command='docker build --tag=image:tag .')
+                fabricio.local.cache.set('key2', 2, command='docker push image-worker')
+                fabricio.local.cache.set('key3', 3, command='docker push other')
+                cache_tasks = tasks.CacheTasks()
+                fab.execute(cache_tasks.clear, **data['kwargs'])
+                self.assertListEqual(
+                    data['expected_run_commands'],
+                    [entry.command for entry in fabricio.run.cache.entries.values()],
+                )
+                self.assertListEqual(
+                    data['expected_local_commands'],
+                    [entry.command for entry in fabricio.local.cache.entries.values()],
+                )
+
+    @mock.patch.object(tasks, 'persist')
+    def test_persistent_cache(self, persist):
+        tasks.CacheTasks()
+        persist.assert_not_called()
+        tasks.CacheTasks(path='.fabricio-cache', ttl=60)
+        persist.assert_called_once_with('.fabricio-cache', ttl=60)
+
+
 class DockerTasksTestCase(unittest.TestCase):
 
     maxDiff = None
@@ -245,13 +305,17 @@ class DockerTasksTestCase(unittest.TestCase):
                 init_kwargs=dict(service='service', destroy_command=True),
                 expected_commands={'deploy', 'destroy'},
             ),
+            wait_task=dict(
+                init_kwargs=dict(service='service', wait_command=True),
+                expected_commands={'deploy', 'wait'},
+            ),
             complex=dict(
                 init_kwargs=dict(service='service', backup_commands=True, migrate_commands=True, registry='registry', revert_command=True, update_command=True, pull_command=True, destroy_command=True),
                 expected_commands={'pull', 'deploy', 'update', 'backup', 'restore', 'migrate', 'migrate-back', 'revert', 'destroy'},
             ),
             task_mode=dict(
                 init_kwargs=dict(service='service', backup_commands=True, migrate_commands=True, registry='registry', revert_command=True, update_command=True, pull_command=True),
-                expected_commands={'pull', 'rollback', 'update', 'backup', 'restore', 'migrate', 'migrate-back', 'prepare', 'push', 'revert', 'upgrade', 'deploy', 'destroy', 'deploy'},
+                expected_commands={'pull', 'rollback', 'update', 'backup', 'restore', 'migrate', 'migrate-back', 'prepare', 'push', 'revert', 'upgrade', 'deploy', 'destroy', 'deploy', 'wait'},
                 env=dict(tasks='task'),
             ),
         )
@@ -294,6 +358,38 @@ class DockerTasksTestCase(unittest.TestCase):
                 fab.execute(data['execute'], 'args', kwargs='kwargs')
                 self.assertListEqual(data['expected_calls'], calls.mock_calls)
 
+    @mock.patch.object(docker.Container, 'destroy', return_value='destroyed')
+    @mock.patch.dict(fab.env, dict(tasks='task'))
+    def test_executor(self, destroy):
+        executor = mock.Mock()
+        tasks_list = tasks.DockerTasks(
+            service=docker.Container(name='name'),
+            executor=executor,
+        )
+        with fab.settings(fab.hide('everything')):
+            fab.execute(tasks_list.deploy, tag='tag')
+        executor.assert_called_once_with(
+            tasks_list.upgrade,
+            tag='tag',
+            force=False,
+            backup=False,
+            migrate=True,
+            wait=False,
+        )
+
+        tasks_list = tasks.DockerTasks(
+            service=docker.Container(name='name'),
+            executor='threads',
+            hosts=['host1', 'host2'],
+        )
+        with fab.settings(fab.hide('everything')):
+            results = tasks_list.destroy.confirm()
+        self.assertDictEqual(
+            {'host1': 'destroyed', 'host2': 'destroyed'},
+            results,
+        )
+        self.assertEqual(2, destroy.call_count)
+
     @mock.patch.dict(fab.env, dict(tasks='task'))
     def test_destroy_details(self):
         class Service(docker.Container):
@@ -347,7 +443,7 @@ class DockerTasksTestCase(unittest.TestCase):
                 init_kwargs=dict(),
                 expected_calls=[
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -359,7 +455,7 @@ class DockerTasksTestCase(unittest.TestCase):
                 init_kwargs=dict(),
                 expected_calls=[
                     mock.call.run('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull registry:5000/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull registry:5000/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -371,7 +467,7 @@ class DockerTasksTestCase(unittest.TestCase):
                 init_kwargs=dict(ssh_tunnel_port=1234),
                 expected_calls=[
                     mock.call.run('docker tag localhost:1234/test:latest fabricio-temp-image:test && docker rmi localhost:1234/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='localhost:1234', account=None),
                     mock.call.update(force=False, tag=None, registry='localhost:1234', account=None),
@@ -382,14 +478,14 @@ class DockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(registry='host:5000'),
                 expected_calls=[
-                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker pull test:latest', quiet=False, use_cache=True, ignore_errors=False),
-                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker tag test:latest host:5000/test:latest', use_cache=True),
-                    mock.call.local('docker push host:5000/test:latest', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi host:5000/test:latest', use_cache=True),
+                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker tag test:latest host:5000/test:latest'),
+                    mock.call.local('docker push host:5000/test:latest', quiet=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi host:5000/test:latest'),
                     mock.call.run('docker tag host:5000/test:latest fabricio-temp-image:test && docker rmi host:5000/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull host:5000/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull host:5000/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='host:5000', account=None),
                     mock.call.update(force=False, tag=None, registry='host:5000', account=None),
@@ -410,14 +506,14 @@ class DockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(registry='host:5000', ssh_tunnel_port=1234),
                 expected_calls=[
-                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker pull test:latest', quiet=False, use_cache=True, ignore_errors=False),
-                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker tag test:latest host:5000/test:latest', use_cache=True),
-                    mock.call.local('docker push host:5000/test:latest', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi host:5000/test:latest', use_cache=True),
+                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker tag test:latest host:5000/test:latest'),
+                    mock.call.local('docker push host:5000/test:latest', quiet=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi host:5000/test:latest'),
                     mock.call.run('docker tag localhost:1234/test:latest fabricio-temp-image:test && docker rmi localhost:1234/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='localhost:1234', account=None),
                     mock.call.update(force=False, tag=None, registry='localhost:1234', account=None),
@@ -438,14 +534,14 @@ class DockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(account='account'),
                 expected_calls=[
-                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker pull test:latest', quiet=False, use_cache=True, ignore_errors=False),
-                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker tag test:latest account/test:latest', use_cache=True),
-                    mock.call.local('docker push account/test:latest', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi account/test:latest', use_cache=True),
+                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker tag test:latest account/test:latest'),
+                    mock.call.local('docker push account/test:latest', quiet=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi account/test:latest'),
                     mock.call.run('docker tag account/test:latest fabricio-temp-image:test && docker rmi account/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull account/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull account/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account='account'),
                     mock.call.update(force=False, tag=None, registry=None, account='account'),
@@ -466,14 +562,14 @@ class DockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(account='account', ssh_tunnel_port=1234),
                 expected_calls=[
-                    mock.call.local('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker pull registry:5000/test:latest', quiet=False, use_cache=True, ignore_errors=False),
-                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker tag registry:5000/test:latest registry:5000/account/test:latest', use_cache=True),
-                    mock.call.local('docker push registry:5000/account/test:latest', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi registry:5000/account/test:latest', use_cache=True),
+                    mock.call.local('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker pull registry:5000/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker tag registry:5000/test:latest registry:5000/account/test:latest'),
+                    mock.call.local('docker push registry:5000/account/test:latest', quiet=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi registry:5000/account/test:latest'),
                     mock.call.run('docker tag localhost:1234/account/test:latest fabricio-temp-image:test && docker rmi localhost:1234/account/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull localhost:1234/account/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull localhost:1234/account/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='localhost:1234', account='account'),
                     mock.call.update(force=False, tag=None, registry='localhost:1234', account='account'),
@@ -484,14 +580,14 @@ class DockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(registry='host:4000'),
                 expected_calls=[
-                    mock.call.local('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker pull registry:5000/test:latest', quiet=False, use_cache=True, ignore_errors=False),
-                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker tag registry:5000/test:latest host:4000/test:latest', use_cache=True),
-                    mock.call.local('docker push host:4000/test:latest', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi host:4000/test:latest', use_cache=True),
+                    mock.call.local('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker pull registry:5000/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker tag registry:5000/test:latest host:4000/test:latest'),
+                    mock.call.local('docker push host:4000/test:latest', quiet=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi host:4000/test:latest'),
                     mock.call.run('docker tag host:4000/test:latest fabricio-temp-image:test && docker rmi host:4000/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull host:4000/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull host:4000/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='host:4000', account=None),
                     mock.call.update(force=False, tag=None, registry='host:4000', account=None),
@@ -502,14 +598,14 @@ class DockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(registry='host:4000', ssh_tunnel_port=1234),
                 expected_calls=[
-                    mock.call.local('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker pull registry:5000/test:latest', quiet=False, use_cache=True, ignore_errors=False),
-                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker tag registry:5000/test:latest host:4000/test:latest', use_cache=True),
-                    mock.call.local('docker push host:4000/test:latest', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi host:4000/test:latest', use_cache=True),
+                    mock.call.local('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker pull registry:5000/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker tag registry:5000/test:latest host:4000/test:latest'),
+                    mock.call.local('docker push host:4000/test:latest', quiet=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi host:4000/test:latest'),
                     mock.call.run('docker tag localhost:1234/test:latest fabricio-temp-image:test && docker rmi localhost:1234/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='localhost:1234', account=None),
                     mock.call.update(force=False, tag=None, registry='localhost:1234', account=None),
@@ -521,7 +617,7 @@ class DockerTasksTestCase(unittest.TestCase):
                 init_kwargs=dict(),
                 expected_calls=[
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=True, tag=None, registry=None, account=None),
@@ -533,7 +629,7 @@ class DockerTasksTestCase(unittest.TestCase):
                 init_kwargs=dict(),
                 expected_calls=[
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -545,7 +641,7 @@ class DockerTasksTestCase(unittest.TestCase):
                 init_kwargs=dict(),
                 expected_calls=[
                     mock.call.run('docker tag test:tag fabricio-temp-image:test && docker rmi test:tag', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:tag', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:tag', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag='tag', registry=None, account=None),
                     mock.call.update(force=False, tag='tag', registry=None, account=None),
@@ -558,7 +654,7 @@ class DockerTasksTestCase(unittest.TestCase):
                 expected_calls=[
                     mock.call.backup(),
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -570,7 +666,7 @@ class DockerTasksTestCase(unittest.TestCase):
                 init_kwargs=dict(),
                 expected_calls=[
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -582,7 +678,7 @@ class DockerTasksTestCase(unittest.TestCase):
                 init_kwargs=dict(),
                 expected_calls=[
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
                 ],
@@ -593,7 +689,7 @@ class DockerTasksTestCase(unittest.TestCase):
                 init_kwargs=dict(),
                 expected_calls=[
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -604,15 +700,15 @@ class DockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(force=True, backup=True, tag='tag'),
                 init_kwargs=dict(registry='host:4000', account='account'),
                 expected_calls=[
-                    mock.call.local('docker tag registry:5000/test:tag fabricio-temp-image:test && docker rmi registry:5000/test:tag', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker pull registry:5000/test:tag', quiet=False, use_cache=True, ignore_errors=False),
-                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker tag registry:5000/test:tag host:4000/account/test:tag', use_cache=True),
-                    mock.call.local('docker push host:4000/account/test:tag', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi host:4000/account/test:tag', use_cache=True),
+                    mock.call.local('docker tag registry:5000/test:tag fabricio-temp-image:test && docker rmi registry:5000/test:tag', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker pull registry:5000/test:tag', quiet=False, use_cache=False, ignore_errors=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker tag registry:5000/test:tag host:4000/account/test:tag'),
+                    mock.call.local('docker push host:4000/account/test:tag', quiet=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi host:4000/account/test:tag'),
                     mock.call.backup(),
                     mock.call.run('docker tag host:4000/account/test:tag fabricio-temp-image:test && docker rmi host:4000/account/test:tag', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull host:4000/account/test:tag', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull host:4000/account/test:tag', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag='tag', registry='host:4000', account='account'),
                     mock.call.update(force=True, tag='tag', registry='host:4000', account='account'),
@@ -679,21 +775,21 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
         self.fab_settings.__exit__(None, None, None)
 
     @mock.patch.multiple(docker.Container, backup=mock.DEFAULT, migrate=mock.DEFAULT, update=mock.DEFAULT)
-    @mock.patch.multiple(fabricio, run=mock.DEFAULT)
+    @mock.patch.multiple(fabricio, run=mock.DEFAULT, local=mock.DEFAULT)
     @mock.patch.object(fab, 'remote_tunnel', return_value=mock.MagicMock())
-    def test_deploy(self, remote_tunnel, run, backup, migrate, update):
+    def test_deploy(self, remote_tunnel, run, local, backup, migrate, update):
         cases = dict(
             default=dict(
                 deploy_kwargs=dict(),
                 init_kwargs=dict(),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -704,13 +800,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image registry:5000/test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=registry:5000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push registry:5000/test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image registry:5000/test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=registry:5000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push registry:5000/test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull registry:5000/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull registry:5000/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -721,13 +817,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(ssh_tunnel_port=1234),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image registry:5000/test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=registry:5000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push registry:5000/test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image registry:5000/test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag registry:5000/test:latest fabricio-temp-image:test && docker rmi registry:5000/test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=registry:5000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push registry:5000/test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag localhost:1234/test:latest fabricio-temp-image:test && docker rmi localhost:1234/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='localhost:1234', account=None),
                     mock.call.update(force=False, tag=None, registry='localhost:1234', account=None),
@@ -738,13 +834,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(registry='host:5000'),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image host:5000/test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag host:5000/test:latest fabricio-temp-image:test && docker rmi host:5000/test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=host:5000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push host:5000/test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image host:5000/test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag host:5000/test:latest fabricio-temp-image:test && docker rmi host:5000/test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=host:5000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push host:5000/test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag host:5000/test:latest fabricio-temp-image:test && docker rmi host:5000/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull host:5000/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull host:5000/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='host:5000', account=None),
                     mock.call.update(force=False, tag=None, registry='host:5000', account=None),
@@ -755,13 +851,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(registry='host:5000', ssh_tunnel_port=1234),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image host:5000/test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag host:5000/test:latest fabricio-temp-image:test && docker rmi host:5000/test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=host:5000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push host:5000/test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image host:5000/test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag host:5000/test:latest fabricio-temp-image:test && docker rmi host:5000/test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=host:5000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push host:5000/test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag localhost:1234/test:latest fabricio-temp-image:test && docker rmi localhost:1234/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='localhost:1234', account=None),
                     mock.call.update(force=False, tag=None, registry='localhost:1234', account=None),
@@ -772,13 +868,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(account='account'),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image account/test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag account/test:latest fabricio-temp-image:test && docker rmi account/test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=account/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push account/test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image account/test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag account/test:latest fabricio-temp-image:test && docker rmi account/test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=account/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push account/test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag account/test:latest fabricio-temp-image:test && docker rmi account/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull account/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull account/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account='account'),
                     mock.call.update(force=False, tag=None, registry=None, account='account'),
@@ -789,13 +885,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(account='account', ssh_tunnel_port=1234),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image host:5000/account/test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag host:5000/account/test:latest fabricio-temp-image:test && docker rmi host:5000/account/test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=host:5000/account/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push host:5000/account/test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image host:5000/account/test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag host:5000/account/test:latest fabricio-temp-image:test && docker rmi host:5000/account/test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=host:5000/account/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push host:5000/account/test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag localhost:1234/account/test:latest fabricio-temp-image:test && docker rmi localhost:1234/account/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull localhost:1234/account/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull localhost:1234/account/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='localhost:1234', account='account'),
                     mock.call.update(force=False, tag=None, registry='localhost:1234', account='account'),
@@ -806,13 +902,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(registry='host:4000'),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image host:4000/test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag host:4000/test:latest fabricio-temp-image:test && docker rmi host:4000/test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=host:4000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push host:4000/test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image host:4000/test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag host:4000/test:latest fabricio-temp-image:test && docker rmi host:4000/test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=host:4000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push host:4000/test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag host:4000/test:latest fabricio-temp-image:test && docker rmi host:4000/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull host:4000/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull host:4000/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='host:4000', account=None),
                     mock.call.update(force=False, tag=None, registry='host:4000', account=None),
@@ -823,13 +919,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(registry='host:4000', ssh_tunnel_port=1234),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image host:4000/test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag host:4000/test:latest fabricio-temp-image:test && docker rmi host:4000/test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=host:4000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push host:4000/test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image host:4000/test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag host:4000/test:latest fabricio-temp-image:test && docker rmi host:4000/test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=host:4000/test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push host:4000/test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag localhost:1234/test:latest fabricio-temp-image:test && docker rmi localhost:1234/test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull localhost:1234/test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry='localhost:1234', account=None),
                     mock.call.update(force=False, tag=None, registry='localhost:1234', account=None),
@@ -840,13 +936,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(force='yes'),
                 init_kwargs=dict(),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=True, tag=None, registry=None, account=None),
@@ -857,13 +953,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(force='no'),
                 init_kwargs=dict(),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -874,13 +970,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(),
                 init_kwargs=dict(build_path='foo'),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 foo', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 foo', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -891,13 +987,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(tag='tag'),
                 init_kwargs=dict(),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image test:tag', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag test:tag fabricio-temp-image:test && docker rmi test:tag', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=test:tag --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push test:tag', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image test:tag', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag test:tag fabricio-temp-image:test && docker rmi test:tag', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=test:tag --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push test:tag', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag test:tag fabricio-temp-image:test && docker rmi test:tag', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:tag', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:tag', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag='tag', registry=None, account=None),
                     mock.call.update(force=False, tag='tag', registry=None, account=None),
@@ -908,14 +1004,14 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(backup='yes'),
                 init_kwargs=dict(),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.backup(),
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -926,13 +1022,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(backup='no'),
                 init_kwargs=dict(),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -943,13 +1039,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(migrate='no'),
                 init_kwargs=dict(),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
                 ],
@@ -959,13 +1055,13 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(migrate='yes'),
                 init_kwargs=dict(),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push test:latest', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image test:latest', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=test:latest --pull=1 --force-rm=1 .', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push test:latest', quiet=False, buffer_size=local.buffer_size),
                     mock.call.run('docker tag test:latest fabricio-temp-image:test && docker rmi test:latest', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull test:latest', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag=None, registry=None, account=None),
                     mock.call.update(force=False, tag=None, registry=None, account=None),
@@ -976,14 +1072,14 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 deploy_kwargs=dict(force=True, backup=True, tag='tag'),
                 init_kwargs=dict(registry='host:4000', build_path='foo', account='account'),
                 expected_calls=[
-                    mock.call.local('docker inspect --type image host:4000/account/test:tag', capture=True, use_cache=True, abort_exception=docker.ImageNotFoundError),
-                    mock.call.local('docker tag host:4000/account/test:tag fabricio-temp-image:test && docker rmi host:4000/account/test:tag', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker build --tag=host:4000/account/test:tag --pull=1 --force-rm=1 foo', quiet=False, use_cache=True),
-                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=True),
-                    mock.call.local('docker push host:4000/account/test:tag', quiet=False, use_cache=True),
+                    mock.call.local('docker inspect --type image host:4000/account/test:tag', capture=True, use_cache=False, abort_exception=docker.ImageNotFoundError),
+                    mock.call.local('docker tag host:4000/account/test:tag fabricio-temp-image:test && docker rmi host:4000/account/test:tag', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker build --tag=host:4000/account/test:tag --pull=1 --force-rm=1 foo', quiet=False, use_cache=False, buffer_size=local.buffer_size),
+                    mock.call.local('docker rmi fabricio-temp-image:test old_parent_id', ignore_errors=True, use_cache=False),
+                    mock.call.local('docker push host:4000/account/test:tag', quiet=False, buffer_size=local.buffer_size),
                     mock.call.backup(),
                     mock.call.run('docker tag host:4000/account/test:tag fabricio-temp-image:test && docker rmi host:4000/account/test:tag', ignore_errors=True, use_cache=False),
-                    mock.call.run('docker pull host:4000/account/test:tag', quiet=False, use_cache=False, ignore_errors=False),
+                    mock.call.run('docker pull host:4000/account/test:tag', quiet=False, use_cache=False, ignore_errors=False, buffer_size=run.buffer_size),
                     mock.call.run('docker rmi fabricio-temp-image:test', ignore_errors=True, use_cache=False),
                     mock.call.migrate(tag='tag', registry='host:4000', account='account'),
                     mock.call.update(force=True, tag='tag', registry='host:4000', account='account'),
@@ -991,30 +1087,29 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
                 image_registry='registry:5000',
             ),
         )
-        with mock.patch.object(fabricio, 'local') as local:
-            deploy = mock.Mock()
-            deploy.attach_mock(backup, 'backup')
-            deploy.attach_mock(migrate, 'migrate')
-            deploy.attach_mock(update, 'update')
-            deploy.attach_mock(run, 'run')
-            deploy.attach_mock(local, 'local')
-            update.return_value = False
-            run.return_value = SucceededResult()
-            local.return_value = SucceededResult('[{"Parent": "old_parent_id"}]')
-            for case, data in cases.items():
-                with self.subTest(case=case):
-                    deploy.reset_mock()
-                    tasks_list = tasks.ImageBuildDockerTasks(
-                        service=docker.Container(
-                            name='name',
-                            image=docker.Image('test', registry=data['image_registry']),
-                        ),
-                        hosts=['host'],
-                        **data['init_kwargs']
-                    )
-                    tasks_list.deploy.name = '{0}__{1}'.format(self, case)
-                    fab.execute(tasks_list.deploy, **data['deploy_kwargs'])
-                    self.assertListEqual(data['expected_calls'], deploy.mock_calls)
+        deploy = mock.Mock()
+        deploy.attach_mock(backup, 'backup')
+        deploy.attach_mock(migrate, 'migrate')
+        deploy.attach_mock(update, 'update')
+        deploy.attach_mock(run, 'run')
+        deploy.attach_mock(local, 'local')
+        update.return_value = False
+        run.return_value = SucceededResult()
+        local.return_value = SucceededResult('[{"Parent": "old_parent_id"}]')
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                deploy.reset_mock()
+                tasks_list = tasks.ImageBuildDockerTasks(
+                    service=docker.Container(
+                        name='name',
+                        image=docker.Image('test', registry=data['image_registry']),
+                    ),
+                    hosts=['host'],
+                    **data['init_kwargs']
+                )
+                tasks_list.deploy.name = '{0}__{1}'.format(self, case)
+                fab.execute(tasks_list.deploy, **data['deploy_kwargs'])
+                self.assertListEqual(data['expected_calls'], deploy.mock_calls)
 
     def test_prepare(self):
         cases = dict(
@@ -1063,10 +1158,10 @@ class ImageBuildDockerTasksTestCase(unittest.TestCase):
         )
 
         expected_calls = [
-            mock.call('docker inspect --type image image:latest', use_cache=True, capture=True, abort_exception=docker.ImageNotFoundError),
-            mock.call('docker tag image:latest fabricio-temp-image:image && docker rmi image:latest', use_cache=True, ignore_errors=True),
-            mock.call(mock.ANY, quiet=False, use_cache=True),  # docker build
-            mock.call('docker rmi fabricio-temp-image:image old_parent_id', use_cache=True, ignore_errors=True),
+            mock.call('docker inspect --type image image:latest', use_cache=False, capture=True, abort_exception=docker.ImageNotFoundError),
+            mock.call('docker tag image:latest fabricio-temp-image:image && docker rmi image:latest', use_cache=False, ignore_errors=True),
+            mock.call(mock.ANY, quiet=False, use_cache=False, buffer_size=mock.ANY),  # docker build
+            mock.call('docker rmi fabricio-temp-image:image old_parent_id', use_cache=False, ignore_errors=True),
         ]
 
         def test_docker_build_command(command, **kwargs):
@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import tempfile
+
+import mock
+import six
+import unittest2 as unittest
+
+from fabric import api as fab
+
+import fabricio
+
+from fabricio import executors, retry
+from tests import SucceededResult, FailedResult
+
+
+class TraceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        self.path = os.path.join(temp_dir, 'trace.jsonl')
+        self.fab_settings = fab.settings(
+            fab.hide('everything', 'aborts'),
+            trace_file=self.path,
+            command='task',
+            host_string='host',
+        )
+        self.fab_settings.__enter__()
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+        fabricio.run.cache.clear()
+
+    def read_records(self):
+        with open(self.path) as trace_file:
+            return list(map(json.loads, trace_file))
+
+    @mock.patch.object(fab, 'run')
+    def test_run(self, run):
+        run.__name__ = 'run'
+        succeeded, failed = SucceededResult('output'), FailedResult()
+        succeeded.return_code, failed.return_code = 0, 2
+        run.side_effect = [succeeded, failed, fabricio.Error('error')]
+        fabricio.run('command1', use_cache=True)
+        fabricio.run('command1', use_cache=True)
+        fabricio.run('command2', ignore_errors=True)
+        with self.assertRaises(fabricio.Error):
+            fabricio.run('command3')
+        records = self.read_records()
+        for record in records:
+            self.assertLessEqual(record.pop('start'), record.pop('end'))
+            self.assertEqual('host', record.pop('host'))
+            self.assertEqual('task', record.pop('task'))
+            self.assertEqual('run', record.pop('method'))
+            self.assertEqual(8, record.pop('bytes_out'))
+        self.assertListEqual(
+            [
+                dict(command='command1', cache='miss', status=0, bytes_in=6),
+                dict(command='command1', cache='hit', status=0, bytes_in=6),
+                dict(command='command2', cache=None, status=2, bytes_in=0),
+                dict(command='command3', cache=None, status='error', bytes_in=None, error='error'),  # noqa
+            ],
+            records,
+        )
+
+    @mock.patch.object(fab, 'put', return_value=SucceededResult())
+    def test_put(self, put):
+        fabricio.put(six.BytesIO(b'content'), 'remote')
+        put.assert_called_once_with(mock.ANY, 'remote')
+        record, = self.read_records()
+        self.assertEqual('put', record['method'])
+        self.assertEqual('<file-like object> -> remote', record['command'])
+        self.assertEqual(7, record['bytes_out'])
+        self.assertEqual(0, record['status'])
+
+    @mock.patch.object(fab, 'run', return_value=SucceededResult('output'))
+    def test_parallel_records_are_not_mixed(self, run):
+        run.__name__ = 'run'
+
+        @fab.task
+        def task():
+            for number in range(20):
+                fabricio.run('command {0} '.format(number) + 'x' * 10000)
+
+        hosts = ['host{0}'.format(number) for number in range(10)]
+        executors.ThreadExecutor(pool_size=10)(task, hosts=hosts)
+        records = self.read_records()
+        self.assertEqual(200, len(records))
+        self.assertSetEqual(set(hosts), set(r['host'] for r in records))
+
+    @mock.patch.object(fab, 'run', return_value=SucceededResult())
+    def test_disabled(self, run):
+        run.__name__ = 'run'
+        with fab.settings(trace_file=None):
+            fabricio.run('command')
+        self.assertFalse(os.path.exists(self.path))
+
+    @mock.patch('time.sleep')
+    @mock.patch.object(fab, 'run')
+    def test_retries(self, run, *args):
+        run.__name__ = 'run'
+        failed, succeeded = FailedResult(), SucceededResult()
+        failed.return_code, succeeded.return_code = 255, 0
+        run.side_effect = [failed, succeeded]
+        with fab.settings(retry_attempts=2), retry.attached('pull'):
+            fabricio.run('command')
+        self.assertListEqual(
+            [(1, 255), (2, 0)],
+            [(r['attempt'], r['status']) for r in self.read_records()],
+        )
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+
+import mock
+import six
+import unittest2 as unittest
+
+from fabric import api as fab
+
+import fabricio
+
+from fabricio import transcript
+from tests import SucceededResult, FailedResult
+
+
+class TranscriptTestCase(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        self.path = os.path.join(temp_dir, 'transcript.jsonl')
+        self.fab_settings = fab.settings(
+            fab.hide('everything', 'aborts'),
+            host_string='host',
+        )
+        self.fab_settings.__enter__()
+        self.addCleanup(transcript._players.clear)
+
+    def tearDown(self):
+        self.fab_settings.__exit__(None, None, None)
+
+    def record(self):
+        first, second = SucceededResult('first'), SucceededResult('second')
+        first.return_code = second.return_code = 0
+        first.stderr = second.stderr = ''
+        failed = FailedResult('output')
+        failed.return_code, failed.stderr = 2, 'error'
+        with fab.settings(record_transcript=self.path):
+            with mock.patch.object(fab, 'run') as run:
+                run.__name__ = 'run'
+                run.side_effect = [first, second, failed, fabricio.Error('abort')]
+                fabricio.run('command')
+                fabricio.run('command')
+                fabricio.run('failed', ignore_errors=True)
+                with self.assertRaises(fabricio.Error):
+                    fabricio.run('aborted')
+            with mock.patch.object(fab, 'local', return_value=first) as local:
+                local.__name__ = 'local'
+                fabricio.local('local command')
+
+    @mock.patch.object(fab, 'local', side_effect=AssertionError)
+    @mock.patch.object(fab, 'run', side_effect=AssertionError)
+    def test_replay(self, *args):
+        self.record()
+        with fab.settings(replay_transcript=self.path, replay_speed=0):
+            self.assertEqual('first', fabricio.run('command'))
+            self.assertEqual('second', fabricio.run('command'))
+            self.assertEqual('second', fabricio.run('command'))
+            result = fabricio.run('failed', ignore_errors=True)
+            self.assertTrue(result.failed)
+            self.assertEqual(2, result.return_code)
+            self.assertEqual('output', result)
+            self.assertEqual('error', result.stderr)
+            with self.assertRaises(fabricio.Error) as context:
+                fabricio.run('aborted')
+            self.assertEqual('abort', str(context.exception))
+            self.assertEqual('first', fabricio.local('local command'))
+            with self.assertRaises(fabricio.Error):
+                fabricio.run('unknown command')
+            with fab.settings(host_string='another_host'):
+                with self.assertRaises(fabricio.Error):
+                    fabricio.run('command')
+
+    def test_replay_speed(self):
+        with open(self.path, 'w') as transcript_file:
+            transcript_file.write(
+                '{"method": "run", "host": "host", "command": "command", '
+                '"stdout": "", "stderr": "", "return_code": 0, '
+                '"duration": 1.5}\n'
+            )
+        with mock.patch('time.sleep') as sleep:
+            with fab.settings(replay_transcript=self.path, replay_speed=2):
+                fabricio.run('command')
+        sleep.assert_called_once_with(3.0)
+
+    def test_replay_file_operations(self):
+        def fab_get(remote_path, local_path=None, **kwargs):
+            local_path.write(b'remote content')
+            return mock.Mock(succeeded=True)
+        exists_result = SucceededResult()
+        exists_result.return_code = 0
+        exists_result.stderr = ''
+        with fab.settings(record_transcript=self.path):
+            with mock.patch.object(fab, 'put', return_value=mock.Mock(succeeded=True)):
+                fabricio.put(six.BytesIO(b'content'), '/remote/file')
+            with mock.patch.object(fab, 'get', side_effect=fab_get):
+                fabricio.get('/remote/file', six.BytesIO())
+            with mock.patch.object(fab, 'run', return_value=exists_result) as run:  # noqa
+                run.__name__ = 'run'
+                self.assertTrue(fabricio.exists('/remote/file'))
+        with mock.patch.object(fab, 'put', side_effect=AssertionError):
+            with mock.patch.object(fab, 'get', side_effect=AssertionError):
+                with mock.patch.object(fab, 'run', side_effect=AssertionError):
+                    with fab.settings(replay_transcript=self.path, replay_speed=0):  # noqa
+                        result = fabricio.put(six.BytesIO(), '/remote/file')
+                        self.assertTrue(result.succeeded)
+                        self.assertListEqual(['/remote/file'], result)
+                        local_file = six.BytesIO()
+                        result = fabricio.get('/remote/file', local_file)
+                        self.assertTrue(result.succeeded)
+                        self.assertEqual(b'remote content', local_file.getvalue())
+                        self.assertTrue(fabricio.exists('/remote/file'))
+                        with self.assertRaises(fabricio.Error):
+                            fabricio.get('/unknown/file', six.BytesIO())
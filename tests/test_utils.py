@@ -1,5 +1,9 @@
 # coding: utf-8
 import collections
+import multiprocessing
+import os
+import subprocess
+import sys
 
 import six
 import unittest2 as unittest
@@ -93,3 +97,154 @@ class OptionsTestCase(unittest.TestCase):
                 options = utils.Options(params['options'])
                 expected_str_version = params['expected_str_version']
                 self.assertEqual(expected_str_version, six.text_type(options))
+
+
+class MemoizeTestCase(unittest.TestCase):
+
+    def test_memoize(self):
+        calls = []
+
+        @utils.memoize(maxsize=2)
+        def func(value):
+            calls.append(value)
+            return value * 2
+
+        for value in (1, 2, 1, 3, 1, 2):
+            self.assertEqual(value * 2, func(value))
+        self.assertListEqual([1, 2, 3, 2], calls)
+        self.assertListEqual([(1, ), (2, )], list(func.cache))
+
+
+class TailBufferTestCase(unittest.TestCase):
+
+    def test_getvalue(self):
+        cases = dict(
+            empty=dict(
+                chunks=[],
+                expected='',
+            ),
+            less_than_size=dict(
+                chunks=['ab', 'c'],
+                expected='abc',
+            ),
+            more_than_size=dict(
+                chunks=['ab', 'cd', 'ef'],
+                expected='cdef',
+            ),
+            long_chunk=dict(
+                chunks=['ab', 'cdefgh'],
+                expected='efgh',
+            ),
+        )
+        for case, data in cases.items():
+            with self.subTest(case=case):
+                buffer = utils.TailBuffer(4)
+                for chunk in data['chunks']:
+                    buffer.write(chunk)
+                self.assertEqual(data['expected'], buffer.getvalue())
+                self.assertLessEqual(len(buffer.chunks), 2)
+
+
+class SessionDirTestCase(unittest.TestCase):
+
+    def test_session_dir(self):
+        session_dir = utils.get_session_dir()
+        self.assertTrue(os.path.isdir(session_dir))
+        self.assertNotIn(str(os.getpid()), os.path.basename(session_dir))
+
+        def worker(queue):
+            queue.put(utils.get_session_dir())
+
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=worker, args=(queue, ))
+        process.start()
+        process.join()
+        self.assertEqual(session_dir, queue.get())  # shared by workers
+        self.assertTrue(os.path.isdir(session_dir))
+
+    def test_session_dir_is_removed_at_exit(self):
+        script = (
+            'import multiprocessing, os\n'
+            'from fabricio import utils\n'
+            'print(os.path.exists(utils._session_dir))\n'
+            'process = multiprocessing.Process(target=utils.SharedDict().update, kwargs=dict(key=1))\n'  # noqa
+            'process.start()\n'
+            'process.join()\n'
+            'open(os.path.join(utils.get_session_dir(), "state"), "w").close()\n'
+            'print(utils.get_session_dir())\n'
+        )
+        session_dirs = set()
+        for _ in range(2):
+            output = subprocess.check_output(
+                [sys.executable, '-c', script],
+                stderr=subprocess.STDOUT,
+                universal_newlines=True,
+            )
+            created_on_import, session_dir = output.strip().splitlines()[-2:]
+            self.assertEqual('False', created_on_import)
+            self.assertFalse(os.path.exists(session_dir))
+            session_dirs.add(session_dir)
+        self.assertEqual(2, len(session_dirs))
+
+
+class SharedDictTestCase(unittest.TestCase):
+
+    def test_dict(self):
+        shared = utils.SharedDict(host1=True)
+        shared['host2'] = False
+        self.assertEqual(dict(host1=True, host2=False), dict(shared))
+        self.assertEqual(2, len(shared))
+        self.assertFalse(shared['host2'])
+        self.assertIsNone(shared.get('host3'))
+        del shared['host1']
+        self.assertEqual(['host2'], list(shared))
+        shared.clear()
+        self.assertEqual(0, len(shared))
+
+    def test_shared_by_processes(self):
+        shared = utils.SharedDict()
+        namespace = utils.SharedNamespace(master=None)
+
+        def worker(host):
+            shared[host] = host == 'host2'
+            namespace.master = host
+
+        workers = [
+            multiprocessing.Process(target=worker, args=(host, ))
+            for host in ('host1', 'host2')
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        self.assertEqual(dict(host1=False, host2=True), dict(shared))
+        self.assertIn(namespace.master, ('host1', 'host2'))
+
+    def test_lock_and_event(self):
+        lock = utils.SharedLock()
+        event = utils.SharedEvent()
+        shared = utils.SharedDict(counter=0)
+
+        def worker():
+            event.wait()
+            for _ in range(10):
+                with lock:
+                    shared['counter'] += 1
+
+        workers = [multiprocessing.Process(target=worker) for _ in range(3)]
+        for process in workers:
+            process.start()
+        self.assertFalse(event.wait(timeout=0))
+        event.set()
+        for process in workers:
+            process.join()
+        self.assertTrue(event.is_set())
+        self.assertEqual(30, shared['counter'])
+
+        self.assertTrue(lock.acquire())
+        self.assertFalse(lock.acquire(block=False))
+        lock.release()
+        with self.assertRaises(ValueError):
+            lock.release()
+        event.clear()
+        self.assertFalse(event.is_set())